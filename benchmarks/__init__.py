@@ -0,0 +1,10 @@
+"""
+Banc de charge et de latence de l'API.
+
+    python -m benchmarks run --scale small --output bench/results.json
+    python -m benchmarks compare bench/before.json bench/after.json
+
+Le banc crée une base de test jetable (SQLite ou PostgreSQL local selon DB_ENGINE),
+y génère des données synthétiques en masse puis appelle chaque endpoint en processus
+via le client de test Django, avec de vrais jetons JWT. Aucun accès réseau n'est requis.
+"""
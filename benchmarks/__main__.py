@@ -0,0 +1,154 @@
+import argparse
+import os
+import sys
+from contextlib import contextmanager
+from dataclasses import replace
+
+
+def _database_arguments(parser):
+    parser.add_argument('--scale', default='small', help="tiny, small, medium ou large (défaut : small).")
+    parser.add_argument('--users', type=int, help="Surcharge le nombre d'utilisateurs de l'échelle.")
+    parser.add_argument('--items', type=int, help="Surcharge le nombre d'éléments de l'échelle.")
+    parser.add_argument('--annotations-per-item', type=int)
+    parser.add_argument('--seed', type=int, default=42, help="Graine du générateur de données.")
+    parser.add_argument('--keepdb', action='store_true', help="Conserve la base de test entre deux exécutions.")
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description="Banc de latence de l'API.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="Crée une base jetable, la peuple et mesure chaque endpoint.")
+    _database_arguments(run)
+    run.add_argument('--iterations', type=int, default=50, help="Requêtes mesurées par endpoint.")
+    run.add_argument('--warmup', type=int, default=5, help="Requêtes non mesurées par endpoint.")
+    run.add_argument('--only', nargs='+', default=[], help="Préfixes d'endpoints à garder (ex. data-items).")
+    run.add_argument('--output', default='benchmarks/results.json')
+
+    concurrency = commands.add_parser('concurrency', help="Compare le débit WSGI et ASGI sous clients concurrents.")
+    _database_arguments(concurrency)
+    concurrency.add_argument('--clients', type=int, default=16)
+    concurrency.add_argument('--requests', type=int, default=50, help="Requêtes par client.")
+    concurrency.add_argument('--output', default='benchmarks/concurrency.json')
+
+    serialization = commands.add_parser(
+        'serialization', help="Compare sérialiseurs et lignes .values(), rendu JSON de DRF et orjson."
+    )
+    _database_arguments(serialization)
+    serialization.add_argument('--page-size', type=int, default=10_000)
+    serialization.add_argument('--repeats', type=int, default=10, help="Mesures par liste et par chemin.")
+    serialization.add_argument('--output', default='benchmarks/serialization.json')
+
+    diff = commands.add_parser('compare', help="Compare deux fichiers de résultats.")
+    diff.add_argument('before')
+    diff.add_argument('after')
+    diff.add_argument('--metric', default='p95_ms')
+    diff.add_argument('--fail-above', type=float, help="Code de sortie 1 si une régression dépasse ce pourcentage.")
+    return parser.parse_args(argv)
+
+
+@contextmanager
+def seeded_database(args):
+    """Base de test jetable peuplée selon l'échelle demandée ; produit (échelle, résumé de génération)."""
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    from labeling.models import DataItem
+
+    from .seed import SCALES, seed
+
+    if args.scale not in SCALES:
+        sys.exit(f"Échelle inconnue : {args.scale} (choix : {', '.join(SCALES)})")
+    overrides = {
+        key: value for key, value in {
+            'users': args.users, 'items': args.items, 'annotations_per_item': args.annotations_per_item,
+        }.items() if value is not None
+    }
+    scale = replace(SCALES[args.scale], **overrides)
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=args.keepdb)
+    try:
+        if args.keepdb and DataItem.objects.exists():
+            print("Base conservée, génération ignorée.")
+            seeded = None
+        else:
+            print(f"Génération des données ({connection.vendor}) : {scale}")
+            seeded = seed(scale, random_seed=args.seed)
+            print(f"  terminé en {seeded['seconds']} s")
+        yield scale, seeded
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=args.keepdb)
+
+
+def _write(path, meta, key, results):
+    from . import report
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    report.write(path, meta, results, key=key)
+    print(f"Résultats écrits dans {path}")
+
+
+def run(args):
+    with seeded_database(args) as (scale, seeded):
+        from . import harness, report
+
+        endpoints = [e for e in harness.ENDPOINTS if not args.only or e.name.startswith(tuple(args.only))]
+        ctx = harness.Context.prepare(args.iterations + args.warmup)
+        results = {}
+        for endpoint in endpoints:
+            samples, wall = harness.run_endpoint(endpoint, ctx, args.iterations, args.warmup)
+            results[endpoint.name] = report.summarize(endpoint, samples, wall)
+
+        print(report.table(results))
+        _write(args.output, report.metadata(vars(scale), seeded, args.iterations, args.warmup), 'endpoints', results)
+
+
+def concurrency(args):
+    with seeded_database(args) as (scale, seeded):
+        from . import harness, report
+        from .concurrency import compare_deployments
+
+        ctx = harness.Context.prepare(0)
+        results = compare_deployments(ctx, args.clients, args.requests)
+        for name, row in results.items():
+            print(f"{name:<5} {row['throughput_rps']:>9.1f} req/s  p50 {row['p50_ms']:.2f} ms  "
+                  f"p95 {row['p95_ms']:.2f} ms  erreurs {row['errors']}")
+        meta = report.metadata(vars(scale), seeded, args.requests, 0)
+        meta["clients"] = args.clients
+        _write(args.output, meta, 'deployments', results)
+
+
+def serialization(args):
+    with seeded_database(args) as (scale, seeded):
+        from . import harness, report
+        from .serialization import compare_list_paths, table
+
+        ctx = harness.Context.prepare(0)
+        results = compare_list_paths(ctx, args.page_size, args.repeats)
+        print(table(results))
+        meta = report.metadata(vars(scale), seeded, args.repeats, 1)
+        meta["page_size"] = args.page_size
+        _write(args.output, meta, 'lists', results)
+
+
+def compare(args):
+    from . import report
+
+    lines, worst = report.compare(args.before, args.after, args.metric)
+    print('\n'.join(lines))
+    if args.fail_above is not None and worst > args.fail_above:
+        sys.exit(1)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    {'run': run, 'concurrency': concurrency, 'serialization': serialization, 'compare': compare}[args.command](args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""
+Débit sous clients concurrents : déploiement WSGI (vues synchrones, un thread par client)
+contre déploiement ASGI (vues asynchrones, une tâche par client sur une boucle d'événements).
+
+Les deux gestionnaires de Django (`WSGIHandler`, `ASGIHandler`) sont appelés directement,
+sans serveur ni réseau : on compare la pile applicative et l'accès à la base, pas le serveur
+HTTP. Les requêtes tournent sur les lectures servies par les vues asynchrones.
+"""
+import asyncio
+import io
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+from django.test import override_settings
+
+from .report import _ms, percentile
+
+URLCONFS = {'wsgi': 'core.urls', 'asgi': 'core.asgi_urls'}
+
+
+def request_paths(ctx, count):
+    item_ids = ctx.item_ids or [0]
+    user_id = ctx.users['contributor'].id
+    templates = (
+        lambda i: '/api/data-items/',
+        lambda i: '/api/data-items/pending/',
+        lambda i: f'/api/data-items/{item_ids[i % len(item_ids)]}/progress/',
+        lambda i: f'/api/annotations/{item_ids[i % len(item_ids)]}/consensus/',
+        lambda i: f'/api/users/{user_id}/stats/',
+    )
+    return [templates[i % len(templates)](i) for i in range(count)]
+
+
+def _wsgi_get(app, path, token):
+    statuses = []
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+        'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'testserver', 'HTTP_AUTHORIZATION': f'Bearer {token}', 'HTTP_ACCEPT': 'application/json',
+        'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+    body = app(environ, lambda status, headers, exc_info=None: statuses.append(int(status.split()[0])))
+    try:
+        b''.join(body)
+    finally:
+        body.close()
+    return statuses[0]
+
+
+async def _asgi_get(app, path, token):
+    status = None
+    delivered = False
+
+    async def receive():
+        nonlocal delivered
+        if not delivered:
+            delivered = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'authorization', f'Bearer {token}'.encode()),
+                    (b'accept', b'application/json')],
+        'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+    }
+    await app(scope, receive, send)
+    return status
+
+
+def _summary(latencies, statuses, wall):
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": sum(1 for status in statuses if status != 200),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else None,
+        "p50_ms": _ms(percentile(latencies, 50)),
+        "p95_ms": _ms(percentile(latencies, 95)),
+        "p99_ms": _ms(percentile(latencies, 99)),
+    }
+
+
+def run_wsgi(ctx, clients, requests_per_client):
+    app = WSGIHandler()
+    token = ctx.tokens['contributor']
+
+    def client(offset):
+        samples = []
+        try:
+            for path in request_paths(ctx, requests_per_client)[offset:] + request_paths(ctx, offset):
+                started = time.perf_counter()
+                status = _wsgi_get(app, path, token)
+                samples.append((time.perf_counter() - started, status))
+        finally:
+            connections.close_all()
+        return samples
+
+    with override_settings(ROOT_URLCONF=URLCONFS['wsgi']):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            results = list(pool.map(client, [i % requests_per_client for i in range(clients)]))
+        wall = time.perf_counter() - started
+    samples = [sample for result in results for sample in result]
+    return _summary([s for s, _ in samples], [status for _, status in samples], wall)
+
+
+def run_asgi(ctx, clients, requests_per_client):
+    app = ASGIHandler()
+    token = ctx.tokens['contributor']
+
+    async def client(offset):
+        samples = []
+        for path in request_paths(ctx, requests_per_client)[offset:] + request_paths(ctx, offset):
+            started = time.perf_counter()
+            status = await _asgi_get(app, path, token)
+            samples.append((time.perf_counter() - started, status))
+        return samples
+
+    async def main():
+        return await asyncio.gather(*(client(i % requests_per_client) for i in range(clients)))
+
+    with override_settings(ROOT_URLCONF=URLCONFS['asgi']):
+        started = time.perf_counter()
+        results = asyncio.run(main())
+        wall = time.perf_counter() - started
+    samples = [sample for result in results for sample in result]
+    return _summary([s for s, _ in samples], [status for _, status in samples], wall)
+
+
+def compare_deployments(ctx, clients, requests_per_client, log=print):
+    results = {}
+    for name, runner in (('wsgi', run_wsgi), ('asgi', run_asgi)):
+        log(f"{name.upper()} : {clients} clients × {requests_per_client} requêtes")
+        results[name] = runner(ctx, clients, requests_per_client)
+    return results
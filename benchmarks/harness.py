@@ -0,0 +1,218 @@
+"""
+Exécution des scénarios : un scénario par endpoint du routeur (`labeling/urls.py`)
+plus la connexion JWT. Chaque requête passe par le client de test Django (pile WSGI
+complète, middlewares compris) avec un en-tête `Authorization: Bearer` réel ; on mesure
+la latence murale et le nombre de requêtes SQL.
+
+Les scénarios d'écriture consomment des ressources distinctes à chaque itération
+(élément non annoté, annotation non validée, nom d'utilisateur libre) afin de mesurer
+le chemin nominal et non une erreur d'unicité.
+"""
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from labeling.models import Annotation, DataItem, Label, User, Validation
+from labeling.serializers import RoleTokenObtainPairSerializer
+
+from .seed import BENCH_PASSWORD
+
+BULK_ROWS = 50
+SAMPLE_SIZE = 10_000
+
+
+def _access_token(user):
+    """Jeton d'accès tel qu'émis par /api/login/ (avec le claim de rôle)."""
+    return str(RoleTokenObtainPairSerializer.get_token(user).access_token)
+
+
+@dataclass
+class Endpoint:
+    name: str
+    method: str
+    role: str | None
+    # build(ctx, i) -> kwargs de requête ({'path', 'data', ...}) ou None si les ressources sont épuisées
+    build: Callable
+
+
+@dataclass
+class Sample:
+    seconds: float
+    queries: int
+    status: int
+
+
+@dataclass
+class Context:
+    run_id: str
+    iterations: int
+    users: dict
+    tokens: dict
+    item_ids: list
+    label_ids: list
+    annotation_ids: list
+    unvalidated_ids: list
+    fresh_contributors: list = field(default_factory=list)
+
+    @classmethod
+    def prepare(cls, iterations):
+        """`iterations` compte aussi l'échauffement : chaque itération d'écriture consomme ses ressources."""
+        run_id = uuid.uuid4().hex[:8]
+        users = {
+            role: User.objects.create_user(username=f'bench-{role}-{run_id}', password=BENCH_PASSWORD, role=role)
+            for role in ('admin', 'contributor', 'validator')
+        }
+        # Un contributeur neuf par itération d'annotation en masse : les mêmes éléments restent annotables
+        fresh = User.objects.bulk_create(
+            User(username=f'bench-bulk-{run_id}-{i}', password=users['contributor'].password, role='contributor')
+            for i in range(iterations)
+        )
+        validated = Validation.objects.values('annotation_id')
+        return cls(
+            run_id=run_id,
+            iterations=iterations,
+            users=users,
+            tokens={role: _access_token(user) for role, user in users.items()},
+            item_ids=list(DataItem.objects.filter(is_active=True).order_by('id').values_list('id', flat=True)[:SAMPLE_SIZE]),
+            label_ids=list(Label.objects.order_by('id').values_list('id', flat=True)),
+            annotation_ids=list(Annotation.objects.order_by('id').values_list('id', flat=True)[:SAMPLE_SIZE]),
+            unvalidated_ids=list(
+                Annotation.objects.exclude(id__in=validated).order_by('id')
+                .values_list('id', flat=True)[:iterations * (BULK_ROWS + 1)]
+            ),
+            fresh_contributors=[(user, _access_token(user)) for user in fresh],
+        )
+
+    def pick(self, values, i):
+        return values[i % len(values)] if values else None
+
+    def take(self, values, start, count):
+        chunk = values[start:start + count]
+        return chunk if len(chunk) == count else None
+
+
+def _detail(prefix, ids):
+    return lambda ctx, i: {"path": f"{prefix}{ctx.pick(getattr(ctx, ids), i)}/"}
+
+
+def _login(ctx, i):
+    return {"path": "/api/login/", "data": {"username": ctx.users['contributor'].username, "password": BENCH_PASSWORD}}
+
+
+def _register(ctx, i):
+    return {"path": "/api/users/register/", "data": {
+        "username": f"bench-register-{ctx.run_id}-{i}", "email": f"bench-{ctx.run_id}-{i}@example.org",
+        "password": BENCH_PASSWORD, "password_confirm": BENCH_PASSWORD,
+    }}
+
+
+def _import(ctx, i):
+    lines = ''.join(f'{{"content": "import {ctx.run_id} {i} {n}", "data_type": "text"}}\n' for n in range(BULK_ROWS))
+    upload = SimpleUploadedFile(f'bench-{ctx.run_id}-{i}.jsonl', lines.encode(), content_type='application/x-ndjson')
+    return {"path": "/api/data-items/import/", "data": {"file": upload}, "multipart": True}
+
+
+def _annotate(ctx, i):
+    # Le contributeur de banc n'annote jamais deux fois le même élément
+    if i >= len(ctx.item_ids):
+        return None
+    return {"path": "/api/annotations/", "data": {"item": ctx.item_ids[i], "label": ctx.pick(ctx.label_ids, i)}}
+
+
+def _annotate_bulk(ctx, i):
+    if i >= len(ctx.fresh_contributors) or len(ctx.item_ids) < BULK_ROWS:
+        return None
+    user, token = ctx.fresh_contributors[i]
+    rows = [{"item": item_id, "label": ctx.pick(ctx.label_ids, n)} for n, item_id in enumerate(ctx.item_ids[:BULK_ROWS])]
+    return {"path": "/api/annotations/bulk/", "data": {"annotations": rows}, "token": token}
+
+
+def _validate(ctx, i):
+    ids = ctx.take(ctx.unvalidated_ids, i, 1)
+    return ids and {"path": "/api/validations/", "data": {"annotation": ids[0], "is_approved": i % 5 != 0}}
+
+
+def _validate_bulk(ctx, i):
+    # Les validations unitaires consomment le début du réservoir, le mode en masse la suite
+    ids = ctx.take(ctx.unvalidated_ids, ctx.iterations + i * BULK_ROWS, BULK_ROWS)
+    return ids and {"path": "/api/validations/bulk/", "data": {
+        "validations": [{"annotation": annotation_id, "is_approved": n % 5 != 0} for n, annotation_id in enumerate(ids)],
+    }}
+
+
+ENDPOINTS = [
+    Endpoint('auth.login', 'POST', None, _login),
+    Endpoint('labels.list', 'GET', 'contributor', lambda ctx, i: {"path": "/api/labels/"}),
+    Endpoint('labels.retrieve', 'GET', 'contributor', _detail('/api/labels/', 'label_ids')),
+    Endpoint('data-items.list', 'GET', 'contributor', lambda ctx, i: {"path": "/api/data-items/"}),
+    Endpoint('data-items.retrieve', 'GET', 'contributor', _detail('/api/data-items/', 'item_ids')),
+    Endpoint('data-items.pending', 'GET', 'contributor', lambda ctx, i: {"path": "/api/data-items/pending/"}),
+    Endpoint('data-items.progress', 'GET', 'contributor',
+             lambda ctx, i: {"path": f"/api/data-items/{ctx.pick(ctx.item_ids, i)}/progress/"}),
+    Endpoint('data-items.claim', 'POST', 'contributor',
+             lambda ctx, i: {"path": "/api/data-items/claim/", "data": {"count": 10}}),
+    Endpoint('data-items.export', 'GET', 'admin',
+             lambda ctx, i: {"path": "/api/data-items/export/", "data": {"min_confidence": 0.99}}),
+    Endpoint('data-items.import', 'POST', 'admin', _import),
+    Endpoint('annotations.list', 'GET', 'contributor', lambda ctx, i: {"path": "/api/annotations/"}),
+    Endpoint('annotations.retrieve', 'GET', 'contributor', _detail('/api/annotations/', 'annotation_ids')),
+    Endpoint('annotations.consensus', 'GET', 'contributor',
+             lambda ctx, i: {"path": f"/api/annotations/{ctx.pick(ctx.item_ids, i)}/consensus/"}),
+    Endpoint('annotations.create', 'POST', 'contributor', _annotate),
+    Endpoint('annotations.bulk', 'POST', 'contributor', _annotate_bulk),
+    Endpoint('validations.list', 'GET', 'validator', lambda ctx, i: {"path": "/api/validations/"}),
+    Endpoint('validations.create', 'POST', 'validator', _validate),
+    Endpoint('validations.bulk', 'POST', 'validator', _validate_bulk),
+    Endpoint('users.list', 'GET', 'contributor', lambda ctx, i: {"path": "/api/users/"}),
+    Endpoint('users.retrieve', 'GET', 'contributor',
+             lambda ctx, i: {"path": f"/api/users/{ctx.users['contributor'].id}/"}),
+    Endpoint('users.stats', 'GET', 'contributor',
+             lambda ctx, i: {"path": f"/api/users/{ctx.users['contributor'].id}/stats/"}),
+    Endpoint('users.leaderboard', 'GET', 'contributor', lambda ctx, i: {"path": "/api/users/leaderboard/"}),
+    Endpoint('users.register', 'POST', None, _register),
+]
+
+
+def send(client, endpoint, ctx, spec):
+    headers = {}
+    token = spec.get('token') or (ctx.tokens[endpoint.role] if endpoint.role else None)
+    if token:
+        headers['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    if endpoint.method == 'GET':
+        return client.get(spec['path'], spec.get('data'), **headers)
+    if spec.get('multipart'):
+        return client.post(spec['path'], spec['data'], **headers)
+    return client.post(spec['path'], spec.get('data'), content_type='application/json', **headers)
+
+
+def measure(client, endpoint, ctx, spec):
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        response = send(client, endpoint, ctx, spec)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        elapsed = time.perf_counter() - started
+    return Sample(seconds=elapsed, queries=len(queries), status=response.status_code)
+
+
+def run_endpoint(endpoint, ctx, iterations, warmup=0):
+    """Retourne (échantillons, durée murale des itérations mesurées)."""
+    client = Client()
+    samples = []
+    started = None
+    for i in range(warmup + iterations):
+        spec = endpoint.build(ctx, i)
+        if spec is None:
+            break
+        if i < warmup:
+            send(client, endpoint, ctx, spec)
+            continue
+        started = started or time.perf_counter()
+        samples.append(measure(client, endpoint, ctx, spec))
+    return samples, (time.perf_counter() - started) if started else 0.0
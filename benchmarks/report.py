@@ -0,0 +1,115 @@
+"""
+Agrégation des mesures et fichier de résultats JSON.
+
+Le fichier est écrit avec des clés triées et des valeurs arrondies pour rester
+lisible dans un `diff` entre deux commits ; `compare` en donne une vue synthétique.
+"""
+import json
+import platform
+import subprocess
+from collections import Counter
+from datetime import datetime, timezone
+
+import django
+from django.db import connection
+
+
+def percentile(values, p):
+    """Percentile par interpolation linéaire sur une liste déjà triée."""
+    if not values:
+        return None
+    rank = (len(values) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def summarize(endpoint, samples, wall_seconds):
+    latencies = sorted(sample.seconds for sample in samples)
+    queries = [sample.queries for sample in samples]
+    return {
+        "method": endpoint.method,
+        "role": endpoint.role or "anonymous",
+        "requests": len(samples),
+        "p50_ms": _ms(percentile(latencies, 50)),
+        "p95_ms": _ms(percentile(latencies, 95)),
+        "p99_ms": _ms(percentile(latencies, 99)),
+        "mean_ms": _ms(sum(latencies) / len(latencies)) if latencies else None,
+        "throughput_rps": round(len(samples) / wall_seconds, 2) if wall_seconds else None,
+        "queries": {
+            "min": min(queries, default=None),
+            "max": max(queries, default=None),
+            "mean": round(sum(queries) / len(queries), 2) if queries else None,
+        },
+        "status": {str(code): count for code, count in sorted(Counter(s.status for s in samples).items())},
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(scale, seeded, iterations, warmup):
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        "git_commit": git_commit(),
+        "database": connection.vendor,
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "scale": scale,
+        "seed": seeded,
+        "iterations": iterations,
+        "warmup": warmup,
+    }
+
+
+def write(path, meta, results, key='endpoints'):
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump({"meta": meta, key: results}, fh, indent=2, sort_keys=True, ensure_ascii=False)
+        fh.write('\n')
+
+
+def table(endpoints):
+    lines = [f"{'endpoint':<24} {'n':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8} {'sql':>6}  statuts"]
+    for name, row in endpoints.items():
+        if not row["requests"]:
+            lines.append(f"{name:<24} {0:>4}  (ressources épuisées)")
+            continue
+        lines.append(
+            f"{name:<24} {row['requests']:>4} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f} "
+            f"{row['throughput_rps']:>8.1f} {row['queries']['max']:>6}  "
+            + ' '.join(f"{code}×{count}" for code, count in row["status"].items())
+        )
+    return '\n'.join(lines)
+
+
+def compare(before_path, after_path, metric='p95_ms'):
+    """Retourne (lignes de texte, variation relative maximale de `metric` en %)."""
+    with open(before_path, encoding='utf-8') as fh:
+        before = json.load(fh)["endpoints"]
+    with open(after_path, encoding='utf-8') as fh:
+        after = json.load(fh)["endpoints"]
+
+    lines = [f"{'endpoint':<24} {metric + ' avant':>14} {'après':>10} {'Δ %':>8} {'sql avant':>10} {'après':>6}"]
+    worst = 0.0
+    for name in sorted(before.keys() | after.keys()):
+        old, new = before.get(name), after.get(name)
+        if not old or not new or old.get(metric) is None or new.get(metric) is None:
+            lines.append(f"{name:<24} {'absent' if not old else '':>14} {'absent' if not new else '':>10}")
+            continue
+        change = (new[metric] - old[metric]) / old[metric] * 100 if old[metric] else 0.0
+        worst = max(worst, change)
+        lines.append(
+            f"{name:<24} {old[metric]:>14.2f} {new[metric]:>10.2f} {change:>+8.1f} "
+            f"{old['queries']['max']:>10} {new['queries']['max']:>6}"
+        )
+    return lines, worst
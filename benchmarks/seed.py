@@ -0,0 +1,98 @@
+"""
+Générateur de données synthétiques : utilisateurs, labels, éléments, annotations et
+validations, insérés par `bulk_create` et par paquets pour garder une mémoire bornée.
+Les tables dénormalisées (décomptes, statistiques, compteurs d'attribution) sont
+reconstruites à la fin, comme après un import.
+"""
+import random
+import time
+from dataclasses import dataclass
+from itertools import batched
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from labeling.models import Annotation, DataItem, Label, User, Validation
+from labeling.stats import rebuild_user_stats
+from labeling.tallies import rebuild_tallies
+
+BENCH_PASSWORD = 'bench-password'
+BATCH_SIZE = 5000
+
+
+@dataclass(frozen=True)
+class Scale:
+    users: int
+    items: int
+    labels: int = 5
+    annotations_per_item: int = 3
+    validation_ratio: float = 0.5
+
+
+SCALES = {
+    'tiny': Scale(users=10, items=300),
+    'small': Scale(users=50, items=5_000),
+    'medium': Scale(users=500, items=100_000),
+    'large': Scale(users=5_000, items=1_000_000, annotations_per_item=5),
+}
+
+
+def seed(scale, random_seed=42, batch_size=BATCH_SIZE, log=print):
+    """Peuple la base courante ; retourne un résumé du volume inséré et de la durée."""
+    rng = random.Random(random_seed)
+    started = time.monotonic()
+    password = make_password(BENCH_PASSWORD)
+
+    with transaction.atomic():
+        validators = User.objects.bulk_create(
+            User(username=f'seed-validator-{i}', password=password, role='validator')
+            for i in range(max(1, scale.users // 10))
+        )
+        contributors = User.objects.bulk_create(
+            User(username=f'seed-contributor-{i}', password=password, role='contributor')
+            for i in range(max(scale.annotations_per_item, scale.users))
+        )
+        labels = Label.objects.bulk_create(Label(name=f'seed-label-{i}') for i in range(scale.labels))
+
+    annotations_written = validations_written = 0
+    for chunk in batched(range(scale.items), batch_size):
+        with transaction.atomic():
+            items = DataItem.objects.bulk_create(
+                DataItem(content=f'élément synthétique {i}', data_type='audio' if i % 5 == 0 else 'text')
+                for i in chunk
+            )
+            annotations = Annotation.objects.bulk_create(
+                (
+                    Annotation(item=item, user=user, label=rng.choice(labels))
+                    for item in items
+                    for user in rng.sample(contributors, scale.annotations_per_item)
+                ),
+                batch_size=batch_size,
+            )
+            validations = Validation.objects.bulk_create(
+                (
+                    Validation(annotation=annotation, validator=rng.choice(validators), is_approved=rng.random() < 0.8)
+                    for annotation in annotations
+                    if rng.random() < scale.validation_ratio
+                ),
+                batch_size=batch_size,
+            )
+        annotations_written += len(annotations)
+        validations_written += len(validations)
+        log(f"  {chunk[-1] + 1}/{scale.items} éléments, {annotations_written} annotations")
+
+    rebuild_tallies()
+    rebuild_user_stats()
+    counts = Annotation.objects.filter(item=OuterRef('pk')).order_by().values('item').annotate(n=Count('id')).values('n')
+    DataItem.objects.update(assignment_count=Coalesce(Subquery(counts), 0))
+
+    return {
+        "users": len(validators) + len(contributors),
+        "labels": len(labels),
+        "items": scale.items,
+        "annotations": annotations_written,
+        "validations": validations_written,
+        "seconds": round(time.monotonic() - started, 2),
+    }
@@ -0,0 +1,77 @@
+"""
+Sérialisation des grandes pages de liste : chemin `.values()` (`labeling/rows.py`) contre
+sérialiseurs DRF, puis rendu JSON de DRF contre orjson (`labeling/renderers.py`).
+
+Chaque liste est demandée avec `?page_size=` (plafond API_MAX_PAGE_SIZE levé pour la
+mesure) par le client de test Django, pile WSGI complète. Le rendu est mesuré à part sur
+le corps de la page, pour isoler le coût du JSON de celui de la lecture.
+"""
+import time
+from unittest import mock
+
+from django.test import Client
+from rest_framework.mixins import ListModelMixin
+from rest_framework.renderers import JSONRenderer
+
+from labeling.pagination import KeysetPagination
+from labeling.renderers import FastJSONRenderer, orjson
+from labeling.rows import ValueRowsListMixin
+
+from .report import _ms, percentile
+
+LISTS = {
+    'labels': '/api/labels/',
+    'data-items': '/api/data-items/',
+    'annotations': '/api/annotations/',
+}
+
+
+def _timed(call, repeats):
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = call()
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return result, {"p50_ms": _ms(percentile(latencies, 50)), "p95_ms": _ms(percentile(latencies, 95))}
+
+
+def compare_list_paths(ctx, page_size, repeats):
+    client = Client(HTTP_AUTHORIZATION=f"Bearer {ctx.tokens['contributor']}", HTTP_ACCEPT='application/json')
+    results = {}
+    with mock.patch.object(KeysetPagination, 'max_page_size', page_size):
+        for name, path in LISTS.items():
+            url = f'{path}?page_size={page_size}'
+            client.get(url)
+            response, values = _timed(lambda: client.get(url), repeats)
+            with mock.patch.object(ValueRowsListMixin, 'list', ListModelMixin.list):
+                client.get(url)
+                baseline, serializer = _timed(lambda: client.get(url), repeats)
+            if baseline.content != response.content:
+                raise AssertionError(f"{name} : corps différents entre sérialiseur et .values()")
+
+            data = response.data
+            _, drf_json = _timed(lambda: JSONRenderer().render(data), repeats)
+            _, fast_json = _timed(lambda: FastJSONRenderer().render(data), repeats)
+            results[name] = {
+                "rows": len(data['results']),
+                "bytes": len(response.content),
+                "serializer": serializer,
+                "values": values,
+                "render_drf": drf_json,
+                "render_orjson": fast_json if orjson is not None else None,
+            }
+    return results
+
+
+def table(results):
+    lines = [
+        f"{'liste':<12} {'lignes':>7} {'sérialiseur':>12} {'values()':>9} {'json DRF':>9} {'orjson':>9}  (p50 ms)"
+    ]
+    for name, row in results.items():
+        fast = row['render_orjson']['p50_ms'] if row['render_orjson'] else None
+        lines.append(
+            f"{name:<12} {row['rows']:>7} {row['serializer']['p50_ms']:>12.2f} {row['values']['p50_ms']:>9.2f} "
+            f"{row['render_drf']['p50_ms']:>9.2f} " + (f"{fast:>9.2f}" if fast is not None else f"{'absent':>9}")
+        )
+    return '\n'.join(lines)
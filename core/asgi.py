@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+# Sous un serveur ASGI, les lectures les plus sollicitées passent par les vues asynchrones
+os.environ.setdefault('ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
@@ -0,0 +1,12 @@
+"""
+URLconf du déploiement ASGI (ROOT_URLCONF quand ASYNC_VIEWS est actif) : les vues
+asynchrones de `labeling.async_urls` passent devant le routeur, le reste est inchangé.
+"""
+from django.urls import include, path
+
+from core.urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/', include('labeling.async_urls')),
+    *sync_urlpatterns,
+]
@@ -49,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'labeling.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,7 +59,10 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'core.urls'
+# Vues asynchrones (ASGI) pour les lectures les plus sollicitées ; activé par défaut par core/asgi.py
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS') == 'True'
+
+ROOT_URLCONF = 'core.asgi_urls' if ASYNC_VIEWS else 'core.urls'
 
 TEMPLATES = [
     {
@@ -93,21 +97,133 @@ DATABASES = {
     }
 }
 
+# DB_ENGINE=sqlite permet de lancer l'API et les tests en local sans PostgreSQL
+if os.getenv('DB_ENGINE') == 'sqlite':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / (os.getenv('DB_NAME') or 'db.sqlite3'),
+    }
+
+# Connexions persistantes (secondes, 0 = une connexion par requête), vérifiées avant réutilisation
+for database in DATABASES.values():
+    database['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', 60))
+    database['CONN_HEALTH_CHECKS'] = True
+
+# Répliques en lecture : hôtes PostgreSQL (mêmes nom, utilisateur et mot de passe) ou fichiers SQLite, séparés par des virgules.
+# Les répliques PostgreSQL pointent sur la base de test principale pendant les tests ; les fichiers SQLite ont la leur.
+DATABASE_REPLICAS = []
+for index, location in enumerate(filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1):
+    alias = f'replica_{index}'
+    if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+        DATABASES[alias] = {**DATABASES['default'], 'NAME': BASE_DIR / location.strip()}
+    else:
+        DATABASES[alias] = {**DATABASES['default'], 'HOST': location.strip(), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['labeling.db_routing.ReplicaRouter']
+
+# Durée pendant laquelle les lectures d'un utilisateur restent sur la base principale après une écriture
+REPLICA_STICKY_SECONDS = int(os.getenv('DB_REPLICA_STICKY_SECONDS', 5))
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-'rest_framework.authentication.SessionAuthentication',
+        'labeling.authentication.RoleTokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_PAGINATION_CLASS': 'labeling.pagination.KeysetPagination',
+    'PAGE_SIZE': int(os.getenv('API_PAGE_SIZE', 50)),
 }
 
+# Rendu et lecture JSON par orjson (extra `fast-json` ; sans le paquet, rendu de DRF et avertissement labeling.W002)
+FAST_JSON = os.getenv('FAST_JSON') == 'True'
+if FAST_JSON:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = (
+        'labeling.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    )
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'] = (
+        'labeling.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    )
+
+# Taille de page maximale acceptée via ?page_size=
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', 500))
+
+# File d'attribution des tâches (claim)
+LABELING_ANNOTATIONS_PER_ITEM = int(os.getenv('LABELING_ANNOTATIONS_PER_ITEM', 3))
+LABELING_LEASE_SECONDS = int(os.getenv('LABELING_LEASE_SECONDS', 900))
+LABELING_MAX_CLAIM = int(os.getenv('LABELING_MAX_CLAIM', 50))
+
+# Retrait des éléments par data_type : part minimale du label majoritaire et nombre minimal de votes
+# (LABELING_RETIRE_<TYPE>=confiance:votes, ex. LABELING_RETIRE_AUDIO=0.9:3) ; LABELING_ANNOTATIONS_PER_ITEM reste le plafond
+LABELING_RETIREMENT = {}
+for data_type in ('text', 'audio'):
+    confidence, _, min_votes = os.getenv(f'LABELING_RETIRE_{data_type.upper()}', '0.8:2').partition(':')
+    LABELING_RETIREMENT[data_type] = {'confidence': float(confidence), 'min_votes': int(min_votes)}
+
+# Nombre maximal de lignes par requête sur les endpoints bulk
+LABELING_BULK_MAX_ROWS = int(os.getenv('LABELING_BULK_MAX_ROWS', 1000))
+
+# Tâches de fond (manage.py run_workers) : threads par défaut, attente sur file vide, reprises
+# (délai doublé à chaque échec), signal de vie des workers, délai au-delà duquel une tâche est reprise
+# et durée de conservation des tâches terminées et de leurs fichiers d'export (0 : conservées)
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+JOB_POLL_SECONDS = float(os.getenv('JOB_POLL_SECONDS', 2))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+JOB_RETRY_SECONDS = int(os.getenv('JOB_RETRY_SECONDS', 30))
+JOB_HEARTBEAT_SECONDS = int(os.getenv('JOB_HEARTBEAT_SECONDS', 30))
+JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', 300))
+JOB_RETENTION_SECONDS = int(os.getenv('JOB_RETENTION_SECONDS', 7 * 24 * 3600))
+
+# Flux de changements : intervalle de publication des changements validés par les workers (secondes)
+CHANGES_PUBLISH_SECONDS = float(os.getenv('CHANGES_PUBLISH_SECONDS', 1))
+
+# Accord inter-annotateurs (/api/agreement/) : intervalle des rafraîchissements faits par les workers,
+# et nombre minimal d'éléments communs pour lister une paire d'annotateurs
+AGREEMENT_REFRESH_SECONDS = int(os.getenv('AGREEMENT_REFRESH_SECONDS', 60))
+AGREEMENT_MIN_SHARED_ITEMS = int(os.getenv('AGREEMENT_MIN_SHARED_ITEMS', 20))
+
+# Cache Django : mémoire locale par processus, Redis partagé si REDIS_URL est défini (paquet `redis` requis)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+if os.getenv('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    }
+# Cache visible de tous les processus (invalidations et révocations immédiates partout)
+SHARED_CACHE = bool(os.getenv('REDIS_URL'))
+# Durée de vie des versions de jetons en cache : retard maximal d'une révocation dans un cache local
+TOKEN_VERSION_CACHE_SECONDS = int(os.getenv('TOKEN_VERSION_CACHE_SECONDS', 30))
+
+# Durée de vie maximale des réponses en cache (progress, consensus, stats), invalidées à chaque écriture
+RESPONSE_CACHE_SECONDS = int(os.getenv('RESPONSE_CACHE_SECONDS', 300))
+
+# Fichiers audio importés (segments WAV) : durée des segments et résolution des pics de forme d'onde
+MEDIA_ROOT = Path(os.getenv('MEDIA_ROOT') or BASE_DIR / 'media')
+MEDIA_URL = 'media/'
+AUDIO_SEGMENT_SECONDS = float(os.getenv('AUDIO_SEGMENT_SECONDS', 30))
+AUDIO_PEAKS_PER_SECOND = int(os.getenv('AUDIO_PEAKS_PER_SECOND', 50))
+
+# Métriques par vue (/metrics) ; en-tête Server-Timing optionnel, jeton Bearer pour /metrics (sans jeton : administrateurs seulement)
+METRICS_SERVER_TIMING = os.getenv('METRICS_SERVER_TIMING') == 'True'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
 # Simple JWT Configuration
+# Les jetons portent le rôle (claims) ; révocation par version de jeton (TOKEN_VERSION_CACHE_SECONDS)
 SIMPLE_JWT = {
-    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=int(os.getenv('JWT_ACCESS_MINUTES', 60))),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    'TOKEN_OBTAIN_SERIALIZER': 'labeling.serializers.RoleTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'labeling.serializers.RoleTokenRefreshSerializer',
 }
 
 AUTH_USER_MODEL = 'labeling.User'
@@ -0,0 +1,404 @@
+"""
+Accord inter-annotateurs sur tout le jeu de données : kappa de Fleiss, alpha de Krippendorff
+(données nominales), par label et par `data_type`, et accord par paires d'annotateurs.
+
+Les deux coefficients se déduisent de statistiques suffisantes additives par élément
+(seuls les éléments à deux votes ou plus comptent), calculées depuis les décomptes
+`LabelTally` : pour l'élément i de n_i votes dont n_ic pour le label c,
+
+- Fleiss : P_i = Σ_c n_ic (n_ic - 1) / (n_i (n_i - 1)) ; κ = (P̄ - P_e) / (1 - P_e), P_e = Σ_c p_c²
+- Krippendorff : o_cc = Σ_i n_ic (n_ic - 1) / (n_i - 1) ; α = 1 - (n - 1)(n - Σ_c o_cc) / (n² - Σ_c n_c²)
+
+Un recalcul complet lit les décomptes en une passe par `data_type` et calcule ces sommes par
+`np.bincount` sur les lignes (élément, label, votes), sans matrice dense. Ensuite, chaque
+écriture de vote ajoute une ligne `AgreementDelta` (différence des statistiques des éléments
+touchés, calculée avant l'application des deltas de décompte) ; un rafraîchissement ajoute
+ces différences au dernier instantané sans relire le jeu de données. L'accord par paires
+(lu sur les annotations) n'est recalculé que par un recalcul complet.
+
+Les deltas reçoivent une position comme les changements du flux (`changes.publish`) : seulement
+une fois leur transaction terminée, dans l'ordre de fin. Un recalcul complet lit les décomptes
+et la dernière position dans une même transaction REPEATABLE READ ; les deltas visibles sans
+position à ce moment sont déjà dans les décomptes et notés `covered_deltas`, pour être sautés
+par le rafraîchissement qui les rencontrera. Seuls des deltas publiés sont supprimés.
+
+Tant qu'aucun recalcul complet n'a été lancé, les écritures n'enregistrent pas de delta. Le
+premier recalcul ouvre l'enregistrement (`_start_recording`) après la fin des écritures en cours ;
+les workers (`run_workers`) rafraîchissent ensuite l'instantané toutes les AGREEMENT_REFRESH_SECONDS.
+`GET /api/agreement/` ne fait que lire le dernier instantané.
+
+Les instantanés `AgreementSnapshot` sont servis par `GET /api/agreement/`. Une suppression de
+label ou une reconstruction des décomptes (`rebuild_tallies`) demande un recalcul complet.
+"""
+import time
+from dataclasses import dataclass, field
+from itertools import batched
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .changes import publish, writer_txid
+from .consensus import consistent_read, load_matrix
+from .models import AgreementDelta, AgreementSnapshot, DataItem, Label, LabelTally, User
+
+LOAD_BATCH_SIZE = 100_000
+KEEP_SNAPSHOTS = 100
+# Paires d'annotateurs listées (les moins d'accord d'abord)
+MAX_PAIRS = 100
+PER_LABEL = ('totals', 'diag', 'disagreement')
+# Verrou consultatif (PostgreSQL) entre les écritures sans delta et l'ouverture de l'enregistrement
+RECORDING_LOCK = 'labeling.agreement.recording'
+
+
+@dataclass
+class AgreementStats:
+    """Sommes sur les éléments à deux votes ou plus ; les champs par label sont indexés par id de label."""
+    units: int = 0
+    values: int = 0
+    fleiss: float = 0.0
+    totals: dict = field(default_factory=dict)
+    diag: dict = field(default_factory=dict)
+    disagreement: dict = field(default_factory=dict)
+
+    def add(self, other, sign=1):
+        self.units += sign * other.units
+        self.values += sign * other.values
+        self.fleiss += sign * other.fleiss
+        for name in PER_LABEL:
+            mine = getattr(self, name)
+            for label_id, value in getattr(other, name).items():
+                mine[label_id] = mine.get(label_id, 0) + sign * value
+        return self
+
+    def is_zero(self):
+        return not (self.units or self.values or self.fleiss) and not any(
+            value for name in PER_LABEL for value in getattr(self, name).values()
+        )
+
+    def as_json(self):
+        return {
+            'units': self.units, 'values': self.values, 'fleiss': self.fleiss,
+            **{name: {str(label_id): value for label_id, value in getattr(self, name).items()} for name in PER_LABEL},
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            units=data['units'], values=data['values'], fleiss=data['fleiss'],
+            **{name: {int(label_id): value for label_id, value in data[name].items()} for name in PER_LABEL},
+        )
+
+
+def tally_stats(rows):
+    """Statistiques d'un tableau (n, 3) de lignes (item_id, label_id, votes > 0)."""
+    if not len(rows):
+        return AgreementStats()
+    item_ids, items = np.unique(rows[:, 0], return_inverse=True)
+    label_ids, labels = np.unique(rows[:, 1], return_inverse=True)
+    per_item = np.bincount(items, weights=rows[:, 2], minlength=len(item_ids))
+    pairable = per_item >= 2
+
+    keep = pairable[items]
+    labels = labels[keep]
+    c = rows[keep, 2].astype(float)
+    n = per_item[items[keep]]
+    width = len(label_ids)
+    totals = np.bincount(labels, weights=c, minlength=width)
+    diag = np.bincount(labels, weights=c * (c - 1) / (n - 1), minlength=width)
+    disagreement = np.bincount(labels, weights=c * (n - c) / (n * (n - 1)), minlength=width)
+    return AgreementStats(
+        units=int(pairable.sum()),
+        values=int(per_item[pairable].sum()),
+        fleiss=float((c * (c - 1) / (n * (n - 1))).sum()),
+        totals={int(label_id): int(value) for label_id, value in zip(label_ids, totals)},
+        diag={int(label_id): float(value) for label_id, value in zip(label_ids, diag)},
+        disagreement={int(label_id): float(value) for label_id, value in zip(label_ids, disagreement)},
+    )
+
+
+def load_tallies(data_type, batch_size=LOAD_BATCH_SIZE):
+    """Décomptes non nuls des éléments de `data_type`, en tableau (n, 3), lus en flux."""
+    rows = (
+        LabelTally.objects.filter(votes__gt=0, item__data_type=data_type)
+        .order_by().values_list('item_id', 'label_id', 'votes')
+    )
+    chunks = [np.array(chunk, dtype=np.int64) for chunk in batched(rows.iterator(chunk_size=batch_size), batch_size)]
+    return np.concatenate(chunks) if chunks else np.empty((0, 3), dtype=np.int64)
+
+
+def _rows(counts):
+    """{item_id: {label_id: votes}} → tableau (n, 3)."""
+    rows = [(item_id, label_id, votes) for item_id, labels in counts.items() for label_id, votes in labels.items() if votes]
+    return np.array(rows, dtype=np.int64).reshape(-1, 3)
+
+
+def _requested():
+    # Un delta non publié sert de marque entre l'ouverture de l'enregistrement et le premier instantané
+    return AgreementSnapshot.objects.exists() or AgreementDelta.objects.exists()
+
+
+def _recording():
+    """Vrai si l'accord a été demandé : les écritures doivent alors enregistrer leurs deltas."""
+    if _requested():
+        return True
+    if connection.vendor == 'postgresql':
+        # Gardé jusqu'à la fin de la transaction d'écriture, que `_start_recording` attend
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock_shared(hashtext(%s))', [RECORDING_LOCK])
+        return _requested()
+    return False
+
+
+def _start_recording():
+    """
+    Ouvre l'enregistrement des deltas avant le premier recalcul complet. Les écritures qui n'en
+    ont pas enregistré se terminent d'abord : le recalcul qui suit lit leurs décomptes.
+    """
+    if _requested():
+        return
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [RECORDING_LOCK])
+        AgreementDelta.objects.create(data_type=DataItem.TYPES[0][0], stats=AgreementStats().as_json(), txid=writer_txid())
+
+
+def record_vote_deltas(deltas):
+    """
+    Enregistre la variation des statistiques due aux deltas de votes `{(item_id, label_id): delta}`.
+    À appeler avant `apply_tally_deltas` : l'état précédent est lu dans les décomptes.
+    """
+    item_ids = {item_id for (item_id, _), delta in deltas.items() if delta}
+    if not item_ids or not _recording():
+        return
+    types, before = {}, {}
+    tallies = DataItem.objects.filter(id__in=item_ids).values_list('id', 'data_type', 'tallies__label_id', 'tallies__votes')
+    for item_id, data_type, label_id, votes in tallies:
+        types[item_id] = data_type
+        labels = before.setdefault(item_id, {})
+        if label_id is not None:
+            labels[label_id] = votes
+    # Décomptes absents (suppression en cascade de l'élément) : rien à retirer, cf. `record_items_removed`
+    after = {item_id: dict(labels) for item_id, labels in before.items() if labels}
+    for (item_id, label_id), delta in deltas.items():
+        if item_id in after:
+            after[item_id][label_id] = max(after[item_id].get(label_id, 0) + delta, 0)
+        elif item_id in types and delta > 0:
+            after[item_id] = {label_id: delta}
+    _record({
+        data_type: (
+            {item_id: before.get(item_id, {}) for item_id in after if types[item_id] == data_type},
+            {item_id: labels for item_id, labels in after.items() if types[item_id] == data_type},
+        )
+        for data_type in set(types.values())
+    })
+
+
+def record_items_removed(item_ids):
+    """Retire la contribution d'éléments sur le point d'être supprimés (décomptes encore présents)."""
+    if not _recording():
+        return
+    counts = {}
+    tallies = LabelTally.objects.filter(item_id__in=item_ids, votes__gt=0).values_list('item_id', 'item__data_type', 'label_id', 'votes')
+    for item_id, data_type, label_id, votes in tallies:
+        counts.setdefault(data_type, {}).setdefault(item_id, {})[label_id] = votes
+    _record({data_type: (items, {}) for data_type, items in counts.items()})
+
+
+def _record(changes):
+    """`changes` : {data_type: (décomptes avant, décomptes après)} ; un delta par data_type non nul."""
+    deltas, txid = [], writer_txid()
+    for data_type, (before, after) in changes.items():
+        stats = tally_stats(_rows(after)).add(tally_stats(_rows(before)), sign=-1)
+        if not stats.is_zero():
+            deltas.append(AgreementDelta(data_type=data_type, stats=stats.as_json(), txid=txid))
+    AgreementDelta.objects.bulk_create(deltas)
+
+
+def pairwise_agreement(matrix, min_shared=None):
+    """
+    Accord par paires d'annotateurs : pour chaque couple ayant annoté un même élément, part des
+    éléments communs où leurs labels coïncident. Les annotations triées par élément sont comparées
+    à leurs voisines de rang d (d = 1, 2, …) : une passe vectorisée par rang, sans boucle par paire.
+    """
+    min_shared = settings.AGREEMENT_MIN_SHARED_ITEMS if min_shared is None else min_shared
+    order = np.lexsort((matrix.users, matrix.items))
+    items, users, labels = matrix.items[order], matrix.users[order], matrix.labels[order]
+    n_users = len(matrix.user_ids)
+
+    keys, agreed = [], []
+    offset = 1
+    while offset < len(items):
+        same = items[offset:] == items[:-offset]
+        if not same.any():
+            break
+        first, second = users[:-offset][same], users[offset:][same]
+        keys.append(first * n_users + second)
+        agreed.append(labels[:-offset][same] == labels[offset:][same])
+        offset += 1
+    if not keys:
+        return {'pairs': 0, 'agreement': None, 'annotators': [], 'pairs_detail': []}
+    keys, agreed = np.concatenate(keys), np.concatenate(agreed)
+
+    pair_keys, inverse = np.unique(keys, return_inverse=True)
+    shared = np.bincount(inverse)
+    agreements = np.bincount(inverse, weights=agreed)
+    first, second = pair_keys // n_users, pair_keys % n_users
+    per_user = np.bincount(first, weights=shared, minlength=n_users) + np.bincount(second, weights=shared, minlength=n_users)
+    per_user_agreed = (
+        np.bincount(first, weights=agreements, minlength=n_users) + np.bincount(second, weights=agreements, minlength=n_users)
+    )
+
+    names = dict(User.objects.filter(id__in=matrix.user_ids.tolist()).values_list('id', 'username'))
+    annotators = [
+        {"user_id": int(user_id), "username": names.get(int(user_id)), "pairs": int(per_user[index]),
+         "agreement": round(float(per_user_agreed[index] / per_user[index]), 4)}
+        for index, user_id in enumerate(matrix.user_ids) if per_user[index]
+    ]
+    listed = np.flatnonzero(shared >= min_shared)
+    listed = listed[np.argsort(agreements[listed] / shared[listed], kind='stable')][:MAX_PAIRS]
+    return {
+        "pairs": int(len(keys)),
+        "agreement": round(float(agreed.mean()), 4),
+        "annotators": sorted(annotators, key=lambda row: row["agreement"]),
+        "pairs_detail": [
+            {"users": [int(matrix.user_ids[first[index]]), int(matrix.user_ids[second[index]])],
+             "shared_items": int(shared[index]), "agreement": round(float(agreements[index] / shared[index]), 4)}
+            for index in listed
+        ],
+    }
+
+
+def _ratio(numerator, denominator):
+    return numerator / denominator if denominator else None
+
+
+def _round(value):
+    return None if value is None else round(value, 4)
+
+
+def metrics(stats, label_names):
+    """Coefficients calculés à partir des statistiques suffisantes `stats`."""
+    n = stats.values
+    label_ids = sorted(label_id for label_id, total in stats.totals.items() if total)
+    shares = {label_id: stats.totals[label_id] / n for label_id in label_ids}
+    observed = _ratio(stats.fleiss, stats.units)
+    expected = sum(share ** 2 for share in shares.values())
+    kappa = (observed - expected) / (1 - expected) if observed is not None and expected < 1 else None
+    squares = sum(stats.totals[label_id] ** 2 for label_id in label_ids)
+    disagreement = _ratio((n - 1) * (n - sum(stats.diag.get(label_id, 0) for label_id in label_ids)), n * n - squares)
+    alpha = 1 - disagreement if disagreement is not None else None
+
+    per_label = []
+    for label_id in label_ids:
+        share, total = shares[label_id], stats.totals[label_id]
+        kappa_label = _ratio(stats.disagreement[label_id], stats.units * share * (1 - share))
+        alpha_label = _ratio((n - 1) * (total - stats.diag[label_id]), total * (n - total))
+        per_label.append({
+            "label_id": label_id,
+            "label": label_names.get(label_id),
+            "share": _round(share),
+            "fleiss_kappa": _round(None if kappa_label is None else 1 - kappa_label),
+            "krippendorff_alpha": _round(None if alpha_label is None else 1 - alpha_label),
+        })
+    return {
+        "items": stats.units,
+        "annotations": n,
+        "observed_agreement": _round(observed),
+        "expected_agreement": _round(expected if label_ids else None),
+        "fleiss_kappa": _round(kappa),
+        "krippendorff_alpha": _round(alpha),
+        "labels": per_label,
+    }
+
+
+def snapshot_data(snapshot, label_names=None):
+    """Corps de `GET /api/agreement/` : ensemble du jeu de données, puis par `data_type`."""
+    by_type = {data_type: AgreementStats.from_json(stats) for data_type, stats in snapshot.stats.items()}
+    overall = AgreementStats()
+    for stats in by_type.values():
+        overall.add(stats)
+    if label_names is None:
+        label_names = dict(Label.objects.values_list('id', 'name'))
+    return {
+        "snapshot": snapshot.pk,
+        "computed_at": snapshot.created_at,
+        "full": snapshot.full,
+        "pairwise_computed_at": snapshot.pairwise_at,
+        "overall": metrics(overall, label_names),
+        "by_data_type": {data_type: metrics(stats, label_names) for data_type, stats in sorted(by_type.items())},
+        "pairwise": snapshot.pairwise,
+    }
+
+
+def _prune(cursor):
+    # Deltas publiés seulement : ceux des transactions en cours n'ont pas de position
+    AgreementDelta.objects.filter(position__lte=cursor).delete()
+    stale = list(AgreementSnapshot.objects.order_by('-id').values_list('id', flat=True)[KEEP_SNAPSHOTS:KEEP_SNAPSHOTS + 1])
+    if stale:
+        AgreementSnapshot.objects.filter(id__lte=stale[0]).delete()
+
+
+def _publish():
+    # Les deltas publiés sont supprimés une fois inclus : la numérotation reprend après le dernier curseur
+    publish(AgreementDelta, floor=AgreementSnapshot.objects.order_by('-id').values('delta_cursor')[:1])
+
+
+def compute_snapshot(log=None):
+    """Recalcul complet depuis les décomptes et les annotations ; retourne l'instantané créé."""
+    started = time.monotonic()
+    _start_recording()
+    _publish()
+    stats = {}
+    with consistent_read():
+        for data_type, _ in DataItem.TYPES:
+            stats[data_type] = tally_stats(load_tallies(data_type)).as_json()
+            if log:
+                log(f"Décomptes {data_type} lus")
+        # Même état que les décomptes lus : les deltas publiés jusqu'au curseur et ceux encore
+        # sans position y sont inclus, les suivants non
+        cursor = AgreementDelta.objects.aggregate(cursor=Max('position'))['cursor'] or 0
+        covered = list(AgreementDelta.objects.filter(position=None).order_by('id').values_list('id', flat=True))
+    pairwise = pairwise_agreement(load_matrix())
+    with transaction.atomic():
+        snapshot = AgreementSnapshot.objects.create(
+            full=True, delta_cursor=cursor, covered_deltas=covered, stats=stats, pairwise=pairwise,
+            pairwise_at=timezone.now(), duration_seconds=time.monotonic() - started,
+        )
+        _prune(cursor)
+    return snapshot
+
+
+def refresh_snapshot():
+    """
+    Ajoute au dernier instantané les deltas de votes publiés depuis ; retourne le nouvel instantané
+    (le dernier s'il n'y a rien à ajouter, None s'il n'existe aucun instantané).
+    """
+    base = AgreementSnapshot.objects.order_by('-id').first()
+    if base is None:
+        return None
+    started = time.monotonic()
+    _publish()
+    stats = {data_type: AgreementStats.from_json(data) for data_type, data in base.stats.items()}
+    covered = set(base.covered_deltas)
+    cursor = base.delta_cursor
+    for delta in AgreementDelta.objects.filter(position__gt=base.delta_cursor).order_by('position').iterator():
+        if delta.pk in covered:
+            covered.discard(delta.pk)
+        else:
+            stats.setdefault(delta.data_type, AgreementStats()).add(AgreementStats.from_json(delta.stats))
+        cursor = delta.position
+    if cursor == base.delta_cursor:
+        return base
+    with transaction.atomic():
+        snapshot = AgreementSnapshot.objects.create(
+            full=False, delta_cursor=cursor, covered_deltas=sorted(covered),
+            stats={data_type: s.as_json() for data_type, s in stats.items()},
+            pairwise=base.pairwise, pairwise_at=base.pairwise_at, duration_seconds=time.monotonic() - started,
+        )
+        _prune(base.delta_cursor)
+    return snapshot
+
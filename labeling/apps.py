@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class LabelingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'labeling'
+
+    def ready(self):
+        from . import db_routing, metrics, renderers, signals  # noqa: F401
@@ -0,0 +1,135 @@
+"""
+Archivage des éléments inactifs.
+
+`archive_items` déplace par lots les éléments inactifs (`is_active=False`), leurs annotations
+et leurs validations vers les tables froides `ArchivedDataItem`, `ArchivedAnnotation` et
+`ArchivedValidation` : un INSERT ... SELECT par table puis la suppression des lignes chaudes,
+dans une transaction par lot. Les tables chaudes (listes, file d'attribution, consensus,
+exports) ne portent plus que les données servies. `restore_items` fait le chemin inverse avec
+les mêmes identifiants et les mêmes dates.
+
+Pour le reste de l'application, archiver vaut suppression et restaurer vaut création :
+décomptes de votes, statistiques, routage et cache sont mis à jour en lot par les fonctions
+`on_*` de `signals.py`, et le journal des changements reçoit `archived` / `restored`.
+Les champs d'un clip audio sont conservés dans `ArchivedDataItem.audio` ; le fichier reste
+sous MEDIA_ROOT.
+"""
+from django.db import connection, transaction
+from django.forms.models import model_to_dict
+
+from . import changes
+from .models import (
+    Annotation, ArchivedAnnotation, ArchivedDataItem, ArchivedValidation, AudioClip, DataItem, Validation,
+)
+from .signals import (
+    on_annotations_created, on_annotations_deleted, on_items_created, on_items_deleted, on_validations_created,
+    on_validations_deleted, quiet_deletes,
+)
+
+ARCHIVE_BATCH_SIZE = 500
+
+# Champs recopiés tels quels entre tables chaudes et tables d'archive (mêmes noms des deux côtés)
+ITEM_FIELDS = ('id', 'content', 'data_type', 'is_active', 'created_at')
+ANNOTATION_FIELDS = ('id', 'item', 'user', 'label', 'created_at')
+VALIDATION_FIELDS = ('id', 'annotation', 'validator', 'is_approved', 'feedback', 'validated_at')
+
+
+def _copy_rows(source, target, fields, ids):
+    """
+    INSERT INTO `target` ... SELECT ... FROM `source` WHERE id IN `ids`, sans passer par Python
+    (ni `auto_now_add` : les dates d'origine sont conservées). Les autres champs de `target`
+    reçoivent leur valeur par défaut.
+    """
+    if not ids:
+        return
+    qn = connection.ops.quote_name
+    defaults = [f for f in target._meta.concrete_fields if f.name not in fields]
+    columns = [target._meta.get_field(name).column for name in fields] + [f.column for f in defaults]
+    selected = [qn(source._meta.get_field(name).column) for name in fields] + ['%s'] * len(defaults)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {qn(target._meta.db_table)} ({', '.join(qn(column) for column in columns)}) "
+            f"SELECT {', '.join(selected)} FROM {qn(source._meta.db_table)} "
+            f"WHERE {qn(source._meta.pk.column)} IN ({', '.join(['%s'] * len(ids))})",
+            [f.get_db_prep_save(f.get_default(), connection) for f in defaults] + list(ids),
+        )
+
+
+def archive_batch(batch_size=ARCHIVE_BATCH_SIZE):
+    """Archive un lot d'éléments inactifs ; retourne le nombre d'éléments déplacés."""
+    with transaction.atomic():
+        inactive = DataItem.objects.filter(is_active=False).order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            inactive = inactive.select_for_update(skip_locked=True)
+        item_ids = list(inactive.values_list('id', flat=True)[:batch_size])
+        if not item_ids:
+            return 0
+        annotations = list(Annotation.objects.filter(item_id__in=item_ids))
+        validations = list(Validation.objects.filter(annotation__item_id__in=item_ids))
+
+        _copy_rows(DataItem, ArchivedDataItem, ITEM_FIELDS, item_ids)
+        _copy_rows(Annotation, ArchivedAnnotation, ANNOTATION_FIELDS, [a.pk for a in annotations])
+        _copy_rows(Validation, ArchivedValidation, VALIDATION_FIELDS, [v.pk for v in validations])
+        for clip in AudioClip.objects.filter(item_id__in=item_ids):
+            audio = model_to_dict(clip, exclude=['item'])
+            audio['file'] = clip.file.name
+            ArchivedDataItem.objects.filter(pk=clip.item_id).update(audio=audio)
+
+        # Effets de bord d'une suppression, appliqués en lot avant que les lignes disparaissent
+        on_validations_deleted(validations)
+        on_annotations_deleted(annotations)
+        on_items_deleted(item_ids)
+        changes.record('validation', 'archived', validations)
+        changes.record('annotation', 'archived', annotations)
+        changes.record('item', 'archived', [DataItem(pk=item_id) for item_id in item_ids])
+        with quiet_deletes():
+            DataItem.objects.filter(id__in=item_ids).delete()
+    return len(item_ids)
+
+
+def archive_items(batch_size=ARCHIVE_BATCH_SIZE, limit=None, progress=None):
+    """Archive les éléments inactifs par lots de `batch_size` (au plus `limit`) ; retourne leur nombre."""
+    archived = 0
+    while limit is None or archived < limit:
+        moved = archive_batch(batch_size if limit is None else min(batch_size, limit - archived))
+        if not moved:
+            break
+        archived += moved
+        if progress:
+            progress(archived)
+    return archived
+
+
+def restore_items(item_ids, activate=True):
+    """
+    Ramène les éléments archivés `item_ids` dans les tables chaudes, avec leurs annotations et
+    validations ; `activate` les remet dans la file. Retourne les identifiants restaurés.
+    """
+    with transaction.atomic():
+        archived = ArchivedDataItem.objects.filter(id__in=item_ids).order_by('id')
+        if connection.features.has_select_for_update:
+            archived = archived.select_for_update()
+        audio = dict(archived.values_list('id', 'audio'))
+        item_ids = list(audio)
+        if not item_ids:
+            return []
+        annotation_ids = list(ArchivedAnnotation.objects.filter(item_id__in=item_ids).values_list('id', flat=True))
+        validation_ids = list(
+            ArchivedValidation.objects.filter(annotation_id__in=annotation_ids).values_list('id', flat=True)
+        )
+
+        _copy_rows(ArchivedDataItem, DataItem, ITEM_FIELDS, item_ids)
+        _copy_rows(ArchivedAnnotation, Annotation, ANNOTATION_FIELDS, annotation_ids)
+        _copy_rows(ArchivedValidation, Validation, VALIDATION_FIELDS, validation_ids)
+        AudioClip.objects.bulk_create(
+            AudioClip(item_id=item_id, **fields) for item_id, fields in audio.items() if fields
+        )
+        if activate:
+            DataItem.objects.filter(id__in=item_ids).update(is_active=True)
+
+        # Effets de bord d'une création : places dans la file, décomptes, routage, statistiques
+        on_items_created(list(DataItem.objects.filter(id__in=item_ids)), change='restored')
+        on_annotations_created(list(Annotation.objects.filter(id__in=annotation_ids)), change='restored')
+        on_validations_created(list(Validation.objects.filter(id__in=validation_ids)), change='restored')
+        ArchivedDataItem.objects.filter(id__in=item_ids).delete()
+    return item_ids
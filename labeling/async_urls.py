@@ -0,0 +1,12 @@
+from django.urls import path
+
+from labeling import async_views
+
+# Mêmes noms que les routes du routeur : reverse() et les métriques par vue restent inchangés
+urlpatterns = [
+    path('data-items/', async_views.data_item_list, name='dataitem-list'),
+    path('data-items/pending/', async_views.data_item_pending, name='dataitem-pending'),
+    path('data-items/<int:pk>/progress/', async_views.data_item_progress, name='dataitem-progress'),
+    path('annotations/<int:pk>/consensus/', async_views.annotation_consensus, name='annotation-consensus'),
+    path('users/<int:pk>/stats/', async_views.user_stats, name='user-stats'),
+]
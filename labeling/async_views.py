@@ -0,0 +1,180 @@
+"""
+Versions asynchrones (ASGI) des lectures les plus sollicitées : liste des éléments,
+`pending`, `progress`, `consensus` et `stats` d'un utilisateur.
+
+Chaque vue réutilise le ViewSet synchrone correspondant : même négociation de contenu, mêmes
+permissions (`get_permissions`) et limitations de débit (`get_throttles`), même queryset, même
+pagination, mêmes lignes (`value_rows`) et mêmes corps de réponse ; les lectures unitaires passent
+par l'ORM asynchrone, la page d'une liste par la pagination de DRF exécutée dans un thread. Les cas
+qui sortent du chemin rapide (autre méthode que GET, authentification par session ou sans jeton
+Bearer, rendu autre que JSON comme l'API navigable, type refusé) sont délégués tels quels à la vue
+synchrone. Le versionnement d'API de DRF n'est pas appliqué (aucun n'est configuré).
+
+Montées devant le routeur par `core/asgi_urls.py` quand ASYNC_VIEWS est actif.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.views import exception_handler
+
+from . import response_cache
+from .authentication import AsyncJWTAuthentication
+from .db_routing import areplica_for, read_alias
+from .pagination import apaginate_queryset
+from .stats import aannotation_counts
+from .tallies import aitem_tallies
+from .views import AnnotationViewSet, DataItemViewSet, UserViewSet
+
+authenticator = AsyncJWTAuthentication()
+
+
+def _render(data, status_code, view, headers=()):
+    request = view.request
+    renderer = request.accepted_renderer
+    content = renderer.render(data, request.accepted_media_type, {'view': view, 'request': request})
+    return _finalize(HttpResponse(content, status=status_code, content_type=renderer.media_type), view, headers)
+
+
+def _finalize(response, view, headers=()):
+    response['Allow'] = ', '.join(view.allowed_methods)
+    response['Vary'] = 'Accept'
+    for name, value in headers:
+        response[name] = value
+    return response
+
+
+def _fast_path(request):
+    return request.method == 'GET' and request.headers.get('Authorization', '').startswith('Bearer ')
+
+
+def _negotiate(view, request):
+    """Rendu choisi par la négociation de DRF ; None pour un rendu autre que JSON ou un type refusé (vue synchrone)."""
+    try:
+        renderer, media_type = view.perform_content_negotiation(request)
+    except exceptions.NotAcceptable:
+        return None
+    if renderer.format != 'json':
+        return None
+    request.accepted_renderer, request.accepted_media_type = renderer, media_type
+    return renderer
+
+
+def _check_permissions(view, request, obj=None):
+    for permission in view.get_permissions():
+        allowed = (
+            permission.has_permission(request, view) if obj is None
+            else permission.has_object_permission(request, view, obj)
+        )
+        if not allowed:
+            view.permission_denied(
+                request, message=getattr(permission, 'message', None), code=getattr(permission, 'code', None)
+            )
+
+
+def async_action(viewset, action):
+    """
+    Construit une vue asynchrone pour `viewset.action` ; `handler(view, request, **kwargs)`
+    retourne (corps, statut) ou une entrée du cache de réponses.
+    """
+    extra = getattr(getattr(viewset, action), 'kwargs', {}) if action not in ('list', 'retrieve') else {}
+    sync_view = sync_to_async(viewset.as_view({'get': action}, **extra))
+
+    def decorator(handler):
+        @wraps(handler)
+        async def view(request, **kwargs):
+            if not _fast_path(request):
+                return await sync_view(request, **kwargs)
+
+            drf_view = viewset(action=action, args=(), kwargs=kwargs, format_kwarg=None, **extra)
+            drf_view.action_map = {'get': action, 'head': action}
+            drf_view.get = drf_view.head = getattr(drf_view, action)
+            drf_request = Request(request)
+            drf_view.request = drf_request
+            if _negotiate(drf_view, drf_request) is None:
+                return await sync_view(request, **kwargs)
+            try:
+                user_auth = await authenticator.aauthenticate(drf_request)
+                if user_auth is None:
+                    return await sync_view(request, **kwargs)
+                drf_request.user, drf_request.auth = user_auth
+                _check_permissions(drf_view, drf_request)
+                if drf_view.get_throttles():
+                    await sync_to_async(drf_view.check_throttles)(drf_request)
+                token = read_alias.set(await areplica_for(drf_request, action))
+                try:
+                    result = await handler(drf_view, drf_request, **kwargs)
+                finally:
+                    read_alias.reset(token)
+            except (exceptions.APIException, Http404) as exc:
+                if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                    exc.auth_header = authenticator.authenticate_header(drf_request)
+                response = exception_handler(exc, {'view': drf_view, 'request': drf_request})
+                headers = [(name, response[name]) for name in ('WWW-Authenticate', 'Retry-After') if response.has_header(name)]
+                return _render(response.data, response.status_code, drf_view, headers)
+            if isinstance(result, response_cache.CachedResponse):
+                not_modified = response_cache.not_modified(request, result)
+                if not_modified is not None:
+                    return _finalize(not_modified, drf_view)
+                return _render(result.data, result.status, drf_view, result.headers.items())
+            return _render(*result, drf_view)
+
+        view.csrf_exempt = True
+        return view
+    return decorator
+
+
+async def aget_object(view, pk):
+    """Équivalent de `GenericAPIView.get_object` pour une clé primaire entière."""
+    queryset = view.filter_queryset(view.get_queryset())
+    obj = await queryset.filter(pk=pk).afirst()
+    if obj is None:
+        raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+    _check_permissions(view, view.request, obj)
+    return obj
+
+
+async def _paginated(view, request, queryset):
+    names = view.sparse_fields()
+    queryset = view.value_rows.queryset(queryset, names, view.cursor_columns())
+    page = await apaginate_queryset(view.paginator, queryset, request, view)
+    if page is None:
+        return view.value_rows.rows([row async for row in queryset], names), 200
+    return view.get_paginated_response(view.value_rows.rows(page, names)).data, 200
+
+
+@async_action(DataItemViewSet, 'list')
+async def data_item_list(view, request):
+    return await _paginated(view, request, view.get_queryset())
+
+
+@async_action(DataItemViewSet, 'pending')
+async def data_item_pending(view, request):
+    return await _paginated(view, request, view.pending_queryset())
+
+
+@async_action(DataItemViewSet, 'progress')
+async def data_item_progress(view, request, pk):
+    async def compute():
+        return DataItemViewSet.progress_data(await aget_object(view, pk)), 200
+
+    return await response_cache.PROGRESS.afetch(pk, compute)
+
+
+@async_action(AnnotationViewSet, 'consensus')
+async def annotation_consensus(view, request, pk):
+    async def compute():
+        return AnnotationViewSet.consensus_data(await aitem_tallies(pk))
+
+    return await response_cache.CONSENSUS.afetch(pk, compute)
+
+
+@async_action(UserViewSet, 'stats')
+async def user_stats(view, request, pk):
+    async def compute():
+        user = await aget_object(view, pk)
+        return UserViewSet.stats_data(user, await aannotation_counts(user)), 200
+
+    return await response_cache.STATS.afetch(pk, compute)
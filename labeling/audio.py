@@ -0,0 +1,190 @@
+"""
+Éléments audio stockés localement.
+
+Import : un enregistrement WAV est lu segment par segment (AUDIO_SEGMENT_SECONDS),
+chaque segment est écrit dans son propre fichier WAV sous MEDIA_ROOT et devient un
+`DataItem` avec son `AudioClip`. Les pics de forme d'onde (min/max par fenêtre de
+1/AUDIO_PEAKS_PER_SECOND s, tous canaux confondus, ramenés sur un octet signé) sont
+calculés avec numpy pendant la lecture : l'interface dessine la forme d'onde sans
+télécharger le fichier. Si l'import échoue, sa transaction est annulée et les fichiers
+déjà écrits sont supprimés. Supprimer un élément supprime son fichier une fois la
+suppression validée (`signals.py`) ; l'archivage le conserve.
+
+Lecture : `audio_response` sert le fichier avec les requêtes partielles HTTP (Range).
+Le corps est un `FileResponse` sur un fichier borné à la plage demandée : derrière un
+serveur WSGI qui expose `wsgi.file_wrapper` (gunicorn, uWSGI), il part par `sendfile`
+sans copie en espace utilisateur. Un élément audio importé comme simple URL (`content`,
+sans `AudioClip`) n'a ni fichier ni pics : `audio` et `waveform` répondent 409.
+"""
+import io
+import os
+import re
+import uuid
+import wave
+
+import numpy as np
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.http import FileResponse, Http404, HttpResponse
+
+from .models import AudioClip, DataItem
+
+# Échantillons bruts par largeur (octets) ; 24 bits est converti à part
+SAMPLE_DTYPES = {1: np.uint8, 2: np.int16, 4: np.int32}
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _samples(frames, sampwidth):
+    """Échantillons entrelacés (entiers signés) et pleine échelle de leur format."""
+    if sampwidth == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        return (raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)) << 8 >> 8, 1 << 23
+    values = np.frombuffer(frames, dtype=SAMPLE_DTYPES[sampwidth])
+    if sampwidth == 1:
+        return values.astype(np.int16) - 128, 128
+    return values, np.iinfo(values.dtype).max + 1
+
+
+def compute_peaks(frames, sampwidth, channels, sample_rate, peaks_per_second):
+    """Liste plate [min, max, min, max, ...] par fenêtre, entiers de -127 à 127."""
+    samples, full_scale = _samples(frames, sampwidth)
+    if not samples.size:
+        return []
+    window = max(1, sample_rate // peaks_per_second) * channels
+    padded = np.pad(samples, (0, -samples.size % window), mode='edge').reshape(-1, window)
+    pairs = np.stack([padded.min(axis=1), padded.max(axis=1)], axis=1) / full_scale
+    return np.clip(np.rint(pairs * 127), -127, 127).astype(int).ravel().tolist()
+
+
+def _wav_bytes(params, frames):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as writer:
+        writer.setparams(params)
+        writer.writeframes(frames)
+    return buffer.getvalue()
+
+
+def import_audio(fileobj, source, segment_seconds=None, peaks_per_second=None, is_active=True):
+    """
+    Découpe le WAV `fileobj` en segments et crée un `DataItem` audio par segment.
+    Lève ValueError si le fichier n'est pas un WAV PCM lisible. Retourne les éléments créés.
+    """
+    segment_seconds = segment_seconds or settings.AUDIO_SEGMENT_SECONDS
+    peaks_per_second = peaks_per_second or settings.AUDIO_PEAKS_PER_SECOND
+    try:
+        reader = wave.open(fileobj, 'rb')
+    except (wave.Error, EOFError) as exc:
+        raise ValueError(f"fichier WAV illisible : {exc}") from exc
+
+    folder = f'audio/{uuid.uuid4().hex}'
+    created, written = [], []
+    try:
+        with reader, transaction.atomic():
+            params = reader.getparams()
+            if params.sampwidth not in (1, 2, 3, 4):
+                raise ValueError(f"largeur d'échantillon non prise en charge : {params.sampwidth} octets")
+            frames_per_segment = max(1, int(segment_seconds * params.framerate))
+            index = 0
+            while frames := reader.readframes(frames_per_segment):
+                frame_count = len(frames) // (params.sampwidth * params.nchannels)
+                item = DataItem.objects.create(content='', data_type='audio', is_active=is_active)
+                clip = AudioClip(
+                    item=item, source=source, segment_index=index,
+                    start_seconds=index * frames_per_segment / params.framerate,
+                    duration_seconds=frame_count / params.framerate,
+                    sample_rate=params.framerate, channels=params.nchannels, peaks_per_second=peaks_per_second,
+                    peaks=compute_peaks(frames, params.sampwidth, params.nchannels, params.framerate, peaks_per_second),
+                )
+                clip.file.save(f'{folder}/{index:05d}.wav', ContentFile(_wav_bytes(params, frames)), save=False)
+                written.append(clip.file.name)
+                clip.save()
+                item.content = clip.file.name
+                item.save(update_fields=['content'])
+                created.append(item)
+                index += 1
+    except BaseException:
+        # Transaction annulée : les fichiers déjà écrits n'appartiennent à aucune ligne
+        for name in written:
+            AudioClip.file.field.storage.delete(name)
+        raise
+    if not created:
+        raise ValueError("fichier WAV vide")
+    return created
+
+
+class RangeFile(io.RawIOBase):
+    """Fichier ouvert en lecture, positionné sur `start` et limité à `length` octets."""
+
+    def __init__(self, path, start, length):
+        self._file = open(path, 'rb')
+        self._file.seek(start)
+        self._remaining = length
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def byte_range(header, size):
+    """
+    (début, fin incluse) de l'en-tête Range `bytes=a-b`, `bytes=a-` ou `bytes=-n` ;
+    None si absent, multiple ou invalide (b < a) : réponse complète. ValueError si non satisfiable.
+    """
+    match = RANGE_PATTERN.match(header or '')
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '':
+        start, end = max(0, size - int(last)), size - 1
+    elif last and int(last) < int(first):
+        # Plage invalide (RFC 7233, 2.1) : l'en-tête est ignoré
+        return None
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("plage non satisfiable")
+    return start, end
+
+
+def audio_response(request, clip):
+    """Réponse partielle ou complète sur le fichier du segment ; 404 si le fichier a disparu du stockage."""
+    path = clip.file.path
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        raise Http404("Fichier audio introuvable.") from None
+    try:
+        span = byte_range(request.headers.get('Range'), size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    start, end = span or (0, size - 1)
+    try:
+        body = RangeFile(path, start, end - start + 1)
+    except FileNotFoundError:
+        raise Http404("Fichier audio introuvable.") from None
+    response = FileResponse(body, content_type='audio/wav')
+    response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    # Les fichiers de segments ne sont jamais réécrits
+    response['Cache-Control'] = 'private, max-age=86400'
+    if span:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
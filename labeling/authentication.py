@@ -0,0 +1,148 @@
+"""
+Authentification JWT sans lecture de la table des utilisateurs.
+
+Les jetons émis par `/api/login/` et `/api/token/refresh/` portent le rôle, le nom,
+le statut staff et la version de jeton (`ver`) de l'utilisateur. `RoleTokenAuthentication`
+construit `request.user` à partir de ces claims : les permissions par rôle et les
+`perform_create` (qui n'ont besoin que de l'id) ne touchent plus la base.
+
+Révocation : un changement de rôle, de statut actif ou staff incrémente `User.token_version`
+(par `save()` comme par `User.objects.update()`), et les jetons d'une version antérieure sont
+refusés. La version courante est gardée en cache TOKEN_VERSION_CACHE_SECONDS secondes ; la
+révocation y publie la nouvelle version, une entrée absente ou expirée est relue en base. Avec un
+cache partagé (Redis), la révocation est immédiate pour tous les processus ; avec le cache local
+par défaut, les autres workers la voient au plus tard à l'expiration de leur entrée. Les jetons sans
+claim `role` (émis avant ce mécanisme) sont authentifiés par lecture en base.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+
+ROLE_CLAIM = 'role'
+VERSION_CLAIM = 'ver'
+
+
+def token_claims(user):
+    """Claims ajoutés aux jetons de `user` (copiés du jeton de rafraîchissement vers le jeton d'accès)."""
+    return {
+        ROLE_CLAIM: user.role,
+        VERSION_CLAIM: user.token_version,
+        'username': user.get_username(),
+        'is_staff': user.is_staff,
+    }
+
+
+def revocation_key(user_id):
+    return f'labeling:token-version:{user_id}'
+
+
+def _timeout():
+    # Borne le retard d'une révocation dans un cache local à un autre processus
+    return settings.TOKEN_VERSION_CACHE_SECONDS
+
+
+def revoke_tokens(user_id, version):
+    """Refuse les jetons d'accès de `user_id` antérieurs à `version` jusqu'à leur expiration."""
+    cache.set(revocation_key(user_id), version, timeout=_timeout())
+
+
+def forget_token_versions(user_ids):
+    """Retire les versions en cache : elles seront relues en base (après un `update()` en masse)."""
+    cache.delete_many([revocation_key(user_id) for user_id in user_ids])
+
+
+def _stored_version(user_id):
+    return get_user_model().objects.filter(pk=user_id).values_list('token_version', flat=True).first()
+
+
+def token_version(user_id):
+    """Version de jeton courante de `user_id` (None s'il n'existe plus)."""
+    version = cache.get(revocation_key(user_id))
+    if version is None:
+        version = _stored_version(user_id)
+        # `add` : une révocation publiée entre-temps n'est pas écrasée par la valeur lue
+        if version is not None:
+            cache.add(revocation_key(user_id), version, timeout=_timeout())
+    return version
+
+
+async def atoken_version(user_id):
+    version = await cache.aget(revocation_key(user_id))
+    if version is None:
+        version = await sync_to_async(_stored_version)(user_id)
+        if version is not None:
+            await cache.aadd(revocation_key(user_id), version, timeout=_timeout())
+    return version
+
+
+def _check_version(validated_token, current):
+    if current is None:
+        raise AuthenticationFailed(_("User not found"), code="user_not_found")
+    if validated_token.get(VERSION_CLAIM, 0) < current:
+        raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+
+
+def user_reference(user):
+    """
+    Instance de `User` pour les clés étrangères (`Annotation.user`, `Validation.validator`)
+    construite depuis `request.user` sans requête. Les champs absents des claims sont différés
+    et chargés à la demande comme pour un `.only()`.
+    """
+    model = get_user_model()
+    if isinstance(user, model):
+        return user
+    values = {'id': user.id, 'username': user.username, 'role': user.role, 'is_staff': user.is_staff}
+    names = [field.attname for field in model._meta.concrete_fields if field.attname in values]
+    return model.from_db(DEFAULT_DB_ALIAS, names, [values[name] for name in names])
+
+
+class RoleTokenAuthentication(JWTStatelessUserAuthentication):
+    """
+    `request.user` est un `TokenUser` construit depuis les claims du jeton
+    (`request.user.role` lit le claim `role`). Seule la version de jeton est consultée.
+    """
+
+    def get_user(self, validated_token):
+        if ROLE_CLAIM not in validated_token:
+            return JWTAuthentication.get_user(self, validated_token)
+        user = super().get_user(validated_token)
+        _check_version(validated_token, token_version(user.id))
+        return user
+
+
+class _TokenValidation(RoleTokenAuthentication):
+    """`authenticate` de simplejwt (en-tête, décodage, validation, erreurs) sans résolution de l'utilisateur."""
+
+    def get_user(self, validated_token):
+        return None
+
+
+class AsyncJWTAuthentication(RoleTokenAuthentication):
+    """
+    RoleTokenAuthentication pour les vues asynchrones. Le jeton est validé par le code de
+    simplejwt lui-même (`authenticate`, sans E/S) ; seule la résolution de l'utilisateur est
+    asynchrone : version de jeton par `atoken_version`, et `JWTAuthentication.get_user` inchangé,
+    exécuté dans un thread, pour les jetons sans rôle. Mêmes erreurs, donc mêmes réponses 401.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.validation = _TokenValidation()
+
+    async def aauthenticate(self, request):
+        authenticated = self.validation.authenticate(request)
+        if authenticated is None:
+            return None
+        validated_token = authenticated[1]
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        if ROLE_CLAIM not in validated_token:
+            return await sync_to_async(JWTAuthentication.get_user)(self, validated_token)
+        user = JWTStatelessUserAuthentication.get_user(self, validated_token)
+        _check_version(validated_token, await atoken_version(user.id))
+        return user
@@ -0,0 +1,121 @@
+"""
+Écritures en masse : un lot est vérifié par requêtes ensemblistes puis inséré avec
+`bulk_create` dans une seule transaction. Les contraintes d'unicité restent la
+garantie finale face aux soumissions concurrentes.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+
+from .models import Annotation, DataItem, Label, Validation
+from .serializers import BulkAnnotationRowSerializer, BulkValidationRowSerializer
+from .signals import on_annotations_created, on_validations_created
+
+
+def _insert(model, objs):
+    """
+    Insère `objs` en un seul INSERT. Si une soumission concurrente a violé une contrainte
+    entre la vérification et l'insertion, retombe sur une insertion ligne par ligne
+    et retourne (créés, index des objets rejetés).
+    """
+    try:
+        with transaction.atomic():
+            return model.objects.bulk_create(objs), []
+    except IntegrityError:
+        created, rejected = [], []
+        for index, obj in enumerate(objs):
+            try:
+                with transaction.atomic():
+                    created += model.objects.bulk_create([obj])
+            except IntegrityError:
+                rejected.append(index)
+        return created, rejected
+
+
+def bulk_annotate(user, rows):
+    """
+    Crée les annotations `{item, label}` de `rows` pour `user`.
+    Retourne (annotations créées, erreurs `{index, errors}` par ligne rejetée).
+    """
+    errors, candidates = [], []
+    for index, row in enumerate(rows):
+        serializer = BulkAnnotationRowSerializer(data=row)
+        if serializer.is_valid():
+            candidates.append((index, serializer.validated_data['item'], serializer.validated_data['label']))
+        else:
+            errors.append({"index": index, "errors": serializer.errors})
+
+    item_ids = {item_id for _, item_id, _ in candidates}
+    already_annotated = dict(
+        DataItem.objects.filter(id__in=item_ids)
+        .annotate(annotated=Exists(Annotation.objects.filter(item=OuterRef('pk'), user_id=user.id)))
+        .values_list('id', 'annotated')
+    )
+    known_labels = set(Label.objects.filter(id__in={label_id for _, _, label_id in candidates}).values_list('id', flat=True))
+
+    pending, indexes, seen = [], [], set()
+    for index, item_id, label_id in candidates:
+        if item_id not in already_annotated:
+            errors.append({"index": index, "errors": {"item": ["Élément introuvable."]}})
+        elif label_id not in known_labels:
+            errors.append({"index": index, "errors": {"label": ["Label introuvable."]}})
+        elif already_annotated[item_id] or item_id in seen:
+            errors.append({"index": index, "errors": {"item": ["Vous avez déjà annoté cet élément."]}})
+        else:
+            seen.add(item_id)
+            pending.append(Annotation(item_id=item_id, label_id=label_id, user=user))
+            indexes.append(index)
+
+    with transaction.atomic():
+        created, rejected = _insert(Annotation, pending)
+        on_annotations_created(created)
+    for position in rejected:
+        errors.append({"index": indexes[position], "errors": {"item": ["Vous avez déjà annoté cet élément."]}})
+
+    errors.sort(key=lambda error: error["index"])
+    return created, errors
+
+
+def bulk_validate(validator, rows):
+    """
+    Crée les validations `{annotation, is_approved, feedback}` de `rows` pour `validator`.
+    Retourne (validations créées, erreurs `{index, errors}` par ligne rejetée).
+    """
+    errors, candidates = [], []
+    for index, row in enumerate(rows):
+        serializer = BulkValidationRowSerializer(data=row)
+        if serializer.is_valid():
+            candidates.append((index, serializer.validated_data))
+        else:
+            errors.append({"index": index, "errors": serializer.errors})
+
+    already_validated = dict(
+        Annotation.objects.filter(id__in={data['annotation'] for _, data in candidates})
+        .annotate(validated=Exists(Validation.objects.filter(annotation=OuterRef('pk'))))
+        .values_list('id', 'validated')
+    )
+
+    pending, indexes, seen = [], [], set()
+    for index, data in candidates:
+        annotation_id = data['annotation']
+        if annotation_id not in already_validated:
+            errors.append({"index": index, "errors": {"annotation": ["Annotation introuvable."]}})
+        elif already_validated[annotation_id] or annotation_id in seen:
+            errors.append({"index": index, "errors": {"annotation": ["Cette annotation a déjà été validée."]}})
+        else:
+            seen.add(annotation_id)
+            pending.append(Validation(
+                annotation_id=annotation_id,
+                validator=validator,
+                is_approved=data['is_approved'],
+                feedback=data.get('feedback'),
+            ))
+            indexes.append(index)
+
+    with transaction.atomic():
+        created, rejected = _insert(Validation, pending)
+        on_validations_created(created)
+    for position in rejected:
+        errors.append({"index": indexes[position], "errors": {"annotation": ["Cette annotation a déjà été validée."]}})
+
+    errors.sort(key=lambda error: error["index"])
+    return created, errors
@@ -0,0 +1,119 @@
+"""
+Journal des changements pour la synchronisation incrémentale.
+
+Chaque création, modification ou suppression d'élément, d'annotation ou de validation ajoute
+une ligne `ChangeEvent` dans la même transaction que l'écriture : annulée avec elle, jamais
+perdue si elle est validée. La position de la ligne sert de curseur : un consommateur
+relit `GET /api/changes/?since=<curseur>` et ne reçoit que les changements postérieurs.
+Une ligne porte l'état de l'objet après l'écriture (`data`, null pour une suppression) ;
+l'archivage et la restauration d'un élément (`archive.py`) apparaissent comme `archived`
+et `restored`.
+
+Les identifiants sont attribués à l'insertion et non à la validation : une transaction
+encore ouverte peut valider un identifiant plus petit que celui d'une transaction déjà
+validée, quelle que soit sa durée. Les positions sont donc attribuées après coup par
+`publish`, tâche périodique des workers (`run_workers`, toutes les CHANGES_PUBLISH_SECONDS),
+un appel à la fois, aux seuls changements des transactions terminées et dans l'ordre de ces
+transactions. La lecture du flux (`read_changes`) n'écrit rien : elle peut se faire sur une
+réplique, qui reçoit chaque publication en entier. Sur PostgreSQL, chaque ligne porte sa transaction (`txid`) :
+sont publiées celles des transactions antérieures à la plus ancienne encore ouverte
+(`xmin` de l'instantané courant). SQLite n'a qu'une transaction d'écriture à la fois : tout
+ce qui est visible est terminé. Une position publiée n'est jamais suivie d'un changement
+de position inférieure : un curseur ne dépasse jamais un changement encore invisible.
+
+Les compteurs internes mis à jour par `.update()` (attributions, incertitude, retrait)
+ne sont pas journalisés : seuls les champs exposés par l'API le sont.
+"""
+from django.db import connection, models, transaction
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import ChangeEvent
+
+# Champs de l'état journalisé par type d'objet (les relations par leur clé)
+SNAPSHOT_FIELDS = {
+    'item': ('id', 'content', 'data_type', 'is_active', 'created_at'),
+    'annotation': ('id', 'item', 'user', 'label', 'created_at'),
+    'validation': ('id', 'annotation', 'validator', 'is_approved', 'feedback', 'validated_at'),
+}
+
+# Actions après lesquelles l'objet n'est plus servi : pas d'état journalisé
+TOMBSTONES = frozenset({'deleted', 'archived'})
+
+_datetime = serializers.DateTimeField()
+
+
+def snapshot(kind, obj):
+    data = {}
+    for name in SNAPSHOT_FIELDS[kind]:
+        value = getattr(obj, obj._meta.get_field(name).attname)
+        data[name] = _datetime.to_representation(value) if name.endswith('_at') and value else value
+    return data
+
+
+def writer_txid():
+    """Expression de la transaction d'écriture en cours (PostgreSQL), None ailleurs."""
+    if connection.vendor == 'postgresql':
+        return RawSQL('txid_current()', [], output_field=models.BigIntegerField())
+    return None
+
+
+def record(kind, action, objects):
+    """Journalise `action` sur `objects` (instances de `kind`), en un seul INSERT."""
+    now, txid = timezone.now(), writer_txid()
+    ChangeEvent.objects.bulk_create([
+        ChangeEvent(
+            kind=kind, object_id=obj.pk, action=action, created_at=now, txid=txid,
+            data=None if action in TOMBSTONES else snapshot(kind, obj),
+        )
+        for obj in objects
+    ])
+
+
+# Positions des lignes non publiées des transactions terminées, à la suite de la dernière
+PUBLISH_SQL = """
+    UPDATE {table} SET position = ready.base + ready.n
+    FROM (
+        SELECT id, ROW_NUMBER() OVER (ORDER BY {order}) AS n,
+               COALESCE((SELECT MAX(position) FROM {table}), {floor}, 0) AS base
+        FROM {table}
+        WHERE position IS NULL{horizon}
+    ) AS ready
+    WHERE {table}.id = ready.id
+"""
+
+
+def publish(model=ChangeEvent, floor=None):
+    """
+    Attribue leur position aux lignes de `model` (champs `position` et `txid`) écrites par des
+    transactions terminées ; retourne leur nombre. Sert aussi aux deltas d'accord (agreement.py).
+    `floor` : requête d'une seule valeur, position de départ quand toutes les lignes publiées
+    ont été supprimées.
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    floor_sql, params = ('NULL', ()) if floor is None else floor.query.sql_with_params()
+    options = {'table': table, 'floor': f'({floor_sql})'}
+    if connection.vendor == 'postgresql':
+        sql = PUBLISH_SQL.format(
+            order='txid, id', horizon=' AND txid < txid_snapshot_xmin(txid_current_snapshot())', **options,
+        )
+    else:
+        sql = PUBLISH_SQL.format(order='id', horizon='', **options)
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Verrou consultatif par table : une seule publication à la fois
+            cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [f'labeling.publish.{model._meta.db_table}'])
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def read_changes(since=0, limit=100):
+    """
+    Changements publiés de curseur > `since`, dans l'ordre des curseurs.
+    Retourne (changements, curseur suivant, reste-t-il des changements prêts).
+    """
+    events = list(ChangeEvent.objects.filter(position__gt=since).order_by('position')[:limit + 1])
+    has_more = len(events) > limit
+    events = events[:limit]
+    return events, events[-1].position if events else since, has_more
@@ -0,0 +1,307 @@
+"""
+Consensus pondéré par la fiabilité des annotateurs (Dawid–Skene, EM).
+
+Les annotations sont chargées en trois vecteurs d'indices denses (élément, annotateur,
+label) : une représentation creuse en coordonnées de la matrice éléments × annotateurs
+× labels. Chaque étape de l'EM se réduit à K appels à `np.bincount` sur ces vecteurs,
+sans boucle Python par annotation ; quelques millions d'annotations tiennent en mémoire
+et convergent en quelques minutes.
+
+- étape E : log T[i, k] = log p[k] + Σ_{annotations (i, j, l)} log π[j, k, l]
+- étape M : p[k] ∝ Σ_i T[i, k] ; π[j, k, l] ∝ lissage + Σ_{annotations (i, j, l)} T[i, k]
+
+Les résultats sont persistés dans `ItemPosterior` et `AnnotatorReliability`. Une relance
+« à chaud » part des matrices de confusion enregistrées et n'écrit que les postérieurs modifiés.
+"""
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from itertools import batched
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from . import response_cache
+from .models import Annotation, AnnotatorReliability, ConsensusRun, DataItem, ItemPosterior, Label
+
+LOAD_BATCH_SIZE = 100_000
+WRITE_BATCH_SIZE = 5000
+MAX_ITERATIONS = 50
+TOLERANCE = 1e-6
+SMOOTHING = 0.01
+DEFAULT_ACCURACY = 0.7
+
+
+@dataclass
+class AnnotationMatrix:
+    item_ids: np.ndarray
+    user_ids: np.ndarray
+    label_ids: np.ndarray
+    items: np.ndarray
+    users: np.ndarray
+    labels: np.ndarray
+    # `DataItem.vote_version` de chaque élément de `item_ids` (`load_matrix(with_versions=True)`)
+    versions: np.ndarray = None
+
+    @property
+    def shape(self):
+        return len(self.item_ids), len(self.user_ids), len(self.label_ids)
+
+
+@dataclass
+class EMResult:
+    posteriors: np.ndarray
+    confusion: np.ndarray
+    priors: np.ndarray
+    iterations: int
+    converged: bool
+    log_likelihood: float
+
+
+def _read_rows(rows, width, batch_size):
+    chunks = [np.array(chunk, dtype=np.int64) for chunk in batched(rows.iterator(chunk_size=batch_size), batch_size)]
+    return np.concatenate(chunks) if chunks else np.empty((0, width), dtype=np.int64)
+
+
+@contextmanager
+def consistent_read():
+    """Transaction dont toutes les lectures voient le même état (REPEATABLE READ sous PostgreSQL)."""
+    outermost = not connection.in_atomic_block
+    with transaction.atomic():
+        if outermost and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        yield
+
+
+def load_matrix(batch_size=LOAD_BATCH_SIZE, with_versions=False):
+    """
+    Charge toutes les annotations en vecteurs d'indices denses (une lecture en flux).
+    Labels, versions et annotations sont lus dans le même instantané : une annotation ne peut
+    pas porter un label absent de `label_ids`. `with_versions` joint les versions de votes des
+    éléments : un vote validé après la lecture rend le postérieur de son élément périmé au lieu
+    de le laisser passer pour frais.
+    """
+    with consistent_read():
+        label_ids = np.array(Label.objects.order_by('id').values_list('id', flat=True), dtype=np.int64)
+        if with_versions:
+            versioned = _read_rows(DataItem.objects.order_by('id').values_list('id', 'vote_version'), 2, batch_size)
+        triples = _read_rows(Annotation.objects.order_by().values_list('item_id', 'user_id', 'label_id'), 3, batch_size)
+
+    item_ids, items = np.unique(triples[:, 0], return_inverse=True)
+    user_ids, users = np.unique(triples[:, 1], return_inverse=True)
+    return AnnotationMatrix(
+        item_ids=item_ids,
+        user_ids=user_ids,
+        label_ids=label_ids,
+        items=items,
+        users=users,
+        labels=np.searchsorted(label_ids, triples[:, 2]),
+        versions=_versions_of(item_ids, versioned) if with_versions else None,
+    )
+
+
+def _versions_of(item_ids, versioned):
+    """Version de chaque élément de `item_ids` ; 0 (jamais celle d'un élément voté) s'il a été créé après la lecture."""
+    versions = np.zeros(len(item_ids), dtype=np.int64)
+    position = np.searchsorted(versioned[:, 0], item_ids)
+    known = position < len(versioned)
+    known[known] = versioned[position[known], 0] == item_ids[known]
+    versions[known] = versioned[position[known], 1]
+    return versions
+
+
+def _normalize(values, axis=-1):
+    return values / values.sum(axis=axis, keepdims=True)
+
+
+def majority_posteriors(matrix):
+    n_items, _, n_labels = matrix.shape
+    votes = np.bincount(matrix.items * n_labels + matrix.labels, minlength=n_items * n_labels)
+    return _normalize(votes.reshape(n_items, n_labels).astype(float))
+
+
+def m_step(matrix, posteriors, smoothing=SMOOTHING):
+    _, n_users, n_labels = matrix.shape
+    priors = _normalize(posteriors.sum(axis=0) + smoothing)
+    given = matrix.users * n_labels + matrix.labels
+    confusion = np.empty((n_users, n_labels, n_labels))
+    for k in range(n_labels):
+        counts = np.bincount(given, weights=posteriors[matrix.items, k], minlength=n_users * n_labels)
+        confusion[:, k, :] = counts.reshape(n_users, n_labels) + smoothing
+    return priors, _normalize(confusion)
+
+
+def e_step(matrix, priors, confusion):
+    """Retourne (postérieurs, log-vraisemblance)."""
+    n_items, _, n_labels = matrix.shape
+    log_confusion = np.log(confusion).reshape(-1)
+    offsets = matrix.users * n_labels * n_labels + matrix.labels
+    log_posteriors = np.empty((n_items, n_labels))
+    for k in range(n_labels):
+        log_posteriors[:, k] = np.bincount(
+            matrix.items, weights=log_confusion[offsets + k * n_labels], minlength=n_items,
+        )
+    log_posteriors += np.log(priors)
+    peak = log_posteriors.max(axis=1, keepdims=True)
+    weights = np.exp(log_posteriors - peak)
+    totals = weights.sum(axis=1, keepdims=True)
+    return weights / totals, float((peak + np.log(totals)).sum())
+
+
+def dawid_skene(matrix, priors=None, confusion=None, max_iterations=MAX_ITERATIONS, tolerance=TOLERANCE,
+                smoothing=SMOOTHING):
+    """EM complet ; sans paramètres initiaux, part des proportions du vote majoritaire."""
+    if priors is None or confusion is None:
+        priors, confusion = m_step(matrix, majority_posteriors(matrix), smoothing)
+    posteriors, log_likelihood = e_step(matrix, priors, confusion)
+    converged = False
+    iterations = 0
+    while iterations < max_iterations and not converged:
+        iterations += 1
+        priors, confusion = m_step(matrix, posteriors, smoothing)
+        posteriors, updated = e_step(matrix, priors, confusion)
+        # Critère relatif sur la log-vraisemblance : indépendant du nombre d'éléments
+        converged = abs(updated - log_likelihood) <= tolerance * abs(log_likelihood)
+        log_likelihood = updated
+    return EMResult(posteriors, confusion, priors, iterations, converged, log_likelihood)
+
+
+def stored_parameters(matrix):
+    """Paramètres de la dernière exécution, réalignés sur les annotateurs et labels courants."""
+    last = ConsensusRun.objects.filter(finished_at__isnull=False).order_by('-id').first()
+    if last is None:
+        return None, None
+    n_labels = len(matrix.label_ids)
+    labels = [str(label_id) for label_id in matrix.label_ids]
+    priors = np.array([last.class_priors.get(label, 0) + SMOOTHING for label in labels])
+
+    default = np.full((n_labels, n_labels), (1 - DEFAULT_ACCURACY) / max(n_labels - 1, 1))
+    np.fill_diagonal(default, DEFAULT_ACCURACY)
+    confusion = np.repeat(default[np.newaxis], len(matrix.user_ids), axis=0)
+    position = {user_id: j for j, user_id in enumerate(matrix.user_ids.tolist())}
+    for user_id, stored in AnnotatorReliability.objects.filter(user_id__in=position).values_list('user_id', 'confusion'):
+        confusion[position[user_id]] = [
+            [stored.get(true, {}).get(given, 0) + SMOOTHING for given in labels] for true in labels
+        ]
+    return _normalize(priors), _normalize(confusion)
+
+
+def _posterior_rows(matrix, result):
+    n_items, _, _ = matrix.shape
+    votes = np.bincount(matrix.items, minlength=n_items)
+    best = result.posteriors.argmax(axis=1)
+    confidence = result.posteriors[np.arange(n_items), best]
+    for i, item_id in enumerate(matrix.item_ids.tolist()):
+        yield item_id, int(matrix.label_ids[best[i]]), round(float(confidence[i]), 6), int(votes[i]), int(matrix.versions[i]), i
+
+
+def _stored_posteriors(item_ids):
+    return {
+        item_id: (label_id, round(confidence, 6), total_votes, vote_version)
+        for item_id, label_id, confidence, total_votes, vote_version in ItemPosterior.objects.filter(
+            item_id__in=item_ids
+        ).values_list('item_id', 'label_id', 'confidence', 'total_votes', 'vote_version')
+    }
+
+
+def save_result(matrix, result, run, only_changed=False, batch_size=WRITE_BATCH_SIZE):
+    """
+    Écrit postérieurs et fiabilités ; retourne le nombre de postérieurs écrits. Avec `only_changed`,
+    chaque paquet est comparé aux postérieurs enregistrés de ses seuls éléments (une lecture par paquet).
+    """
+    labels = [str(label_id) for label_id in matrix.label_ids]
+
+    def changed():
+        for rows in batched(_posterior_rows(matrix, result), batch_size):
+            previous = _stored_posteriors([row[0] for row in rows]) if only_changed else {}
+            for item_id, label_id, confidence, total_votes, vote_version, i in rows:
+                if previous.get(item_id) == (label_id, confidence, total_votes, vote_version):
+                    continue
+                yield ItemPosterior(
+                    item_id=item_id, label_id=label_id, confidence=confidence, total_votes=total_votes,
+                    vote_version=vote_version, run=run,
+                    distribution={
+                        label: round(float(p), 4) for label, p in zip(labels, result.posteriors[i]) if p >= 0.001
+                    },
+                )
+
+    written = 0
+    with transaction.atomic():
+        ItemPosterior.objects.filter(
+            ~Exists(Annotation.objects.filter(item_id=OuterRef('item_id')))
+        ).delete()
+        for chunk in batched(changed(), batch_size):
+            written += len(ItemPosterior.objects.bulk_create(
+                chunk, update_conflicts=True, unique_fields=['item'],
+                update_fields=['label', 'confidence', 'distribution', 'total_votes', 'vote_version', 'run', 'updated_at'],
+            ))
+            response_cache.CONSENSUS.invalidate(posterior.item_id for posterior in chunk)
+
+        counts = np.bincount(matrix.users, minlength=len(matrix.user_ids))
+        accuracy = np.einsum('k,jkk->j', result.priors, result.confusion)
+        reliabilities = (
+            AnnotatorReliability(
+                user_id=user_id, run=run, annotations=int(counts[j]), accuracy=round(float(accuracy[j]), 6),
+                confusion={
+                    true: {given: round(float(p), 6) for given, p in zip(labels, row)}
+                    for true, row in zip(labels, result.confusion[j])
+                },
+            )
+            for j, user_id in enumerate(matrix.user_ids.tolist())
+        )
+        for chunk in batched(reliabilities, batch_size):
+            AnnotatorReliability.objects.bulk_create(
+                chunk, update_conflicts=True, unique_fields=['user'],
+                update_fields=['run', 'confusion', 'accuracy', 'annotations', 'updated_at'],
+            )
+
+        run.class_priors = {label: round(float(p), 6) for label, p in zip(labels, result.priors)}
+        run.finished_at = timezone.now()
+        run.save()
+    return written
+
+
+def run_consensus(warm_start=False, max_iterations=MAX_ITERATIONS, tolerance=TOLERANCE, log=None):
+    """Charge, estime et persiste ; retourne le `ConsensusRun` terminé."""
+    log = log or (lambda message: None)
+    started = time.monotonic()
+    matrix = load_matrix(with_versions=True)
+    n_items, n_users, n_labels = matrix.shape
+    log(f"{len(matrix.items)} annotations chargées ({n_items} éléments, {n_users} annotateurs, {n_labels} labels) "
+        f"en {time.monotonic() - started:.1f} s")
+
+    run = ConsensusRun.objects.create(
+        warm_start=warm_start, items=n_items, annotators=n_users, annotations=len(matrix.items),
+    )
+    if not n_items:
+        run.finished_at = timezone.now()
+        run.converged = True
+        run.save()
+        ItemPosterior.objects.all().delete()
+        return run
+
+    priors, confusion = stored_parameters(matrix) if warm_start else (None, None)
+    result = dawid_skene(matrix, priors, confusion, max_iterations=max_iterations, tolerance=tolerance)
+    log(f"EM : {result.iterations} itération(s), convergé={result.converged}, "
+        f"log-vraisemblance={result.log_likelihood:.2f} ({time.monotonic() - started:.1f} s)")
+
+    run.iterations = result.iterations
+    run.converged = result.converged
+    run.log_likelihood = result.log_likelihood
+    written = save_result(matrix, result, run, only_changed=warm_start)
+    log(f"{written} postérieur(s) écrit(s) en {time.monotonic() - started:.1f} s")
+    return run
+
+
+def fresh_posterior(item, total_votes):
+    """
+    Postérieur de l'élément s'il porte sur exactement les votes actuels, sinon None : un vote
+    corrigé, ou retiré puis remplacé, laisse le total inchangé mais incrémente la version.
+    """
+    posterior = getattr(item, 'posterior', None)
+    if posterior is None or posterior.vote_version != item.vote_version or posterior.total_votes != total_votes:
+        return None
+    return posterior
@@ -0,0 +1,103 @@
+"""
+Lectures sur réplique.
+
+Les actions de lecture listées dans `REPLICA_ACTIONS` (GET/HEAD) lisent sur une réplique
+de DATABASE_REPLICAS, choisie une fois par requête ; toutes les écritures et les autres
+lectures restent sur la base principale. `ReplicaRouter` suit l'alias posé pour la requête
+en cours dans une ContextVar, propagée aux threads de l'ORM asynchrone.
+
+Lecture de ses propres écritures : après une écriture réussie, les lectures de l'utilisateur
+restent sur la base principale pendant REPLICA_STICKY_SECONDS (délai de réplication toléré).
+La marque est conservée dans le cache Django, qui doit donc être partagé entre processus :
+le contrôle `labeling.W001` le signale au démarrage (`check`, `runserver`).
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+REPLICA_ACTIONS = frozenset({'list', 'retrieve', 'pending', 'progress', 'consensus', 'stats', 'audio', 'waveform'})
+
+read_alias = ContextVar('read_alias', default=None)
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    if settings.DATABASE_REPLICAS and not settings.SHARED_CACHE:
+        return [checks.Warning(
+            "DB_REPLICAS est défini sans cache partagé : la lecture de ses propres écritures "
+            "n'est garantie que dans le processus qui a traité l'écriture.",
+            hint="Définir REDIS_URL.",
+            id='labeling.W001',
+        )]
+    return []
+
+
+def _pin_key(user_id):
+    return f'labeling:db-primary:{user_id}'
+
+
+def pin_to_primary(user_id):
+    cache.set(_pin_key(user_id), True, timeout=settings.REPLICA_STICKY_SECONDS)
+
+
+def _wants_replica(request, action):
+    return bool(settings.DATABASE_REPLICAS) and request.method in SAFE_METHODS and action in REPLICA_ACTIONS
+
+
+def replica_for(request, action):
+    """Alias de réplique pour cette requête, ou None pour la base principale."""
+    if not _wants_replica(request, action):
+        return None
+    if request.user.is_authenticated and cache.get(_pin_key(request.user.id)):
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+async def areplica_for(request, action):
+    if not _wants_replica(request, action):
+        return None
+    if request.user.is_authenticated and await cache.aget(_pin_key(request.user.id)):
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+class ReplicaRouter:
+    """Lectures vers l'alias de la requête en cours, écritures vers la base principale."""
+
+    def db_for_read(self, model, **hints):
+        return read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Les répliques portent les mêmes données que la base principale
+        return True
+
+
+class ReplicaReadMixin:
+    """
+    Pour les ViewSets : oriente les actions de REPLICA_ACTIONS vers une réplique une fois
+    l'utilisateur authentifié, et marque l'utilisateur après chaque écriture réussie.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        token = read_alias.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            read_alias.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        read_alias.set(replica_for(request, self.action))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if request.method not in SAFE_METHODS and response.status_code < 400 and request.user.is_authenticated:
+            pin_to_primary(request.user.id)
+        return super().finalize_response(request, response, *args, **kwargs)
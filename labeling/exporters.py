@@ -0,0 +1,123 @@
+"""
+Export en flux du jeu de données labellisé (JSONL ou CSV).
+
+Les éléments sont lus avec `.iterator(chunk_size=...)` (curseur serveur sur PostgreSQL) ;
+le label de consensus, le total de votes et les compteurs de validation sont calculés en SQL,
+et la distribution des votes est chargée pour chaque paquet d'éléments en une requête.
+Le consensus vient du postérieur de Dawid–Skene quand il porte sur les votes actuels,
+sinon du vote majoritaire (colonne `consensus_method`).
+Les filtres (type, dates, confiance minimale) sont appliqués dans la requête.
+"""
+import csv
+import io
+import json
+from itertools import batched
+
+from django.db.models import Case, F, FloatField, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+
+from .models import DataItem, LabelTally
+from .tallies import majority_order
+
+DEFAULT_CHUNK_SIZE = 2000
+FORMATS = ('jsonl', 'csv')
+CSV_COLUMNS = [
+    'id', 'content', 'data_type', 'created_at', 'consensus_label', 'confidence', 'total_votes',
+    'annotation_count', 'validated_count', 'approved_count', 'is_fully_validated', 'votes', 'consensus_method',
+]
+
+
+def export_queryset(data_type=None, created_after=None, created_before=None, min_confidence=None):
+    top = majority_order(LabelTally.objects.filter(item=OuterRef('pk'), votes__gt=0))
+    totals = (
+        LabelTally.objects.filter(item=OuterRef('pk'))
+        .order_by().values('item').annotate(total=Sum('votes')).values('total')
+    )
+    queryset = (
+        DataItem.objects.with_progress()
+        .annotate(
+            majority_label=Subquery(top.values('label__name')[:1]),
+            consensus_votes=Coalesce(Subquery(top.values('votes')[:1]), 0),
+            total_votes=Coalesce(Subquery(totals, output_field=IntegerField()), 0),
+        )
+        .annotate(
+            posterior_is_fresh=Q(
+                posterior__vote_version=F('vote_version'), posterior__total_votes=F('total_votes'), total_votes__gt=0,
+            ),
+        )
+        .annotate(
+            consensus_label=Case(
+                When(posterior_is_fresh=True, then=F('posterior__label__name')), default=F('majority_label'),
+            ),
+            confidence=Case(
+                When(posterior_is_fresh=True, then=F('posterior__confidence')),
+                When(total_votes__gt=0, then=Cast(F('consensus_votes'), FloatField()) / F('total_votes')),
+                default=Value(None, output_field=FloatField()),
+                output_field=FloatField(),
+            ),
+        )
+        .order_by('id')
+    )
+    if data_type:
+        queryset = queryset.filter(data_type=data_type)
+    if created_after:
+        queryset = queryset.filter(created_at__gte=created_after)
+    if created_before:
+        queryset = queryset.filter(created_at__lt=created_before)
+    if min_confidence is not None:
+        queryset = queryset.filter(confidence__gte=min_confidence)
+    return queryset
+
+
+def iter_records(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Produit un dict par élément ; mémoire bornée par `chunk_size`."""
+    for chunk in batched(queryset.iterator(chunk_size=chunk_size), chunk_size):
+        votes = {}
+        rows = (
+            LabelTally.objects.filter(item_id__in=[item.id for item in chunk], votes__gt=0)
+            .order_by('item_id', '-votes', 'label__name')
+            .values_list('item_id', 'label__name', 'votes')
+        )
+        for item_id, label, count in rows:
+            votes.setdefault(item_id, {})[label] = count
+        for item in chunk:
+            yield {
+                "id": item.id,
+                "content": item.content,
+                "data_type": item.data_type,
+                "created_at": item.created_at.isoformat(),
+                "consensus_label": item.consensus_label,
+                "confidence": round(item.confidence, 4) if item.confidence is not None else None,
+                "total_votes": item.total_votes,
+                "annotation_count": item.annotation_count,
+                "validated_count": item.validated_annotation_count,
+                "approved_count": item.approved_annotation_count,
+                "is_fully_validated": item.is_fully_validated,
+                "votes": votes.get(item.id, {}),
+                "consensus_method": (
+                    ("dawid-skene" if item.posterior_is_fresh else "majority") if item.total_votes else None
+                ),
+            }
+
+
+def render_jsonl(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def render_csv(records):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS)
+    writer.writeheader()
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for record in records:
+        writer.writerow({**record, "votes": json.dumps(record["votes"], ensure_ascii=False)})
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def render(records, fmt):
+    return render_csv(records) if fmt == 'csv' else render_jsonl(records)
@@ -0,0 +1,51 @@
+"""
+Champs partiels : `?fields=id,content` ne garde que les champs cités, `?omit=annotation_count`
+retire ceux cités (les deux se combinent, les noms inconnus sont ignorés).
+
+Appliqués aux lectures (`SPARSE_ACTIONS`) : les sérialiseurs retirent les champs non demandés
+et les ViewSets n'annotent, ne joignent et ne lisent que les colonnes des champs restants.
+Les sérialiseurs imbriqués et les écritures gardent tous leurs champs.
+"""
+from rest_framework.permissions import SAFE_METHODS
+
+SPARSE_ACTIONS = frozenset({'list', 'retrieve', 'pending'})
+
+
+def _names(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def requested_fields(request, available):
+    """Noms de `available` (ordre conservé) retenus par `?fields=` et `?omit=` de `request`."""
+    params = getattr(request, 'query_params', None)
+    if not params or request.method not in SAFE_METHODS:
+        return list(available)
+    names = list(available)
+    if 'fields' in params:
+        wanted = _names(params['fields'])
+        names = [name for name in names if name in wanted]
+    if 'omit' in params:
+        omitted = _names(params['omit'])
+        names = [name for name in names if name not in omitted]
+    return names
+
+
+def sparse_fields(view, available):
+    """Champs demandés pour les actions de lecture de `view`, tous les champs sinon."""
+    if view.action in SPARSE_ACTIONS:
+        return requested_fields(view.request, available)
+    return list(available)
+
+
+class SparseFieldsMixin:
+    """Pour les sérialiseurs : retire les champs non demandés quand le contexte porte la requête."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        view = self.context.get('view')
+        if request is None or (view is not None and getattr(view, 'action', None) not in SPARSE_ACTIONS):
+            return
+        keep = set(requested_fields(request, self.fields))
+        for name in [name for name in self.fields if name not in keep]:
+            self.fields.pop(name)
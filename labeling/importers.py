@@ -0,0 +1,184 @@
+"""
+Import en flux d'éléments de données (JSONL ou CSV).
+
+Les lignes sont lues une à une et insérées par lots : `COPY ... FROM STDIN` sur
+PostgreSQL (psycopg 3), `bulk_create` ailleurs. Le point de reprise `ItemImport`
+est mis à jour dans la transaction de chaque lot, si bien qu'un import interrompu
+reprend exactement après le dernier lot validé.
+"""
+import csv
+import hashlib
+import io
+import json
+import time
+from dataclasses import dataclass, field
+from itertools import batched, islice
+
+from django.db import connection, transaction
+
+from .models import DataItem, ItemImport
+from .signals import on_items_created
+
+DEFAULT_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 20
+FORMATS = ('jsonl', 'csv')
+DATA_TYPES = dict(DataItem.TYPES)
+TRUE_VALUES = {'1', 'true', 'yes', 'oui'}
+FALSE_VALUES = {'0', 'false', 'no', 'non'}
+
+
+@dataclass
+class ImportReport:
+    source: str
+    imported: int = 0
+    rejected: int = 0
+    resumed_from: int = 0
+    elapsed: float = 0.0
+    completed: bool = False
+    errors: list = field(default_factory=list)
+
+    @property
+    def rows_per_second(self):
+        return self.imported / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            "source": self.source,
+            "imported": self.imported,
+            "rejected": self.rejected,
+            "resumed_from": self.resumed_from,
+            "elapsed": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+            "completed": self.completed,
+            "errors": self.errors,
+        }
+
+
+def guess_format(name):
+    return 'csv' if str(name).lower().endswith('.csv') else 'jsonl'
+
+
+def read_rows(stream, fmt):
+    """Itère sur les lignes d'un flux texte ; une ligne JSON illisible est retournée telle quelle pour être rejetée."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield line
+
+
+def text_stream(binary):
+    """Enveloppe un fichier binaire (upload, fichier ouvert en 'rb') en flux texte UTF-8."""
+    return io.TextIOWrapper(binary, encoding='utf-8', newline='')
+
+
+def upload_source(upload):
+    """Identifiant de reprise par défaut d'un fichier envoyé : empreinte SHA-256 de son contenu."""
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    return f"upload:sha256:{digest.hexdigest()}"
+
+
+def build_item(row):
+    """Construit un DataItem non sauvegardé ou lève ValueError avec un message lisible."""
+    if not isinstance(row, dict):
+        raise ValueError("ligne illisible")
+    content = row.get('content')
+    if not isinstance(content, str) or not content.strip():
+        raise ValueError("'content' manquant")
+    data_type = row.get('data_type')
+    if data_type not in DATA_TYPES:
+        raise ValueError(f"'data_type' doit être l'un de {', '.join(DATA_TYPES)}")
+    is_active = row.get('is_active')
+    if is_active is None or isinstance(is_active, str) and not is_active.strip():
+        # Cellule CSV vide ou null JSON : la colonne est traitée comme absente.
+        is_active = True
+    elif isinstance(is_active, str):
+        value = is_active.strip().lower()
+        if value not in TRUE_VALUES | FALSE_VALUES:
+            raise ValueError("'is_active' invalide")
+        is_active = value in TRUE_VALUES
+    return DataItem(content=content, data_type=data_type, is_active=bool(is_active))
+
+
+def _copy_items(items):
+    """Insère via COPY en réservant d'abord les identifiants dans la séquence, pour les connaître sans RETURNING."""
+    opts = DataItem._meta
+    fields = opts.concrete_fields
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)",
+            [opts.db_table, opts.pk.column, len(items)],
+        )
+        for item, (pk,) in zip(items, cursor.fetchall()):
+            item.pk = pk
+        columns = ', '.join(connection.ops.quote_name(f.column) for f in fields)
+        with cursor.cursor.copy(f"COPY {connection.ops.quote_name(opts.db_table)} ({columns}) FROM STDIN") as copy:
+            for item in items:
+                copy.write_row([f.get_db_prep_save(f.pre_save(item, add=True), connection) for f in fields])
+    for item in items:
+        item._state.adding = False
+    return items
+
+
+def insert_items(items):
+    if connection.vendor == 'postgresql':
+        from django.db.backends.postgresql.psycopg_any import is_psycopg3
+        if is_psycopg3:
+            return _copy_items(items)
+    return DataItem.objects.bulk_create(items)
+
+
+def import_items(rows, source, batch_size=DEFAULT_BATCH_SIZE, restart=False, progress=None):
+    """
+    Importe les lignes `rows` (itérable de dicts) sous l'identifiant de reprise `source`.
+    `progress(report)` est appelé après chaque lot validé.
+    """
+    checkpoint, _ = ItemImport.objects.get_or_create(source=source)
+    if restart:
+        checkpoint.rows_read = checkpoint.rows_imported = checkpoint.rows_rejected = 0
+        checkpoint.completed = False
+        checkpoint.save()
+
+    report = ImportReport(source=source, resumed_from=checkpoint.rows_read)
+    if checkpoint.completed:
+        report.completed = True
+        return report
+
+    started = time.monotonic()
+    for batch in batched(islice(rows, checkpoint.rows_read, None), batch_size):
+        items = []
+        for offset, row in enumerate(batch):
+            try:
+                items.append(build_item(row))
+            except ValueError as exc:
+                report.rejected += 1
+                if len(report.errors) < MAX_REPORTED_ERRORS:
+                    report.errors.append({"row": checkpoint.rows_read + offset + 1, "error": str(exc)})
+
+        with transaction.atomic():
+            if items:
+                on_items_created(insert_items(items))
+            checkpoint.rows_read += len(batch)
+            checkpoint.rows_imported += len(items)
+            checkpoint.rows_rejected += len(batch) - len(items)
+            checkpoint.save(update_fields=['rows_read', 'rows_imported', 'rows_rejected', 'updated_at'])
+
+        report.imported += len(items)
+        report.elapsed = time.monotonic() - started
+        if progress:
+            progress(report)
+
+    checkpoint.completed = True
+    checkpoint.save(update_fields=['completed', 'updated_at'])
+    report.completed = True
+    report.elapsed = time.monotonic() - started
+    return report
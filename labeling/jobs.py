@@ -0,0 +1,264 @@
+"""
+Tâches de fond sans broker : la table `Job` sert de file.
+
+`POST /api/jobs/` enregistre une tâche ; `manage.py run_workers` la prend et l'exécute
+hors requête HTTP (consensus complet, export, reconstructions, accord inter-annotateurs). Un worker verrouille la
+tâche la plus ancienne prête à partir avec `SELECT ... FOR UPDATE SKIP LOCKED` ; sur les
+bases sans SKIP LOCKED (SQLite), l'UPDATE conditionnel `WHERE status = 'queued'` sert de
+verrou optimiste, comme pour la file d'attribution (`queue.py`).
+
+Une tâche en échec est reprise après JOB_RETRY_SECONDS × 2^(tentatives - 1) secondes,
+jusqu'à `max_attempts` tentatives. Un worker signale qu'il est vivant toutes les
+JOB_HEARTBEAT_SECONDS ; une tâche sans signal depuis JOB_STALE_SECONDS (worker tué)
+compte comme une tentative échouée et retourne dans la file. Une tâche terminée depuis plus de
+JOB_RETENTION_SECONDS est supprimée, avec son fichier d'export (`signals.py`).
+
+Entre deux tâches, les workers exécutent aussi les tâches périodiques (`periodic`), au plus une
+fois par intervalle et par processus : publication du flux de changements, rafraîchissement
+incrémental de l'accord inter-annotateurs, purge des tâches expirées.
+"""
+import tempfile
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import changes, exporters
+from .agreement import compute_snapshot, refresh_snapshot
+from .consensus import run_consensus
+from .models import Job
+from .routing import rebuild_routing
+from .serializers import JOB_PARAMS
+from .stats import rebuild_user_stats
+from .tallies import rebuild_tallies
+
+# Sans SKIP LOCKED, certaines tâches peuvent être prises par un autre worker entre la lecture et l'UPDATE
+FALLBACK_OVERSCAN = 4
+EXPORT_PROGRESS_EVERY = 1000
+PURGE_BATCH_SIZE = 500
+PURGE_EVERY_SECONDS = 3600
+
+HANDLERS = {}
+PERIODIC = {}
+_last_runs = {}
+_periodic_lock = threading.Lock()
+
+
+def handler(kind):
+    """Enregistre `func(job, progress)` pour `kind` ; sa valeur de retour devient `Job.result`."""
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def periodic(name, seconds):
+    """Enregistre `func()`, exécutée par les workers toutes les `seconds()` secondes au plus."""
+    def register(func):
+        PERIODIC[name] = (seconds, func)
+        return func
+    return register
+
+
+def run_periodic(now=None):
+    """Exécute les tâches périodiques échues dans ce processus ; retourne {nom: erreur ou None}."""
+    now = time.monotonic() if now is None else now
+    with _periodic_lock:
+        due = [name for name, (seconds, _) in PERIODIC.items() if name not in _last_runs or now - _last_runs[name] >= seconds()]
+        _last_runs.update(dict.fromkeys(due, now))
+    outcomes = {}
+    for name in due:
+        try:
+            PERIODIC[name][1]()
+        except Exception:
+            outcomes[name] = traceback.format_exc(limit=20)
+        else:
+            outcomes[name] = None
+    return outcomes
+
+
+def submit(kind, params=None, user=None, max_attempts=None):
+    return Job.objects.create(
+        kind=kind, params=params or {}, created_by=user, run_after=timezone.now(),
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=settings.JOB_RETRY_SECONDS * 2 ** max(attempts - 1, 0))
+
+
+def requeue_stale(now=None):
+    """Rend les tâches dont le worker ne donne plus signe de vie ; retourne leur nombre."""
+    now = now or timezone.now()
+    stale = Job.objects.filter(status='running', heartbeat_at__lt=now - timedelta(seconds=settings.JOB_STALE_SECONDS))
+    error = "Worker perdu : aucun signal de vie."
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', locked_by='', error=error, finished_at=now,
+    )
+    return failed + stale.update(status='queued', locked_by='', error=error, run_after=now)
+
+
+def purge_jobs(now=None, batch_size=PURGE_BATCH_SIZE):
+    """Supprime par lots les tâches terminées depuis plus de JOB_RETENTION_SECONDS ; retourne leur nombre."""
+    if not settings.JOB_RETENTION_SECONDS:
+        return 0
+    now = now or timezone.now()
+    expired = Job.objects.filter(
+        status__in=('succeeded', 'failed'), finished_at__lt=now - timedelta(seconds=settings.JOB_RETENTION_SECONDS),
+    ).order_by('id')
+    purged = 0
+    while job_ids := list(expired.values_list('id', flat=True)[:batch_size]):
+        with transaction.atomic():
+            purged += Job.objects.filter(pk__in=job_ids).delete()[0]
+    return purged
+
+
+def claim_job(worker, now=None):
+    """Verrouille et retourne la prochaine tâche prête pour `worker`, ou None."""
+    now = now or timezone.now()
+    requeue_stale(now)
+    running = {'status': 'running', 'locked_by': worker, 'heartbeat_at': now, 'started_at': now, 'attempts': F('attempts') + 1}
+    with transaction.atomic():
+        ready = Job.objects.filter(status='queued', run_after__lte=now).order_by('run_after', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            job_id = ready.select_for_update(skip_locked=True).values_list('id', flat=True).first()
+            if job_id is None:
+                return None
+            Job.objects.filter(pk=job_id).update(**running)
+            return Job.objects.get(pk=job_id)
+        for job_id in ready.values_list('id', flat=True)[:FALLBACK_OVERSCAN]:
+            if Job.objects.filter(pk=job_id, status='queued').update(**running):
+                return Job.objects.get(pk=job_id)
+    return None
+
+
+class Progress:
+    """Avancement d'une tâche en cours, écrit en base (et vaut signal de vie)."""
+
+    def __init__(self, job):
+        self.job = job
+
+    def __call__(self, done=None, total=None, message=None):
+        fields = {'heartbeat_at': timezone.now()}
+        if done is not None and total:
+            fields['progress'] = min(done / total, 1.0)
+        if message is not None:
+            fields['message'] = message[:255]
+        Job.objects.filter(pk=self.job.pk, locked_by=self.job.locked_by).update(**fields)
+
+
+class Heartbeat(threading.Thread):
+    """Signal de vie périodique pendant les étapes longues qui ne rapportent pas d'avancement."""
+
+    def __init__(self, job):
+        super().__init__(daemon=True)
+        self.job = job
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(settings.JOB_HEARTBEAT_SECONDS):
+                Job.objects.filter(pk=self.job.pk, locked_by=self.job.locked_by, status='running').update(
+                    heartbeat_at=timezone.now()
+                )
+        finally:
+            connection.close()
+
+
+def run_job(job):
+    """Exécute `job` (déjà verrouillé par `claim_job`) et enregistre son résultat ou son échec."""
+    owned = Job.objects.filter(pk=job.pk, locked_by=job.locked_by, status='running')
+    heartbeat = Heartbeat(job)
+    heartbeat.start()
+    try:
+        result = HANDLERS[job.kind](job, Progress(job))
+    except Exception:
+        now = timezone.now()
+        error = traceback.format_exc(limit=20)
+        if job.attempts >= job.max_attempts:
+            owned.update(status='failed', locked_by='', error=error, finished_at=now)
+        else:
+            owned.update(status='queued', locked_by='', error=error, run_after=now + retry_delay(job.attempts))
+    else:
+        owned.update(
+            status='succeeded', locked_by='', result=result, error='', progress=1.0, finished_at=timezone.now(),
+        )
+    finally:
+        heartbeat.stopped.set()
+        heartbeat.join()
+    job.refresh_from_db()
+    return job
+
+
+def _params(job):
+    serializer = JOB_PARAMS[job.kind](data=job.params)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data
+
+
+@handler('consensus')
+def consensus_job(job, progress):
+    run = run_consensus(**_params(job), log=lambda message: progress(message=message))
+    return {"run": run.pk, "items": run.items, "iterations": run.iterations, "converged": run.converged}
+
+
+@handler('export')
+def export_job(job, progress):
+    params = dict(_params(job))
+    fmt = params.pop('output')
+    queryset = exporters.export_queryset(**params)
+    total = queryset.count()
+
+    def counted(records):
+        for done, record in enumerate(records, start=1):
+            yield record
+            if done % EXPORT_PROGRESS_EVERY == 0:
+                progress(done, total, f"{done} / {total} élément(s)")
+
+    with tempfile.TemporaryFile('w+b') as buffer:
+        for chunk in exporters.render(counted(exporters.iter_records(queryset)), fmt):
+            buffer.write(chunk.encode())
+        buffer.seek(0)
+        name = default_storage.save(f'exports/job-{job.pk}.{fmt}', File(buffer))
+    return {"file": name, "format": fmt, "rows": total}
+
+
+@handler('rebuild_stats')
+def rebuild_stats_job(job, progress):
+    return {"rows": rebuild_user_stats()}
+
+
+@handler('rebuild_tallies')
+def rebuild_tallies_job(job, progress):
+    tallies = rebuild_tallies()
+    progress(message=f"{tallies} décompte(s) reconstruit(s), recalcul du routage")
+    return {"tallies": tallies, "items": rebuild_routing()}
+
+
+@handler('agreement')
+def agreement_job(job, progress):
+    snapshot = compute_snapshot(log=lambda message: progress(message=message))
+    return {"snapshot": snapshot.pk, "duration_seconds": round(snapshot.duration_seconds, 3)}
+
+
+@periodic('publish_changes', lambda: settings.CHANGES_PUBLISH_SECONDS)
+def publish_changes():
+    changes.publish()
+
+
+@periodic('agreement_refresh', lambda: settings.AGREEMENT_REFRESH_SECONDS)
+def refresh_agreement():
+    refresh_snapshot()
+
+
+@periodic('purge_jobs', lambda: PURGE_EVERY_SECONDS)
+def purge_expired_jobs():
+    purge_jobs()
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from labeling.archive import ARCHIVE_BATCH_SIZE, archive_items
+from labeling.models import DataItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Déplace les éléments inactifs, leurs annotations et leurs validations vers les tables d'archive, "
+        "par lots (une transaction par lot). Restauration : POST /api/archive/restore/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--limit', type=int, help="Nombre maximal d'éléments à archiver.")
+        parser.add_argument('--dry-run', action='store_true', help="Compte les éléments à archiver sans rien déplacer.")
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            self.stdout.write(f"{DataItem.objects.filter(is_active=False).count()} élément(s) inactif(s) à archiver.")
+            return
+        archived = archive_items(
+            batch_size=options['batch_size'], limit=options['limit'],
+            progress=lambda count: self.stdout.write(f"{count} élément(s) archivé(s)…"),
+        )
+        self.stdout.write(self.style.SUCCESS(f"{archived} élément(s) archivé(s)."))
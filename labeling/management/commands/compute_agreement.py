@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from labeling.agreement import compute_snapshot, refresh_snapshot, snapshot_data
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcule l'accord inter-annotateurs (kappa de Fleiss, alpha de Krippendorff, accord par paires) "
+        "et enregistre un instantané servi par /api/agreement/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true',
+                            help="Ajoute seulement les votes écrits depuis le dernier instantané.")
+
+    def handle(self, *args, **options):
+        if options['incremental']:
+            snapshot = refresh_snapshot()
+            if snapshot is None:
+                raise CommandError("Aucun instantané : lancer d'abord un recalcul complet.")
+        else:
+            snapshot = compute_snapshot(log=self.stdout.write)
+        overall = snapshot_data(snapshot)['overall']
+        self.stdout.write(self.style.SUCCESS(
+            f"Instantané #{snapshot.pk} : {overall['items']} élément(s), kappa de Fleiss {overall['fleiss_kappa']}, "
+            f"alpha de Krippendorff {overall['krippendorff_alpha']} ({snapshot.duration_seconds:.2f} s)."
+        ))
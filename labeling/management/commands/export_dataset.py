@@ -0,0 +1,46 @@
+from argparse import ArgumentTypeError
+
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_datetime
+
+from labeling import exporters
+
+
+def datetime_argument(value):
+    """Date ISO 8601 ; une valeur illisible est refusée plutôt qu'ignorée."""
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ArgumentTypeError(f"date invalide : {value!r}")
+    return parsed
+
+
+class Command(BaseCommand):
+    help = "Exporte en flux le jeu de données labellisé (consensus, distribution des votes, validation)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="Fichier de sortie (sortie standard par défaut).")
+        parser.add_argument('--format', choices=exporters.FORMATS, default='jsonl')
+        parser.add_argument('--data-type')
+        parser.add_argument('--created-after', type=datetime_argument)
+        parser.add_argument('--created-before', type=datetime_argument)
+        parser.add_argument('--min-confidence', type=float)
+        parser.add_argument('--chunk-size', type=int, default=exporters.DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        queryset = exporters.export_queryset(
+            data_type=options['data_type'],
+            created_after=options['created_after'],
+            created_before=options['created_before'],
+            min_confidence=options['min_confidence'],
+        )
+        records = exporters.iter_records(queryset, chunk_size=options['chunk_size'])
+        chunks = exporters.render(records, options['format'])
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8', newline='') as stream:
+            stream.writelines(chunks)
@@ -0,0 +1,41 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from labeling.audio import import_audio
+
+
+class Command(BaseCommand):
+    help = "Importe des enregistrements WAV : un élément audio par segment, pics de forme d'onde précalculés."
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="Fichiers WAV ou dossiers (les .wav qu'ils contiennent).")
+        parser.add_argument('--segment-seconds', type=float, help="Durée des segments (AUDIO_SEGMENT_SECONDS par défaut).")
+        parser.add_argument('--inactive', action='store_true', help="Crée les éléments désactivés.")
+
+    def _files(self, paths):
+        for path in paths:
+            if os.path.isdir(path):
+                yield from sorted(
+                    os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith('.wav')
+                )
+            elif os.path.isfile(path):
+                yield path
+            else:
+                raise CommandError(f"Fichier introuvable : {path}")
+
+    def handle(self, *args, **options):
+        total = 0
+        for path in self._files(options['paths']):
+            with open(path, 'rb') as fileobj:
+                try:
+                    items = import_audio(
+                        fileobj, os.path.abspath(path),
+                        segment_seconds=options['segment_seconds'], is_active=not options['inactive'],
+                    )
+                except ValueError as exc:
+                    self.stdout.write(self.style.WARNING(f"{path} : {exc}"))
+                    continue
+            total += len(items)
+            self.stdout.write(f"{path} : {len(items)} segment(s)")
+        self.stdout.write(self.style.SUCCESS(f"{total} élément(s) audio importé(s)."))
@@ -0,0 +1,47 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from labeling.importers import DEFAULT_BATCH_SIZE, FORMATS, guess_format, import_items, read_rows
+
+
+class Command(BaseCommand):
+    help = "Importe des éléments de données depuis un fichier JSONL ou CSV, par lots et avec reprise."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Fichier à importer (une ligne par élément).")
+        parser.add_argument('--format', choices=FORMATS, help="Déduit de l'extension par défaut.")
+        parser.add_argument('--source', help="Identifiant de reprise (chemin absolu du fichier par défaut).")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--restart', action='store_true', help="Ignore le point de reprise existant.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.isfile(path):
+            raise CommandError(f"Fichier introuvable : {path}")
+        fmt = options['format'] or guess_format(path)
+        source = options['source'] or os.path.abspath(path)
+
+        def progress(report):
+            self.stdout.write(
+                f"{report.resumed_from + report.imported + report.rejected} lignes lues, "
+                f"{report.imported} importées ({report.rows_per_second:.0f} lignes/s)"
+            )
+
+        try:
+            with open(path, encoding='utf-8', newline='') as stream:
+                report = import_items(
+                    read_rows(stream, fmt), source,
+                    batch_size=options['batch_size'], restart=options['restart'], progress=progress,
+                )
+        except UnicodeDecodeError:
+            raise CommandError(f"Fichier non UTF-8 : {path}")
+
+        if report.resumed_from:
+            self.stdout.write(f"Reprise après {report.resumed_from} lignes déjà traitées.")
+        for error in report.errors:
+            self.stdout.write(self.style.WARNING(f"ligne {error['row']} : {error['error']}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"{report.imported} élément(s) importé(s), {report.rejected} rejeté(s) "
+            f"en {report.elapsed:.1f}s ({report.rows_per_second:.0f} lignes/s)."
+        ))
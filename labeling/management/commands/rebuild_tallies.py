@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from labeling.routing import rebuild_routing
+from labeling.tallies import rebuild_tallies, verify_tallies
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruit les décomptes de votes par (élément, label) à partir des annotations, puis l'incertitude "
+        "et le retrait des éléments ; ou vérifie les décomptes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help="Vérifie seulement, sans rien écrire.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            mismatches = verify_tallies()
+            for item_id, label_id, stored, expected in mismatches[:50]:
+                self.stdout.write(f"item={item_id} label={label_id} stocké={stored} attendu={expected}")
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} décompte(s) incohérent(s).")
+            self.stdout.write(self.style.SUCCESS("Décomptes cohérents."))
+            return
+
+        written = rebuild_tallies(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{written} décompte(s) reconstruit(s)."))
+        routed = rebuild_routing(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Routage recalculé pour {routed} élément(s)."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from labeling.stats import rebuild_user_stats
+
+
+class Command(BaseCommand):
+    help = "Reconstruit la table UserStats (classement) à partir des annotations et validations."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        written = rebuild_user_stats(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{written} ligne(s) de statistiques reconstruite(s)."))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from labeling.consensus import MAX_ITERATIONS, TOLERANCE, run_consensus
+
+
+class Command(BaseCommand):
+    help = "Estime le consensus de Dawid–Skene et la fiabilité de chaque annotateur sur toutes les annotations."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--warm-start', action='store_true',
+                            help="Part des matrices de confusion enregistrées et n'écrit que les postérieurs modifiés.")
+        parser.add_argument('--max-iterations', type=int, default=MAX_ITERATIONS)
+        parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+
+    def handle(self, *args, **options):
+        run = run_consensus(
+            warm_start=options['warm_start'],
+            max_iterations=options['max_iterations'],
+            tolerance=options['tolerance'],
+            log=self.stdout.write,
+        )
+        status = "convergé" if run.converged else "non convergé"
+        self.stdout.write(self.style.SUCCESS(
+            f"Consensus #{run.pk} : {run.items} élément(s), {run.iterations} itération(s), {status}."
+        ))
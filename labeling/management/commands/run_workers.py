@@ -0,0 +1,66 @@
+import os
+import signal
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from labeling.jobs import claim_job, run_job, run_periodic
+
+
+class Command(BaseCommand):
+    help = (
+        "Exécute les tâches de fond (table Job) : consensus, exports, reconstructions, "
+        "et les tâches périodiques (publication du flux de changements, rafraîchissement de l'accord). "
+        "Lancer la commande sur plusieurs machines ou plusieurs fois pour ajouter des processus."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.JOB_WORKERS,
+                            help="Threads d'exécution (1 : dans le thread principal).")
+        parser.add_argument('--poll-interval', type=float, default=settings.JOB_POLL_SECONDS,
+                            help="Attente entre deux consultations d'une file vide (secondes).")
+        parser.add_argument('--once', action='store_true', help="S'arrête dès que la file est vide.")
+
+    def handle(self, *args, **options):
+        self.stopping = threading.Event()
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        previous = {sig: signal.signal(sig, self.stop) for sig in (signal.SIGINT, signal.SIGTERM)}
+        try:
+            if options['workers'] <= 1:
+                self.work(f"{prefix}:0", options)
+            else:
+                with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                    for future in [pool.submit(self.work, f"{prefix}:{n}", options) for n in range(options['workers'])]:
+                        future.result()
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+
+    def stop(self, signum, frame):
+        # La tâche en cours se termine ; aucune nouvelle n'est prise
+        self.stdout.write("Arrêt demandé, fin des tâches en cours…")
+        self.stopping.set()
+
+    def work(self, worker, options):
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                for name, error in run_periodic().items():
+                    if error:
+                        self.stderr.write(f"[{worker}] {name} : {error}")
+                job = claim_job(worker)
+                if job is None:
+                    if options['once']:
+                        return
+                    self.stopping.wait(options['poll_interval'])
+                    continue
+                job = run_job(job)
+                style = self.style.SUCCESS if job.status == 'succeeded' else self.style.WARNING
+                self.stdout.write(style(f"[{worker}] {job.kind} #{job.pk} : {job.get_status_display()}"))
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connection.close()
@@ -0,0 +1,275 @@
+"""
+Métriques par vue : latence, nombre et durée des requêtes SQL.
+
+`RequestMetricsMiddleware` mesure chaque requête. Un `execute_wrapper` permanent,
+posé sur chaque connexion à son ouverture, impute les requêtes SQL au `QueryTracker`
+de la requête HTTP courante, porté par une ContextVar : il suit donc aussi les requêtes
+des vues asynchrones exécutées dans un autre thread, et fonctionne sans DEBUG.
+Les observations sont agrégées en mémoire, par processus, dans des histogrammes à seaux
+fixes : une observation coûte une recherche dichotomique et quelques additions sous verrou.
+`metrics_view` les expose au format texte de Prometheus ; avec plusieurs workers, chaque
+processus expose ses propres compteurs (à agréger côté Prometheus). L'accès demande le jeton
+`METRICS_TOKEN` ou, sans jeton configuré, un administrateur.
+"""
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+
+from .authentication import RoleTokenAuthentication
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}' if pairs else ''
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+
+    def inc(self, labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in sorted(self._values.items()):
+            yield f'{self.name}{_labels(self.labelnames, labels)} {value}'
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [comptes par seau (non cumulés, dernier = +Inf), somme]
+        self._series = {}
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def samples(self):
+        for labels, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                yield f'{self.name}_bucket{_labels(self.labelnames, labels, [("le", bound)])} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labelnames, labels)} {total:.6f}'
+            yield f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}'
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def record(self, observations):
+        """`observations` : [(métrique, labels, valeur)] appliquées sous un seul verrou."""
+        with self._lock:
+            for metric, labels, value in observations:
+                (metric.observe if metric.kind == 'histogram' else metric.inc)(labels, value)
+
+    def reset(self):
+        with self._lock:
+            for metric in self._metrics:
+                if metric.kind == 'histogram':
+                    metric._series.clear()
+                else:
+                    metric._values.clear()
+
+    def render(self):
+        with self._lock:
+            lines = []
+            for metric in self._metrics:
+                lines.append(f'# HELP {metric.name} {metric.documentation}')
+                lines.append(f'# TYPE {metric.name} {metric.kind}')
+                lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+VIEW_LABELS = ('view', 'method')
+REQUESTS = registry.register(Counter(
+    'http_requests_total', "Requêtes traitées par vue, méthode et code de statut.", ('view', 'method', 'status'),
+))
+LATENCY = registry.register(Histogram(
+    'http_request_duration_seconds', "Latence des requêtes par vue.", VIEW_LABELS, LATENCY_BUCKETS,
+))
+DB_QUERIES = registry.register(Histogram(
+    'http_request_db_queries', "Requêtes SQL exécutées par requête HTTP.", VIEW_LABELS, QUERY_BUCKETS,
+))
+DB_SECONDS = registry.register(Histogram(
+    'http_request_db_seconds', "Temps SQL cumulé par requête HTTP.", VIEW_LABELS, LATENCY_BUCKETS,
+))
+CACHE_LOOKUPS = registry.register(Counter(
+    'response_cache_lookups_total', "Consultations du cache de réponses par vue et résultat (hit, miss).", ('cache', 'result'),
+))
+
+
+class QueryTracker:
+    """Compteur de requêtes SQL et de temps SQL cumulé d'une requête HTTP."""
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+current_tracker = ContextVar('current_tracker', default=None)
+
+
+def track_queries(execute, sql, params, many, context):
+    tracker = current_tracker.get()
+    if tracker is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        tracker.seconds += time.perf_counter() - started
+        tracker.count += 1
+
+
+def install(connection):
+    if track_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(track_queries)
+
+
+def _connection_created(sender, connection, **kwargs):
+    install(connection)
+
+
+connection_created.connect(_connection_created, dispatch_uid='labeling.metrics')
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return (match.view_name or match.route) if match else 'unmatched'
+
+
+def observe(request, response, tracker, elapsed):
+    labels = (view_name(request), request.method)
+    registry.record([
+        (REQUESTS, (*labels, str(response.status_code)), 1),
+        (LATENCY, labels, elapsed),
+        (DB_QUERIES, labels, tracker.count),
+        (DB_SECONDS, labels, tracker.seconds),
+    ])
+
+
+class RequestMetricsMiddleware:
+    """
+    Mesure chaque requête (synchrone ou asynchrone). Avec METRICS_SERVER_TIMING, ajoute
+    un en-tête `Server-Timing` (`app` et `db`) aux réponses non diffusées en flux. Pour une
+    réponse en flux, la mesure inclut la lecture complète du corps.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        for connection in connections.all(initialized_only=True):
+            install(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        tracker = QueryTracker()
+        started = time.perf_counter()
+        token = current_tracker.set(tracker)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_tracker.reset(token)
+        return self._finish(request, response, tracker, started)
+
+    async def __acall__(self, request):
+        tracker = QueryTracker()
+        started = time.perf_counter()
+        token = current_tracker.set(tracker)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_tracker.reset(token)
+        return self._finish(request, response, tracker, started)
+
+    def _finish(self, request, response, tracker, started):
+        if response.streaming and not getattr(response, 'is_async', False):
+            response.streaming_content = self._stream(response.streaming_content, request, response, tracker, started)
+            return response
+
+        elapsed = time.perf_counter() - started
+        observe(request, response, tracker, elapsed)
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'app;dur={elapsed * 1000:.2f}, '
+                f'db;dur={tracker.seconds * 1000:.2f};desc="{tracker.count} queries"'
+            )
+        return response
+
+    def _stream(self, content, request, response, tracker, started):
+        # Le générateur s'exécute dans le contexte de l'appelant : pas de reset() possible
+        current_tracker.set(tracker)
+        try:
+            yield from content
+        finally:
+            current_tracker.set(None)
+            observe(request, response, tracker, time.perf_counter() - started)
+
+
+def _is_admin(request):
+    """Administrateur authentifié par jeton JWT ou par session."""
+    try:
+        authenticated = RoleTokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    user = authenticated[0] if authenticated else request.user
+    return user.is_authenticated and getattr(user, 'role', None) == 'admin'
+
+
+def metrics_view(request):
+    """
+    Export Prometheus : `Authorization: Bearer <METRICS_TOKEN>` si le jeton est défini,
+    réservé aux administrateurs sinon.
+    """
+    token = settings.METRICS_TOKEN
+    if token:
+        allowed = hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode())
+    else:
+        allowed = _is_admin(request)
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.27 on 2026-10-18 07:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.functions
+import django.db.models.deletion
+
+
+def backfill_assignment_count(apps, schema_editor):
+    DataItem = apps.get_model('labeling', 'DataItem')
+    Annotation = apps.get_model('labeling', 'Annotation')
+    counts = (
+        Annotation.objects.filter(item=models.OuterRef('pk'))
+        .order_by().values('item').annotate(n=models.Count('id')).values('n')
+    )
+    DataItem.objects.update(assignment_count=models.functions.Coalesce(models.Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('labeling', '0002_annotation_dataitem_label_validation_annotation_item_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='dataitem',
+            name='assignment_count',
+            field=models.PositiveIntegerField(default=0, help_text='baux en cours + annotations reçues, borné par LABELING_ANNOTATIONS_PER_ITEM'),
+        ),
+        migrations.AlterField(
+            model_name='dataitem',
+            name='data_type',
+            field=models.CharField(choices=[('text', 'Texte'), ('audio', 'Audio')], max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='dataitem',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['assignment_count', 'id'], name='dataitem_claimable_idx'),
+        ),
+        migrations.AddField(
+            model_name='tasklease',
+            name='item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leases', to='labeling.dataitem'),
+        ),
+        migrations.AddField(
+            model_name='tasklease',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leases', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='tasklease',
+            unique_together={('item', 'user')},
+        ),
+        migrations.RunPython(backfill_assignment_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.27 on 2026-10-18 07:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_tallies(apps, schema_editor):
+    Annotation = apps.get_model('labeling', 'Annotation')
+    LabelTally = apps.get_model('labeling', 'LabelTally')
+    rows = Annotation.objects.order_by().values('item_id', 'label_id').annotate(votes=models.Count('id'))
+    LabelTally.objects.bulk_create(
+        (LabelTally(item_id=row['item_id'], label_id=row['label_id'], votes=row['votes']) for row in rows.iterator()),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('labeling', '0003_task_leases'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LabelTally',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('votes', models.PositiveIntegerField(default=0)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tallies', to='labeling.dataitem')),
+                ('label', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tallies', to='labeling.label')),
+            ],
+            options={
+                'unique_together': {('item', 'label')},
+            },
+        ),
+        migrations.RunPython(populate_tallies, migrations.RunPython.noop),
+    ]
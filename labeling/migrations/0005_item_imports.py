@@ -0,0 +1,26 @@
+# Generated by Django 4.2.27 on 2026-10-18 07:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('labeling', '0004_label_tallies'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, unique=True)),
+                ('rows_read', models.PositiveBigIntegerField(default=0)),
+                ('rows_imported', models.PositiveBigIntegerField(default=0)),
+                ('rows_rejected', models.PositiveBigIntegerField(default=0)),
+                ('completed', models.BooleanField(default=False)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.27 on 2026-10-18 07:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_user_stats(apps, schema_editor):
+    Annotation = apps.get_model('labeling', 'Annotation')
+    UserStats = apps.get_model('labeling', 'UserStats')
+    rows = (
+        Annotation.objects.order_by().values('user_id')
+        .annotate(
+            total=models.Count('id'),
+            approved=models.Count('id', filter=models.Q(validation__is_approved=True)),
+            rejected=models.Count('id', filter=models.Q(validation__is_approved=False)),
+        )
+    )
+    UserStats.objects.bulk_create(
+        (
+            UserStats(
+                user_id=row['user_id'],
+                total_annotations=row['total'],
+                approved_annotations=row['approved'],
+                rejected_annotations=row['rejected'],
+                precision=row['approved'] / row['total'] * 100,
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('labeling', '0005_item_imports'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='annotation_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_annotations', models.PositiveIntegerField(default=0)),
+                ('approved_annotations', models.PositiveIntegerField(default=0)),
+                ('rejected_annotations', models.PositiveIntegerField(default=0)),
+                ('precision', models.FloatField(default=0, help_text="pourcentage d'annotations approuvées")),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-total_annotations', 'user'], name='userstats_volume_idx'), models.Index(fields=['-precision', '-total_annotations'], name='userstats_precision_idx')],
+            },
+        ),
+        migrations.RunPython(populate_user_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.27 on 2026-10-18 07:24
+
+from django.db import migrations, models
+
+
+class AddIndex(migrations.AddIndex):
+    """Sur PostgreSQL, crée l'index avec CONCURRENTLY pour ne pas bloquer les écritures sur les grosses tables."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.add_index(model, self.index, concurrently=True)
+        else:
+            schema_editor.add_index(model, self.index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.remove_index(model, self.index, concurrently=True)
+        else:
+            schema_editor.remove_index(model, self.index)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('labeling', '0006_user_stats'),
+    ]
+
+    operations = [
+        AddIndex(
+            model_name='annotation',
+            index=models.Index(fields=['item', 'label'], name='annotation_item_label_idx'),
+        ),
+        AddIndex(
+            model_name='annotation',
+            index=models.Index(fields=['created_at', 'id'], name='annotation_created_idx'),
+        ),
+        AddIndex(
+            model_name='dataitem',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['created_at', 'id'], name='dataitem_active_created_idx'),
+        ),
+        AddIndex(
+            model_name='validation',
+            index=models.Index(fields=['annotation', 'is_approved'], name='validation_verdict_idx'),
+        ),
+        AddIndex(
+            model_name='validation',
+            index=models.Index(fields=['is_approved', 'validated_at'], name='validation_approved_idx'),
+        ),
+        AddIndex(
+            model_name='validation',
+            index=models.Index(fields=['validated_at', 'id'], name='validation_validated_at_idx'),
+        ),
+    ]
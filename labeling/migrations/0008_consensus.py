@@ -0,0 +1,60 @@
+# Generated by Django 4.2.27 on 2026-10-18 07:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('labeling', '0007_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataitem',
+            name='vote_version',
+            field=models.PositiveIntegerField(default=0, help_text='incrémenté à chaque vote ajouté, modifié ou retiré (fraîcheur des postérieurs)'),
+        ),
+        migrations.CreateModel(
+            name='ConsensusRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('warm_start', models.BooleanField(default=False)),
+                ('iterations', models.PositiveIntegerField(default=0)),
+                ('converged', models.BooleanField(default=False)),
+                ('log_likelihood', models.FloatField(blank=True, null=True)),
+                ('items', models.PositiveBigIntegerField(default=0)),
+                ('annotators', models.PositiveIntegerField(default=0)),
+                ('annotations', models.PositiveBigIntegerField(default=0)),
+                ('class_priors', models.JSONField(default=dict, help_text='probabilité a priori de chaque label (id -> p)')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ItemPosterior',
+            fields=[
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='posterior', serialize=False, to='labeling.dataitem')),
+                ('confidence', models.FloatField()),
+                ('distribution', models.JSONField(default=dict)),
+                ('total_votes', models.PositiveIntegerField(default=0)),
+                ('vote_version', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('label', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='posteriors', to='labeling.label')),
+                ('run', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='posteriors', to='labeling.consensusrun')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AnnotatorReliability',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='reliability', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('confusion', models.JSONField(default=dict)),
+                ('accuracy', models.FloatField(default=0, help_text='probabilité de donner le vrai label, pondérée par les a priori')),
+                ('annotations', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('run', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reliabilities', to='labeling.consensusrun')),
+            ],
+        ),
+    ]
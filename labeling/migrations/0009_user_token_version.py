@@ -0,0 +1,25 @@
+# Generated by Django 4.2.27 on 2026-10-18 07:45
+
+from django.db import migrations, models
+import labeling.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('labeling', '0008_consensus'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='token_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', labeling.models.TokenUserManager()),
+            ],
+        ),
+    ]
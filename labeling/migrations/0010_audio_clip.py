@@ -0,0 +1,32 @@
+# Generated by Django 4.2.27 on 2026-10-18 07:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('labeling', '0009_user_token_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AudioClip',
+            fields=[
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='audio', serialize=False, to='labeling.dataitem')),
+                ('file', models.FileField(upload_to='audio/')),
+                ('source', models.CharField(help_text="enregistrement d'origine", max_length=255)),
+                ('segment_index', models.PositiveIntegerField(default=0)),
+                ('start_seconds', models.FloatField(default=0)),
+                ('duration_seconds', models.FloatField()),
+                ('sample_rate', models.PositiveIntegerField()),
+                ('channels', models.PositiveSmallIntegerField()),
+                ('peaks_per_second', models.PositiveSmallIntegerField()),
+                ('peaks', models.JSONField(help_text='min et max alternés par fenêtre, entiers de -127 à 127, tous canaux confondus')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['source', 'segment_index'], name='audioclip_source_idx')],
+            },
+        ),
+    ]
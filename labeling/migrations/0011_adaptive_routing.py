@@ -0,0 +1,55 @@
+# Generated by Django 4.2.27 on 2026-10-18 08:08
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def populate_routing(apps, schema_editor):
+    DataItem = apps.get_model('labeling', 'DataItem')
+    LabelTally = apps.get_model('labeling', 'LabelTally')
+    rows = (
+        LabelTally.objects.filter(votes__gt=0).order_by().values('item_id', 'item__data_type')
+        .annotate(top=models.Max('votes'), total=models.Sum('votes'))
+    )
+    by_uncertainty, retired = {}, []
+    for row in rows.iterator():
+        top, total = row['top'], row['total']
+        by_uncertainty.setdefault(1 - (top + 1) / (total + 2), []).append(row['item_id'])
+        rule = settings.LABELING_RETIREMENT.get(row['item__data_type'])
+        if rule and total >= rule['min_votes'] and top / total >= rule['confidence']:
+            retired.append(row['item_id'])
+    for value, ids in by_uncertainty.items():
+        for start in range(0, len(ids), 5000):
+            DataItem.objects.filter(id__in=ids[start:start + 5000]).update(uncertainty=value)
+    for start in range(0, len(retired), 5000):
+        DataItem.objects.filter(id__in=retired[start:start + 5000]).update(retired_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('labeling', '0010_audio_clip'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='dataitem',
+            name='dataitem_claimable_idx',
+        ),
+        migrations.AddField(
+            model_name='dataitem',
+            name='retired_at',
+            field=models.DateTimeField(blank=True, help_text="consensus atteint : l'élément n'est plus proposé aux contributeurs", null=True),
+        ),
+        migrations.AddField(
+            model_name='dataitem',
+            name='uncertainty',
+            field=models.FloatField(default=0.5, help_text='incertitude restante sur le label majoritaire, recalculée à chaque vote (routing.py)'),
+        ),
+        migrations.AddIndex(
+            model_name='dataitem',
+            index=models.Index(condition=models.Q(('is_active', True), ('retired_at__isnull', True)), fields=['-uncertainty', 'assignment_count', 'id'], name='dataitem_routing_idx'),
+        ),
+        migrations.RunPython(populate_routing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.27 on 2026-10-18 08:24
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('labeling', '0012_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('item', 'Élément'), ('annotation', 'Annotation'), ('validation', 'Validation')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('created', 'Création'), ('updated', 'Modification'), ('deleted', 'Suppression')], max_length=10)),
+                ('data', models.JSONField(blank=True, help_text="état après l'écriture ; null pour une suppression", null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('position', models.BigIntegerField(help_text="curseur du flux, attribué une fois la transaction d'écriture terminée (changes.py)", null=True, unique=True)),
+                ('txid', models.BigIntegerField(help_text="transaction d'écriture (PostgreSQL)", null=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('position__isnull', True)), fields=['txid', 'id'], name='changeevent_unpublished_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 4.2.27 on 2026-10-18 08:28
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('labeling', '0013_change_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedAnnotation',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedDataItem',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('content', models.TextField()),
+                ('data_type', models.CharField(choices=[('text', 'Texte'), ('audio', 'Audio')], max_length=10)),
+                ('is_active', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField()),
+                ('audio', models.JSONField(blank=True, help_text="champs de l'AudioClip de l'élément ; le fichier reste sous MEDIA_ROOT", null=True)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedValidation',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('is_approved', models.BooleanField(default=True)),
+                ('feedback', models.TextField(blank=True, null=True)),
+                ('validated_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='changeevent',
+            name='action',
+            field=models.CharField(choices=[('created', 'Création'), ('updated', 'Modification'), ('deleted', 'Suppression'), ('archived', 'Archivage'), ('restored', 'Restauration')], max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='changeevent',
+            name='data',
+            field=models.JSONField(blank=True, help_text="état après l'écriture ; null pour une suppression ou un archivage", null=True),
+        ),
+        migrations.AddIndex(
+            model_name='dataitem',
+            index=models.Index(condition=models.Q(('is_active', False)), fields=['id'], name='dataitem_inactive_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedvalidation',
+            name='annotation',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='validation', to='labeling.archivedannotation'),
+        ),
+        migrations.AddField(
+            model_name='archivedvalidation',
+            name='validator',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archiveddataitem',
+            index=models.Index(fields=['archived_at', 'id'], name='archiveditem_archived_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedannotation',
+            name='item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='annotations', to='labeling.archiveddataitem'),
+        ),
+        migrations.AddField(
+            model_name='archivedannotation',
+            name='label',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='labeling.label'),
+        ),
+        migrations.AddField(
+            model_name='archivedannotation',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
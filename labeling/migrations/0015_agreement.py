@@ -0,0 +1,47 @@
+# Generated by Django 4.2.27 on 2026-10-18 08:33
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('labeling', '0014_archive_tables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgreementDelta',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('data_type', models.CharField(choices=[('text', 'Texte'), ('audio', 'Audio')], max_length=10)),
+                ('stats', models.JSONField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('position', models.BigIntegerField(help_text='ordre de prise en compte, attribué comme celui des ChangeEvent', null=True, unique=True)),
+                ('txid', models.BigIntegerField(help_text="transaction d'écriture (PostgreSQL)", null=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('position__isnull', True)), fields=['txid', 'id'], name='agreementdelta_unpublished_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AgreementSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('full', models.BooleanField(help_text='recalcul complet ; sinon instantané précédent + deltas de votes')),
+                ('delta_cursor', models.BigIntegerField(default=0, help_text='position du dernier AgreementDelta inclus')),
+                ('covered_deltas', models.JSONField(blank=True, default=list, help_text='AgreementDelta de position ultérieure déjà inclus (lus par le recalcul complet)')),
+                ('stats', models.JSONField(help_text='statistiques suffisantes par data_type')),
+                ('pairwise', models.JSONField(blank=True, help_text="accord par paires d'annotateurs (recalcul complet)", null=True)),
+                ('pairwise_at', models.DateTimeField(blank=True, null=True)),
+                ('duration_seconds', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('consensus', 'Consensus Dawid–Skene'), ('export', 'Export du jeu de données'), ('rebuild_stats', 'Reconstruction des statistiques utilisateur'), ('rebuild_tallies', 'Reconstruction des décomptes et du routage'), ('agreement', 'Accord inter-annotateurs')], max_length=30),
+        ),
+    ]
@@ -1,9 +1,37 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import AbstractUser, UserManager
 from django.conf import settings
+from django.utils import timezone
+
+
+# Champs portés par les claims du jeton : les modifier révoque les jetons d'accès en cours
+TOKEN_FIELDS = ('role', 'is_active', 'is_staff')
+
+
+class UserQuerySet(models.QuerySet):
+
+    def update(self, **kwargs):
+        """
+        `update()` contourne les signaux de `User` : modifier un champ de `TOKEN_FIELDS` incrémente
+        ici `token_version` et retire les versions en cache, comme un `save()`.
+        """
+        if not set(TOKEN_FIELDS) & set(kwargs):
+            return super().update(**kwargs)
+        from .authentication import forget_token_versions
+
+        with transaction.atomic(using=self.db):
+            user_ids = list(self.values_list('pk', flat=True))
+            updated = super().update(token_version=F('token_version') + 1, **kwargs)
+        transaction.on_commit(lambda: forget_token_versions(user_ids), using=self.db)
+        return updated
+
+
+class TokenUserManager(UserManager.from_queryset(UserQuerySet)):
+    pass
 
 
-# Create your models here.
 class User(AbstractUser):
     
     ROLE_CHOICES = (
@@ -13,37 +41,132 @@ class User(AbstractUser):
     )
     
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='contributor')
+    # Incrémenté quand le rôle, le statut actif ou staff change : les jetons d'accès d'une version antérieure sont révoqués
+    token_version = models.PositiveIntegerField(default=0, editable=False)
 
-    objects = UserManager()
+    objects = TokenUserManager()
 
     def __str__(self):
         return f"{self.username} ({self.role})"
 
+class UserStats(models.Model):
+    """Compteurs d'annotation par utilisateur, mis à jour à chaque écriture d'annotation ou de validation."""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='annotation_stats')
+    total_annotations = models.PositiveIntegerField(default=0)
+    approved_annotations = models.PositiveIntegerField(default=0)
+    rejected_annotations = models.PositiveIntegerField(default=0)
+    precision = models.FloatField(default=0, help_text='pourcentage d\'annotations approuvées')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-total_annotations', 'user'], name='userstats_volume_idx'),
+            models.Index(fields=['-precision', '-total_annotations'], name='userstats_precision_idx'),
+        ]
+
+    objects = models.Manager()
+
+
+# Compteurs annotés par `DataItemQuerySet.with_progress`
+PROGRESS_COUNTS = ('num_annotations', 'num_validated', 'num_approved')
+
+
+class DataItemQuerySet(models.QuerySet):
+
+    def with_progress(self, counts=PROGRESS_COUNTS):
+        """
+        Annote chaque élément avec ses compteurs d'annotations dans la même requête.
+        Les propriétés de DataItem lisent ces valeurs au lieu de relancer un COUNT par ligne.
+        Les compteurs sont des sous-requêtes corrélées (sans GROUP BY) : avec un ORDER BY ... LIMIT,
+        seules les lignes de la page sont comptées, via l'index (item, label) d'Annotation.
+        `counts` restreint les compteurs calculés (champs partiels).
+        """
+        filters = {
+            'num_annotations': {},
+            'num_validated': {'validation__isnull': False},
+            'num_approved': {'validation__is_approved': True},
+        }
+        return self.annotate(**{name: _annotation_count(**filters[name]) for name in counts})
+
+    def update(self, **kwargs):
+        """
+        `update()` contourne `post_save` : activer ou désactiver des éléments retire ici leurs
+        réponses `progress` et `consensus` du cache, servies sans relire l'élément.
+        """
+        if 'is_active' not in kwargs:
+            return super().update(**kwargs)
+        from .response_cache import CONSENSUS, PROGRESS
+
+        with transaction.atomic(using=self.db):
+            item_ids = list(self.values_list('pk', flat=True))
+            updated = super().update(**kwargs)
+            PROGRESS.invalidate(item_ids)
+            CONSENSUS.invalidate(item_ids)
+        return updated
+
+
+def _annotation_count(**filters):
+    counts = (
+        Annotation.objects.filter(item=models.OuterRef('pk'), **filters)
+        .order_by().values('item').annotate(n=Count('id')).values('n')
+    )
+    return Coalesce(models.Subquery(counts, output_field=models.IntegerField()), 0)
+
+
 class DataItem(models.Model):
     TYPES = (('text', 'Texte'), ('audio', 'Audio'))
     content = models.TextField(help_text='url de l\'element ou contenu textuel')
     data_type = models.CharField(max_length=10, choices=TYPES)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    assignment_count = models.PositiveIntegerField(
+        default=0, help_text='baux en cours + annotations reçues, borné par LABELING_ANNOTATIONS_PER_ITEM'
+    )
+    uncertainty = models.FloatField(
+        default=0.5, help_text='incertitude restante sur le label majoritaire, recalculée à chaque vote (routing.py)'
+    )
+    retired_at = models.DateTimeField(
+        null=True, blank=True, help_text='consensus atteint : l\'élément n\'est plus proposé aux contributeurs'
+    )
+    vote_version = models.PositiveIntegerField(
+        default=0, help_text='incrémenté à chaque vote ajouté, modifié ou retiré (fraîcheur des postérieurs)'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['-uncertainty', 'assignment_count', 'id'],
+                condition=models.Q(is_active=True, retired_at__isnull=True), name='dataitem_routing_idx',
+            ),
+            models.Index(fields=['created_at', 'id'], condition=models.Q(is_active=True), name='dataitem_active_created_idx'),
+            # Lots de `archive_items` : seuls les éléments inactifs
+            models.Index(fields=['id'], condition=models.Q(is_active=False), name='dataitem_inactive_idx'),
+        ]
     
     def __str__(self):
         return f"{self.data_type} - {self.id}"
 
-    objects = models.Manager()
+    objects = DataItemQuerySet.as_manager()
 
     @property
     def annotation_count(self):
         """Retourne le nombre total d'annotations pour cet élément."""
+        if hasattr(self, 'num_annotations'):
+            return self.num_annotations
         return self.annotations.count()
 
     @property
     def validated_annotation_count(self):
         """Retourne le nombre d'annotations validées pour cet élément."""
+        if hasattr(self, 'num_validated'):
+            return self.num_validated
         return self.annotations.filter(validation__isnull=False).count()
 
     @property
     def approved_annotation_count(self):
         """Retourne le nombre d'annotations approuvées pour cet élément."""
+        if hasattr(self, 'num_approved'):
+            return self.num_approved
         return self.annotations.filter(validation__is_approved=True).count()
 
     @property
@@ -76,9 +199,128 @@ class Annotation(models.Model):
     
     class Meta:
         unique_together = ('item', 'user')
+        indexes = [
+            models.Index(fields=['item', 'label'], name='annotation_item_label_idx'),
+            models.Index(fields=['created_at', 'id'], name='annotation_created_idx'),
+        ]
 
     objects = models.Manager()
         
+class LabelTally(models.Model):
+    """Nombre de votes par (élément, label), maintenu à chaque écriture d'annotation."""
+    item = models.ForeignKey(DataItem, on_delete=models.CASCADE, related_name='tallies')
+    label = models.ForeignKey(Label, on_delete=models.CASCADE, related_name='tallies')
+    votes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('item', 'label')
+
+    objects = models.Manager()
+
+
+class TaskLease(models.Model):
+    """Bail temporaire d'un élément attribué à un contributeur via la file de claim."""
+    item = models.ForeignKey(DataItem, on_delete=models.CASCADE, related_name='leases')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='leases')
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('item', 'user')
+
+    objects = models.Manager()
+
+
+class AudioClip(models.Model):
+    """
+    Fichier WAV stocké sous MEDIA_ROOT pour un élément audio, avec ses pics de forme d'onde
+    précalculés à l'import. Un enregistrement long est découpé en segments, un élément chacun.
+    """
+    item = models.OneToOneField(DataItem, on_delete=models.CASCADE, primary_key=True, related_name='audio')
+    file = models.FileField(upload_to='audio/')
+    source = models.CharField(max_length=255, help_text='enregistrement d\'origine')
+    segment_index = models.PositiveIntegerField(default=0)
+    start_seconds = models.FloatField(default=0)
+    duration_seconds = models.FloatField()
+    sample_rate = models.PositiveIntegerField()
+    channels = models.PositiveSmallIntegerField()
+    peaks_per_second = models.PositiveSmallIntegerField()
+    peaks = models.JSONField(help_text='min et max alternés par fenêtre, entiers de -127 à 127, tous canaux confondus')
+
+    class Meta:
+        indexes = [models.Index(fields=['source', 'segment_index'], name='audioclip_source_idx')]
+
+    objects = models.Manager()
+
+    def __str__(self):
+        return f"{self.source} #{self.segment_index}"
+
+
+class ItemImport(models.Model):
+    """Point de reprise d'un import d'éléments, mis à jour dans la transaction de chaque lot."""
+    source = models.CharField(max_length=255, unique=True)
+    rows_read = models.PositiveBigIntegerField(default=0)
+    rows_imported = models.PositiveBigIntegerField(default=0)
+    rows_rejected = models.PositiveBigIntegerField(default=0)
+    completed = models.BooleanField(default=False)
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = models.Manager()
+
+    def __str__(self):
+        return f"{self.source} ({self.rows_imported} importés)"
+
+
+class ConsensusRun(models.Model):
+    """Exécution de l'algorithme de Dawid–Skene sur l'ensemble des annotations."""
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    warm_start = models.BooleanField(default=False)
+    iterations = models.PositiveIntegerField(default=0)
+    converged = models.BooleanField(default=False)
+    log_likelihood = models.FloatField(null=True, blank=True)
+    items = models.PositiveBigIntegerField(default=0)
+    annotators = models.PositiveIntegerField(default=0)
+    annotations = models.PositiveBigIntegerField(default=0)
+    class_priors = models.JSONField(default=dict, help_text='probabilité a priori de chaque label (id -> p)')
+
+    objects = models.Manager()
+
+    def __str__(self):
+        return f"Consensus #{self.pk} ({self.items} éléments, {self.iterations} itérations)"
+
+
+class AnnotatorReliability(models.Model):
+    """Matrice de confusion estimée d'un annotateur : confusion[vrai label][label donné] = probabilité."""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='reliability')
+    run = models.ForeignKey(ConsensusRun, on_delete=models.SET_NULL, null=True, related_name='reliabilities')
+    confusion = models.JSONField(default=dict)
+    accuracy = models.FloatField(default=0, help_text='probabilité de donner le vrai label, pondérée par les a priori')
+    annotations = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = models.Manager()
+
+
+class ItemPosterior(models.Model):
+    """
+    Distribution a posteriori des labels d'un élément. `vote_version` fige la version des votes
+    prise en compte (`DataItem.vote_version`) : si un vote a été ajouté, corrigé ou retiré depuis,
+    le consensus retombe sur la majorité.
+    """
+    item = models.OneToOneField(DataItem, on_delete=models.CASCADE, primary_key=True, related_name='posterior')
+    label = models.ForeignKey(Label, on_delete=models.CASCADE, related_name='posteriors')
+    confidence = models.FloatField()
+    distribution = models.JSONField(default=dict)
+    total_votes = models.PositiveIntegerField(default=0)
+    vote_version = models.PositiveIntegerField(default=0)
+    run = models.ForeignKey(ConsensusRun, on_delete=models.SET_NULL, null=True, related_name='posteriors')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = models.Manager()
+
+
 class Validation(models.Model):
     annotation = models.OneToOneField(Annotation, on_delete=models.CASCADE, related_name='validation')
     validator = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -86,5 +328,158 @@ class Validation(models.Model):
     feedback = models.TextField(blank=True, null=True)
     validated_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['annotation', 'is_approved'], name='validation_verdict_idx'),
+            models.Index(fields=['is_approved', 'validated_at'], name='validation_approved_idx'),
+            models.Index(fields=['validated_at', 'id'], name='validation_validated_at_idx'),
+        ]
+
+    objects = models.Manager()
+    
+
+class Job(models.Model):
+    """Tâche de fond soumise par l'API et exécutée par `run_workers` (voir jobs.py)."""
+    KINDS = (
+        ('consensus', 'Consensus Dawid–Skene'),
+        ('export', 'Export du jeu de données'),
+        ('rebuild_stats', 'Reconstruction des statistiques utilisateur'),
+        ('rebuild_tallies', 'Reconstruction des décomptes et du routage'),
+        ('agreement', 'Accord inter-annotateurs'),
+    )
+    STATUSES = (('queued', 'En attente'), ('running', 'En cours'), ('succeeded', 'Terminée'), ('failed', 'Échouée'))
+
+    kind = models.CharField(max_length=30, choices=KINDS)
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUSES, default='queued')
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='jobs')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(help_text='date à partir de laquelle un worker peut prendre la tâche (délai de reprise)')
+    locked_by = models.CharField(max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    progress = models.FloatField(default=0, help_text='avancement de 0 à 1')
+    message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['run_after', 'id'], condition=models.Q(status='queued'), name='job_queued_idx'),
+            models.Index(fields=['heartbeat_at'], condition=models.Q(status='running'), name='job_running_idx'),
+            models.Index(fields=['created_at', 'id'], name='job_created_idx'),
+        ]
+
+    objects = models.Manager()
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+class ChangeEvent(models.Model):
+    """Journal des écritures, en ajout seul : servi par `GET /api/changes/` (voir changes.py)."""
+    KINDS = (('item', 'Élément'), ('annotation', 'Annotation'), ('validation', 'Validation'))
+    ACTIONS = (
+        ('created', 'Création'), ('updated', 'Modification'), ('deleted', 'Suppression'),
+        ('archived', 'Archivage'), ('restored', 'Restauration'),
+    )
+
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=20, choices=KINDS)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTIONS)
+    data = models.JSONField(null=True, blank=True, help_text='état après l\'écriture ; null pour une suppression ou un archivage')
+    created_at = models.DateTimeField(default=timezone.now)
+    position = models.BigIntegerField(
+        null=True, unique=True, help_text='curseur du flux, attribué une fois la transaction d\'écriture terminée (changes.py)'
+    )
+    txid = models.BigIntegerField(null=True, help_text='transaction d\'écriture (PostgreSQL)')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['txid', 'id'], condition=models.Q(position__isnull=True), name='changeevent_unpublished_idx'),
+        ]
+
+    objects = models.Manager()
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id} {self.action} ({self.pk})"
+
+
+class ArchivedDataItem(models.Model):
+    """Élément inactif déplacé hors des tables chaudes par `archive_items` (voir archive.py), même identifiant."""
+    id = models.BigIntegerField(primary_key=True)
+    content = models.TextField()
+    data_type = models.CharField(max_length=10, choices=DataItem.TYPES)
+    is_active = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    audio = models.JSONField(null=True, blank=True, help_text='champs de l\'AudioClip de l\'élément ; le fichier reste sous MEDIA_ROOT')
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=['archived_at', 'id'], name='archiveditem_archived_idx')]
+
+    objects = models.Manager()
+
+    def __str__(self):
+        return f"{self.data_type} - {self.id} (archivé)"
+
+
+class ArchivedAnnotation(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    item = models.ForeignKey(ArchivedDataItem, on_delete=models.CASCADE, related_name='annotations')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    label = models.ForeignKey(Label, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField()
+
+    objects = models.Manager()
+
+
+class ArchivedValidation(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    annotation = models.OneToOneField(ArchivedAnnotation, on_delete=models.CASCADE, related_name='validation')
+    validator = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    is_approved = models.BooleanField(default=True)
+    feedback = models.TextField(blank=True, null=True)
+    validated_at = models.DateTimeField()
+
+    objects = models.Manager()
+
+
+class AgreementSnapshot(models.Model):
+    """Accord inter-annotateurs à un instant donné (voir agreement.py) ; le plus récent est servi par l'API."""
+    created_at = models.DateTimeField(default=timezone.now)
+    full = models.BooleanField(help_text='recalcul complet ; sinon instantané précédent + deltas de votes')
+    delta_cursor = models.BigIntegerField(default=0, help_text='position du dernier AgreementDelta inclus')
+    covered_deltas = models.JSONField(
+        default=list, blank=True, help_text='AgreementDelta de position ultérieure déjà inclus (lus par le recalcul complet)'
+    )
+    stats = models.JSONField(help_text='statistiques suffisantes par data_type')
+    pairwise = models.JSONField(null=True, blank=True, help_text='accord par paires d\'annotateurs (recalcul complet)')
+    pairwise_at = models.DateTimeField(null=True, blank=True)
+    duration_seconds = models.FloatField(default=0)
+
+    objects = models.Manager()
+
+    def __str__(self):
+        return f"Accord #{self.pk} ({self.created_at:%Y-%m-%d %H:%M})"
+
+
+class AgreementDelta(models.Model):
+    """Variation des statistiques d'accord due à une écriture de votes, en attente d'un rafraîchissement."""
+    id = models.BigAutoField(primary_key=True)
+    data_type = models.CharField(max_length=10, choices=DataItem.TYPES)
+    stats = models.JSONField()
+    created_at = models.DateTimeField(default=timezone.now)
+    position = models.BigIntegerField(null=True, unique=True, help_text='ordre de prise en compte, attribué comme celui des ChangeEvent')
+    txid = models.BigIntegerField(null=True, help_text='transaction d\'écriture (PostgreSQL)')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['txid', 'id'], condition=models.Q(position__isnull=True), name='agreementdelta_unpublished_idx'),
+        ]
+
     objects = models.Manager()
-    
\ No newline at end of file
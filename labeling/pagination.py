@@ -0,0 +1,111 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+from .routing import ROUTING_ORDER
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Pagination par curseur (keyset) : chaque page est lue via un index sur la clé
+    de tri au lieu d'un OFFSET, quel que soit le nombre de lignes à sauter.
+    """
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+
+class IdKeysetPagination(KeysetPagination):
+    """Pour les modèles sans date de création (labels, utilisateurs)."""
+    ordering = ('id',)
+
+
+class ValidatedAtKeysetPagination(KeysetPagination):
+    ordering = ('-validated_at', '-id')
+
+
+def _reverse(ordering):
+    return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+
+
+class RoutingKeysetPagination(KeysetPagination):
+    """
+    Curseur sur la clé de tri complète (incertitude, attributions, id) et non sur sa seule
+    première colonne : les éléments à égalité d'incertitude (tous ceux sans vote, par exemple)
+    ne sont pas départagés par un décalage, plafonné par DRF à 1000 lignes. Chaque page est
+    lue sur l'index de routage à partir de la dernière ligne de la page précédente.
+    Même curseur encodé et mêmes liens que `CursorPagination` : seule la position change.
+    """
+    ordering = ROUTING_ORDER
+
+    def _get_position_from_instance(self, instance, ordering):
+        fields = [field.lstrip('-') for field in ordering]
+        if isinstance(instance, dict):
+            return json.dumps([instance[field] for field in fields])
+        return json.dumps([getattr(instance, field) for field in fields])
+
+    def _after(self, ordering, position):
+        """Lignes qui suivent `position` dans `ordering` (comparaison lexicographique de la clé)."""
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+        lookups = [
+            (field.lstrip('-'), 'lt' if field.startswith('-') else 'gt', value) for field, value in zip(ordering, values)
+        ]
+        name, op, value = lookups[-1]
+        condition = Q(**{f'{name}__{op}': value})
+        for name, op, value in reversed(lookups[:-1]):
+            condition = Q(**{f'{name}__{op}': value}) | Q(**{name: value}) & condition
+        # Borne sur la première colonne seule : parcours d'intervalle de l'index
+        name, op, value = lookups[0]
+        return Q(**{f'{name}__{op}e': value}) & condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse, position = (self.cursor.reverse, self.cursor.position) if self.cursor else (False, None)
+
+        ordering = _reverse(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            try:
+                queryset = queryset.filter(self._after(ordering, position))
+            except (TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        following = self._get_position_from_instance(results[-1], self.ordering) if len(results) > self.page_size else None
+        # Positions uniques : les liens de `CursorPagination` n'ont jamais de décalage
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.next_position = position is not None, position
+            self.has_previous, self.previous_position = following is not None, following
+        else:
+            self.has_next, self.next_position = following is not None, following
+            self.has_previous, self.previous_position = position is not None, position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+
+async def apaginate_queryset(paginator, queryset, request, view=None):
+    """
+    `paginate_queryset` de la pagination DRF, inchangé, exécuté dans un thread : mêmes curseurs
+    et mêmes attributs posés sur `paginator` (donc même `get_paginated_response`).
+    """
+    return await sync_to_async(paginator.paginate_queryset)(queryset, request, view)
@@ -17,6 +17,15 @@ class IsValidator(permissions.BasePermission):
         return request.user and request.user.is_authenticated and request.user.role == 'validator'
 
 
+class IsAdmin(permissions.BasePermission):
+    """
+    Acces reservé au utilisateur ayant le role 'admin'.
+    """
+
+    def has_permission(self, request, view):
+        return request.user and request.user.is_authenticated and request.user.role == 'admin'
+
+
 class IsAdminOrReadOnly(permissions.BasePermission):
     """
     Acces en lecture pour tous les utilisateurs authentifiés.
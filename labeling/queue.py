@@ -0,0 +1,138 @@
+"""
+File d'attribution des éléments aux contributeurs.
+
+Chaque élément porte un compteur `assignment_count` (baux en cours + annotations
+reçues). Un claim verrouille, les plus incertains d'abord, des éléments non retirés
+dont le compteur est sous la cible avec `SELECT ... FOR UPDATE SKIP LOCKED`, les
+incrémente et crée un bail qui expire.
+Sur les bases sans SKIP LOCKED (SQLite), l'incrément conditionnel
+`UPDATE ... WHERE assignment_count < cible` sert de verrou optimiste.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, F, OuterRef
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Annotation, DataItem, TaskLease
+from .routing import ROUTING_ORDER
+
+EXPIRED_BATCH_SIZE = 1000
+# Sans SKIP LOCKED, certains candidats peuvent être pris par un autre claim entre la lecture et l'UPDATE
+FALLBACK_OVERSCAN = 4
+
+
+def release_expired_leases(now=None, batch_size=EXPIRED_BATCH_SIZE):
+    """Supprime un lot de baux expirés et rend leurs places aux éléments concernés."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        expired = TaskLease.objects.filter(expires_at__lte=now).order_by('expires_at')
+        if connection.features.has_select_for_update_skip_locked:
+            expired = expired.select_for_update(skip_locked=True)
+        rows = list(expired.values_list('id', 'item_id')[:batch_size])
+        if not rows:
+            return 0
+        TaskLease.objects.filter(id__in=[lease_id for lease_id, _ in rows]).delete()
+        release_slots(Counter(item_id for _, item_id in rows))
+    return len(rows)
+
+
+def release_slots(per_item):
+    """Décrémente `assignment_count` ; `per_item` associe un id d'élément au nombre de places libérées."""
+    _shift_slots(per_item, -1)
+
+
+def _shift_slots(per_item, sign):
+    by_amount = {}
+    for item_id, amount in per_item.items():
+        by_amount.setdefault(amount, []).append(item_id)
+    for amount, item_ids in by_amount.items():
+        DataItem.objects.filter(id__in=item_ids).update(
+            assignment_count=Greatest(F('assignment_count') + sign * amount, 0)
+        )
+
+
+def eligible_items(queryset, user, target=None):
+    """
+    Éléments de `queryset` qu'un claim peut attribuer à l'utilisateur : non retirés, sous la cible
+    (LABELING_ANNOTATIONS_PER_ITEM par défaut), ni annotés ni déjà réservés par lui.
+    Sert aussi à `pending`, qui ne liste ainsi que des éléments qu'un claim peut donner.
+    """
+    target = settings.LABELING_ANNOTATIONS_PER_ITEM if target is None else target
+    return (
+        queryset.filter(retired_at__isnull=True, assignment_count__lt=target)
+        .exclude(Exists(Annotation.objects.filter(item=OuterRef('pk'), user_id=user.id)))
+        .exclude(Exists(TaskLease.objects.filter(item=OuterRef('pk'), user_id=user.id)))
+    )
+
+
+def claimable_items(user, target):
+    """Éléments actifs attribuables à l'utilisateur, les plus incertains d'abord (`routing.py`)."""
+    return eligible_items(DataItem.objects.filter(is_active=True), user, target).order_by(*ROUTING_ORDER)
+
+
+def claim_items(user, count):
+    """
+    Attribue jusqu'à `count` éléments à l'utilisateur et retourne ses baux actifs.
+    Les baux encore valides d'un précédent claim sont renvoyés avant d'en créer de nouveaux.
+    """
+    target = settings.LABELING_ANNOTATIONS_PER_ITEM
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=settings.LABELING_LEASE_SECONDS)
+    release_expired_leases(now)
+
+    with transaction.atomic():
+        leases = list(TaskLease.objects.filter(user_id=user.id, expires_at__gt=now).order_by('id')[:count])
+        needed = count - len(leases)
+        if needed <= 0:
+            return leases
+
+        candidates = claimable_items(user, target)
+        if connection.features.has_select_for_update_skip_locked:
+            item_ids = list(candidates.select_for_update(skip_locked=True).values_list('id', flat=True)[:needed])
+            DataItem.objects.filter(id__in=item_ids).update(assignment_count=F('assignment_count') + 1)
+        else:
+            item_ids = []
+            for item_id in candidates.values_list('id', flat=True)[:needed * FALLBACK_OVERSCAN]:
+                taken = DataItem.objects.filter(pk=item_id, assignment_count__lt=target).update(
+                    assignment_count=F('assignment_count') + 1
+                )
+                if taken:
+                    item_ids.append(item_id)
+                    if len(item_ids) == needed:
+                        break
+
+        leases += TaskLease.objects.bulk_create(
+            TaskLease(item_id=item_id, user_id=user.id, expires_at=expires_at) for item_id in item_ids
+        )
+    return leases
+
+
+def annotations_created(pairs):
+    """
+    Convertit les baux en annotations : `pairs` est une liste de couples (item_id, user_id).
+    Une annotation sans bail préalable occupe une nouvelle place sur l'élément.
+    """
+    items_by_user = {}
+    for item_id, user_id in pairs:
+        items_by_user.setdefault(user_id, []).append(item_id)
+
+    unleased = Counter()
+    with transaction.atomic():
+        for user_id, item_ids in items_by_user.items():
+            leases = TaskLease.objects.filter(user_id=user_id, item_id__in=item_ids)
+            if connection.features.has_select_for_update:
+                leases = leases.select_for_update()
+            leased = dict(leases.values_list('item_id', 'id'))
+            if leased:
+                TaskLease.objects.filter(id__in=leased.values()).delete()
+            unleased.update(item_id for item_id in item_ids if item_id not in leased)
+        _shift_slots(unleased, 1)
+
+
+def annotations_deleted(item_ids):
+    """Libère la place occupée par chaque annotation supprimée."""
+    release_slots(Counter(item_ids))
@@ -0,0 +1,70 @@
+"""
+Rendu et lecture JSON par orjson (optionnel, activé par FAST_JSON).
+
+`FastJSONRenderer` produit les mêmes octets que le `JSONRenderer` de DRF : séparateurs
+compacts, UTF-8 sans échappement, U+2028/U+2029 échappés, dates et décimaux passés à
+l'encodeur de DRF (millisecondes, « Z » pour UTC). Seule différence connue : orjson écrit
+les flottants de valeur absolue inférieure à 1e-4 sans exposant (`0.00001` au lieu de
+`1e-05`), même valeur une fois relue, et NaN ou l'infini en `null` au lieu d'une erreur
+de rendu (aucun sérialiseur de l'API n'en produit). Le rendu indenté (API navigable,
+`; indent=`) reste celui de DRF.
+
+Sans le paquet `orjson` (extra `fast-json`), les deux classes se comportent exactement comme
+celles de DRF ; le contrôle `labeling.W002` signale alors un FAST_JSON sans effet.
+"""
+from django.conf import settings
+from django.core import checks
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    orjson = None
+
+if orjson is not None:
+    # Dates et dataclasses passent par l'encodeur de DRF, comme avec json.dumps
+    DUMPS_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+
+@checks.register()
+def check_orjson(app_configs, **kwargs):
+    if settings.FAST_JSON and orjson is None:
+        return [checks.Warning(
+            "FAST_JSON est activé sans le paquet orjson : les réponses sont rendues par l'encodeur de DRF.",
+            hint="Installer l'extra fast-json (uv sync --extra fast-json).",
+            id='labeling.W002',
+        )]
+    return []
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=DUMPS_OPTIONS)
+        except orjson.JSONEncodeError:
+            # Entiers hors 64 bits, types inconnus : mêmes résultats et erreurs que DRF
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        if orjson is None or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,123 @@
+"""
+Cache des réponses interrogées en boucle : `progress` d'un élément, `consensus` d'un
+élément et `stats` d'un utilisateur.
+
+Les entrées reposent sur le cache Django (mémoire locale par défaut, Redis si REDIS_URL
+est défini), une par élément ou utilisateur. Elles sont supprimées par les effets de bord
+des écritures (`signals.py`), chemins en masse compris, et après un calcul de consensus.
+Une entrée est servie sans relire l'élément : modifier un élément, ou changer `is_active`
+par `DataItem.objects.update()`, supprime ses entrées `progress` et `consensus`.
+RESPONSE_CACHE_SECONDS borne la durée de vie d'une entrée si une écriture contourne ces
+effets de bord (`QuerySet.update`). Le cache est commun à tous les utilisateurs. Une réponse
+lue sur une réplique, qui peut être en retard, n'est conservée que si l'entrée n'a pas été
+invalidée depuis moins de REPLICA_STICKY_SECONDS (délai de réplication toléré, comme pour
+`db_routing`) : l'invalidation laisse une marque `:written` de cette durée. Sinon un utilisateur
+maintenu sur la base principale après une écriture relirait l'état d'avant sa propre écriture.
+
+Chaque réponse porte un ETag (empreinte du corps) et un Last-Modified (date du calcul) :
+un client qui renvoie If-None-Match / If-Modified-Since reçoit un 304 sans recalcul.
+"""
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.utils.encoders import JSONEncoder
+
+from .db_routing import read_alias
+from .metrics import CACHE_LOOKUPS, registry
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    data: dict
+    status: int
+    etag: str
+    last_modified: int
+
+    @classmethod
+    def build(cls, data, status):
+        body = json.dumps(data, cls=JSONEncoder, sort_keys=True).encode()
+        return cls(data, status, quote_etag(hashlib.md5(body).hexdigest()), int(time.time()))
+
+    @property
+    def headers(self):
+        if self.status != 200:
+            return {}
+        return {'ETag': self.etag, 'Last-Modified': http_date(self.last_modified), 'Cache-Control': 'private, no-cache'}
+
+
+class ResponseCache:
+    """Entrées `labeling:response:<nom>:<pk>` ; `compute()` retourne (corps, statut)."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def key(self, pk):
+        return f'labeling:response:{self.name}:{int(pk)}'
+
+    @staticmethod
+    def written_key(key):
+        return f'{key}:written'
+
+    def _count(self, entry):
+        registry.record([(CACHE_LOOKUPS, (self.name, 'miss' if entry is None else 'hit'), 1)])
+        return entry
+
+    def fetch(self, pk, compute):
+        try:
+            key = self.key(pk)
+        except (TypeError, ValueError):
+            return CachedResponse.build(*compute())
+        entry = self._count(cache.get(key))
+        if entry is None:
+            entry = CachedResponse.build(*compute())
+            if read_alias.get() is None or cache.get(self.written_key(key)) is None:
+                cache.set(key, entry, settings.RESPONSE_CACHE_SECONDS)
+        return entry
+
+    async def afetch(self, pk, compute):
+        try:
+            key = self.key(pk)
+        except (TypeError, ValueError):
+            return CachedResponse.build(*await compute())
+        entry = self._count(await cache.aget(key))
+        if entry is None:
+            entry = CachedResponse.build(*await compute())
+            if read_alias.get() is None or await cache.aget(self.written_key(key)) is None:
+                await cache.aset(key, entry, settings.RESPONSE_CACHE_SECONDS)
+        return entry
+
+    def invalidate(self, pks):
+        keys = [self.key(pk) for pk in set(pks)]
+        if not keys:
+            return
+        self._forget(keys)
+        # Seconde suppression après validation : une lecture concurrente a pu remettre en cache l'état précédent
+        transaction.on_commit(lambda: self._forget(keys))
+
+    def _forget(self, keys):
+        cache.delete_many(keys)
+        if settings.DATABASE_REPLICAS:
+            cache.set_many(dict.fromkeys(map(self.written_key, keys), True), settings.REPLICA_STICKY_SECONDS)
+
+
+PROGRESS = ResponseCache('progress')
+CONSENSUS = ResponseCache('consensus')
+STATS = ResponseCache('stats')
+
+
+def not_modified(request, entry):
+    """Réponse 304 si les en-têtes conditionnels de `request` correspondent à `entry`, sinon None."""
+    if entry.status != 200:
+        return None
+    response = get_conditional_response(request, etag=entry.etag, last_modified=entry.last_modified)
+    if response is not None:
+        for name, value in entry.headers.items():
+            response[name] = value
+    return response
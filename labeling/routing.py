@@ -0,0 +1,87 @@
+"""
+Routage adaptatif des éléments.
+
+Chaque élément porte son incertitude restante, calculée à partir des décomptes de votes :
+`1 - (v + 1) / (n + 2)`, où `v` est le nombre de votes du label majoritaire et `n` le total
+(part majoritaire lissée par un a priori uniforme). Un élément sans vote vaut 0,5, un vote
+partagé 1-1 aussi, trois votes unanimes 0,2. `pending` et `claim` servent d'abord les
+éléments les plus incertains.
+
+Un élément est retiré (`retired_at`) quand il a au moins `min_votes` votes et que la part
+du label majoritaire atteint `confidence`, seuils fixés par `data_type` dans
+LABELING_RETIREMENT. Un élément retiré n'est plus servi ; il revient dans la file si une
+suppression ou une correction d'annotation le fait repasser sous les seuils.
+`refresh_routing` est appelé par les effets de bord des votes (`signals.py`) : un seul
+UPDATE sur les éléments touchés, calculé en base depuis leurs décomptes.
+"""
+from django.conf import settings
+from django.db.models import Case, F, FloatField, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.db.models.lookups import GreaterThanOrEqual
+from django.utils import timezone
+
+from .models import DataItem, LabelTally
+
+REBUILD_BATCH_SIZE = 5000
+# Ordre de service des éléments (`pending`, `claim`) : les plus incertains, puis les moins attribués
+ROUTING_ORDER = ('-uncertainty', 'assignment_count', 'id')
+
+
+def uncertainty(top, total):
+    return 1 - (top + 1) / (total + 2)
+
+
+def should_retire(data_type, top, total):
+    rule = settings.LABELING_RETIREMENT.get(data_type)
+    return rule is not None and total >= rule['min_votes'] and top / total >= rule['confidence']
+
+
+def _votes(aggregate):
+    """Agrégat des décomptes de l'élément courant (requête corrélée sur `DataItem`), en réel."""
+    votes = (
+        LabelTally.objects.filter(item_id=OuterRef('pk'), votes__gt=0)
+        .order_by().values('item_id').annotate(n=aggregate('votes')).values('n')
+    )
+    return Cast(Coalesce(Subquery(votes), 0), FloatField())
+
+
+def refresh_routing(item_ids, votes_changed=False):
+    """
+    Recalcule l'incertitude et le retrait des éléments `item_ids` depuis leurs décomptes, avec
+    les mêmes formules que `uncertainty` et `should_retire`, en un seul UPDATE quel que soit
+    le nombre d'éléments. `votes_changed` incrémente aussi `vote_version` dans ce même UPDATE.
+    """
+    item_ids = set(item_ids)
+    if not item_ids:
+        return
+    top, total = _votes(Max), _votes(Sum)
+    retire = [
+        When(
+            Q(
+                GreaterThanOrEqual(total, rule['min_votes']),
+                # NULL (jamais vrai) sans vote : pas de division par zéro
+                GreaterThanOrEqual(top / NullIf(total, Value(0.0)), rule['confidence']),
+                data_type=data_type,
+            ),
+            then=Coalesce('retired_at', Value(timezone.now())),
+        )
+        for data_type, rule in settings.LABELING_RETIREMENT.items()
+    ]
+    fields = {
+        'uncertainty': Value(1.0) - (top + Value(1.0)) / (total + Value(2.0)),
+        'retired_at': Case(*retire, default=None) if retire else Value(None),
+    }
+    if votes_changed:
+        fields['vote_version'] = F('vote_version') + 1
+    DataItem.objects.filter(id__in=item_ids).update(**fields)
+
+
+def rebuild_routing(batch_size=REBUILD_BATCH_SIZE):
+    """Recalcule le routage de tous les éléments (après `rebuild_tallies` ou un changement de seuils)."""
+    count = 0
+    last_id = 0
+    while ids := list(DataItem.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]):
+        refresh_routing(ids)
+        count += len(ids)
+        last_id = ids[-1]
+    return count
@@ -0,0 +1,115 @@
+"""
+Listes sans instances de modèle ni sérialiseur.
+
+Les listes en lecture seule (labels, éléments, annotations) lisent leurs colonnes par
+`.values()` et construisent chaque ligne directement : ni instanciation de modèle, ni
+parcours des champs du sérialiseur. Le corps est identique à celui du sérialiseur
+correspondant (mêmes clés, même ordre, mêmes représentations), ce que vérifient les tests.
+
+Chaque champ déclare les colonnes dont il dépend : avec `?fields=` ou `?omit=`, seules les
+colonnes des champs restants sont lues (et jointes). La clé de tri de la pagination
+(`created_at`, ou `uncertainty`, `assignment_count` et `id`) est lue en plus : le curseur de
+page suivante se calcule aussi sur un dictionnaire.
+"""
+from operator import itemgetter
+
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from .fieldsets import sparse_fields
+
+# Même représentation que les DateTimeField des ModelSerializer (fuseau courant, « Z » pour UTC)
+_datetime = serializers.DateTimeField()
+
+
+class ValueRows:
+    """
+    Champs d'une ligne : nom → (colonnes lues par `.values()`, calcul de la valeur depuis la ligne).
+    Seules les colonnes des champs demandés (`?fields=`, `?omit=`) sont lues.
+    """
+
+    def __init__(self, fields):
+        self.fields = fields
+
+    def columns(self, names=None, extra=()):
+        """Colonnes des champs `names` (tous par défaut), plus `extra` (clé de tri du curseur)."""
+        columns = dict.fromkeys(extra)
+        for name in self.fields if names is None else names:
+            columns.update(dict.fromkeys(self.fields[name][0]))
+        return list(columns)
+
+    def queryset(self, queryset, names=None, extra=()):
+        return queryset.values(*self.columns(names, extra))
+
+    def rows(self, values, names=None):
+        getters = [(name, self.fields[name][1]) for name in (self.fields if names is None else names)]
+        return [{name: get(row) for name, get in getters} for row in values]
+
+
+def _column(name):
+    return (name,), itemgetter(name)
+
+
+def _progress(row):
+    # Même calcul que DataItem.validation_progress
+    total = row['num_annotations']
+    return (row['num_validated'] / total) * 100 if total else 0.0
+
+
+def _fully_validated(row):
+    # Même calcul que DataItem.is_fully_validated
+    total = row['num_annotations']
+    return total > 0 and total == row['num_validated']
+
+
+LABEL_ROWS = ValueRows({'id': _column('id'), 'name': _column('name')})
+
+# Le queryset doit porter `with_progress()` avec les compteurs des colonnes lues
+DATA_ITEM_ROWS = ValueRows({
+    'id': _column('id'),
+    'content': _column('content'),
+    'data_type': _column('data_type'),
+    'is_active': _column('is_active'),
+    'annotation_count': _column('num_annotations'),
+    'validation_progress': (('num_annotations', 'num_validated'), _progress),
+    'is_fully_validated': (('num_annotations', 'num_validated'), _fully_validated),
+})
+
+ANNOTATION_ROWS = ValueRows({
+    'id': _column('id'),
+    'item': (('item_id',), itemgetter('item_id')),
+    # Seul champ qui joint la table des utilisateurs
+    'user': (('user__username',), itemgetter('user__username')),
+    'label': (('label_id',), itemgetter('label_id')),
+    'created_at': (('created_at',), lambda row: _datetime.to_representation(row['created_at'])),
+})
+
+
+class ValueRowsListMixin:
+    """
+    Pour les ViewSets : `list` construit ses lignes avec `value_rows` au lieu du sérialiseur,
+    en ne lisant que les colonnes des champs demandés.
+    """
+    value_rows = None
+
+    def list(self, request, *args, **kwargs):
+        return self.value_rows_response(self.filter_queryset(self.get_queryset()))
+
+    def sparse_fields(self):
+        return sparse_fields(self, self.value_rows.fields)
+
+    def sparse_columns(self):
+        return self.value_rows.columns(self.sparse_fields())
+
+    def cursor_columns(self):
+        """Clé de tri lue avec la ligne : le curseur de page suivante se calcule sur le dictionnaire."""
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        return tuple(field.lstrip('-') for field in ordering)
+
+    def value_rows_response(self, queryset):
+        names = self.sparse_fields()
+        queryset = self.value_rows.queryset(queryset, names, self.cursor_columns())
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(self.value_rows.rows(queryset, names))
+        return self.get_paginated_response(self.value_rows.rows(page, names))
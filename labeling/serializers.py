@@ -1,13 +1,19 @@
-from rest_framework import serializers
-from .models import DataItem, Label, Annotation, Validation, User
+from django.conf import settings
+from rest_framework import exceptions, serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from .authentication import token_claims
+from .consensus import MAX_ITERATIONS, TOLERANCE
+from .fieldsets import SparseFieldsMixin
+from .models import ArchivedDataItem, ChangeEvent, DataItem, Job, Label, Annotation, Validation, User, TaskLease
 
 
-class LabelSerializer(serializers.ModelSerializer):
+class LabelSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Label
         fields = ['id', 'name']
         
-class DataItemSerializer(serializers.ModelSerializer):
+class DataItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     annotation_count = serializers.ReadOnlyField()
     validation_progress = serializers.ReadOnlyField()
     is_fully_validated = serializers.ReadOnlyField()
@@ -16,7 +22,113 @@ class DataItemSerializer(serializers.ModelSerializer):
         model = DataItem
         fields = ['id', 'content', 'data_type', 'is_active', 'annotation_count', 'validation_progress', 'is_fully_validated']
 
-class UserSerializer(serializers.ModelSerializer):
+class ClaimSerializer(serializers.Serializer):
+    count = serializers.IntegerField(min_value=1, max_value=settings.LABELING_MAX_CLAIM, default=10)
+
+
+class ItemImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    format = serializers.ChoiceField(choices=['jsonl', 'csv'], required=False)
+    source = serializers.CharField(max_length=255, required=False)
+    restart = serializers.BooleanField(default=False)
+
+
+class AudioImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    source = serializers.CharField(max_length=255, required=False)
+    segment_seconds = serializers.FloatField(min_value=1, required=False)
+
+
+class ExportQuerySerializer(serializers.Serializer):
+    output = serializers.ChoiceField(choices=['jsonl', 'csv'], default='jsonl')
+    data_type = serializers.ChoiceField(choices=DataItem.TYPES, required=False)
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+    min_confidence = serializers.FloatField(min_value=0, max_value=1, required=False)
+
+
+class ConsensusJobSerializer(serializers.Serializer):
+    warm_start = serializers.BooleanField(default=False)
+    max_iterations = serializers.IntegerField(min_value=1, max_value=1000, default=MAX_ITERATIONS)
+    tolerance = serializers.FloatField(min_value=0, default=TOLERANCE)
+
+
+# Paramètres acceptés par type de tâche de fond ; les autres types n'en prennent pas
+JOB_PARAMS = {'consensus': ConsensusJobSerializer, 'export': ExportQuerySerializer}
+
+
+class JobSerializer(serializers.ModelSerializer):
+    params = serializers.DictField(required=False, default=dict)
+
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'kind', 'params', 'status', 'progress', 'message', 'result', 'error',
+            'attempts', 'max_attempts', 'run_after', 'created_at', 'started_at', 'finished_at',
+        ]
+        read_only_fields = [
+            'status', 'progress', 'message', 'result', 'error', 'attempts', 'run_after',
+            'created_at', 'started_at', 'finished_at',
+        ]
+        extra_kwargs = {'max_attempts': {'min_value': 1, 'max_value': 10, 'required': False}}
+
+    def validate(self, data):
+        params_class = JOB_PARAMS.get(data['kind'])
+        if params_class is None:
+            if data.get('params'):
+                raise serializers.ValidationError({"params": f"La tâche « {data['kind']} » ne prend pas de paramètres."})
+            return data
+        params = params_class(data=data.get('params', {}))
+        if not params.is_valid():
+            raise serializers.ValidationError({"params": params.errors})
+        # Représentation JSON (dates ISO 8601), relue par le même sérialiseur à l'exécution
+        data['params'] = params.data
+        return data
+
+
+class ChangesQuerySerializer(serializers.Serializer):
+    since = serializers.IntegerField(min_value=0, default=0)
+    limit = serializers.IntegerField(min_value=1, max_value=settings.API_MAX_PAGE_SIZE, default=settings.REST_FRAMEWORK['PAGE_SIZE'])
+
+
+class ChangeEventSerializer(serializers.ModelSerializer):
+    cursor = serializers.IntegerField(source='position', read_only=True)
+
+    class Meta:
+        model = ChangeEvent
+        fields = ['id', 'cursor', 'kind', 'object_id', 'action', 'data', 'created_at']
+
+
+class ArchivedDataItemSerializer(serializers.ModelSerializer):
+    annotation_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = ArchivedDataItem
+        fields = ['id', 'content', 'data_type', 'is_active', 'created_at', 'archived_at', 'annotation_count']
+
+
+class RestoreSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), min_length=1, max_length=settings.LABELING_BULK_MAX_ROWS
+    )
+    activate = serializers.BooleanField(default=True)
+
+
+class LeaderboardQuerySerializer(serializers.Serializer):
+    order = serializers.ChoiceField(choices=['volume', 'precision'], default='volume')
+    limit = serializers.IntegerField(min_value=1, max_value=settings.API_MAX_PAGE_SIZE, default=50)
+    min_annotations = serializers.IntegerField(min_value=0, default=0)
+
+
+class TaskLeaseSerializer(serializers.ModelSerializer):
+    item = DataItemSerializer(read_only=True)
+
+    class Meta:
+        model = TaskLease
+        fields = ['item', 'expires_at']
+
+
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id','username', 'role', 'password', 'email']
@@ -58,7 +170,42 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         )
         return user
                 
-class AnnotationSerializer(serializers.ModelSerializer):
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Connexion : les jetons portent le rôle et la version de jeton de l'utilisateur.
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token.payload.update(token_claims(user))
+        return token
+
+
+class RoleTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Renouvellement : le rôle, le statut et la version sont relus en base,
+    le nouveau jeton d'accès reflète donc un changement de rôle.
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: refresh.get(api_settings.USER_ID_CLAIM)}).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise exceptions.AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        refresh.payload.update(token_claims(user))
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data['refresh'] = str(refresh)
+        return data
+
+
+class AnnotationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source='user.username')
     
     
@@ -70,14 +217,38 @@ class AnnotationSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         item = data.get('item')
         
-        if Annotation.objects.filter(item=item, user=request.user).exists():
+        if Annotation.objects.filter(item=item, user_id=request.user.id).exists():
             raise serializers.ValidationError("Vous avez déjà annoté cet élément.")
         
         return data
     
-class ValidationSerializer(serializers.ModelSerializer):
+class ValidationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     validator = serializers.ReadOnlyField(source='validator.username')
     
     class Meta:
         model = Validation
-        fields = ['id', 'annotation', 'validator', 'is_approved', 'feedback', 'validated_at']
\ No newline at end of file
+        fields = ['id', 'annotation', 'validator', 'is_approved', 'feedback', 'validated_at']
+
+
+class BulkAnnotationRowSerializer(serializers.Serializer):
+    item = serializers.IntegerField(min_value=1)
+    label = serializers.IntegerField(min_value=1)
+
+
+class BulkAnnotationSerializer(serializers.Serializer):
+    annotations = serializers.ListField(
+        child=serializers.DictField(), min_length=1, max_length=settings.LABELING_BULK_MAX_ROWS
+    )
+
+
+
+class BulkValidationRowSerializer(serializers.Serializer):
+    annotation = serializers.IntegerField(min_value=1)
+    is_approved = serializers.BooleanField(default=True)
+    feedback = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+
+class BulkValidationSerializer(serializers.Serializer):
+    validations = serializers.ListField(
+        child=serializers.DictField(), min_length=1, max_length=settings.LABELING_BULK_MAX_ROWS
+    )
@@ -0,0 +1,257 @@
+"""
+Effets de bord des écritures d'éléments, d'annotations et de validations
+(journal des changements, file d'attribution, décomptes de votes, accord inter-annotateurs, routage,
+statistiques utilisateur, cache des réponses, fichiers audio et d'export),
+et révocation des jetons d'accès quand le rôle ou le statut d'un utilisateur change.
+
+Les chemins en masse qui contournent les signaux (bulk_create, archivage) appellent
+directement les fonctions `on_*` ci-dessous.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import agreement, changes, queue, response_cache, routing
+from .authentication import revoke_tokens
+from .models import TOKEN_FIELDS, Annotation, AudioClip, DataItem, Job, User, Validation
+from .stats import apply_user_stats_deltas
+from .tallies import apply_tally_deltas, tally_deltas
+
+
+_quiet = threading.local()
+
+
+@contextmanager
+def quiet_deletes():
+    """Suppressions dont l'appelant applique lui-même les effets de bord, en lot (archivage)."""
+    _quiet.active = True
+    try:
+        yield
+    finally:
+        _quiet.active = False
+
+
+def _deleting_quietly():
+    return getattr(_quiet, 'active', False)
+
+
+def _stats_deltas(entries):
+    """Additionne des triplets (total, approuvées, rejetées) par utilisateur ; `entries` = [(user_id, triplet)]."""
+    deltas = {}
+    for user_id, delta in entries:
+        current = deltas.get(user_id, (0, 0, 0))
+        deltas[user_id] = tuple(a + b for a, b in zip(current, delta))
+    return deltas
+
+
+def _verdict(is_approved, sign=1):
+    return (0, sign, 0) if is_approved else (0, 0, sign)
+
+
+def _apply_votes(deltas):
+    # L'accord lit les décomptes avant leur mise à jour
+    agreement.record_vote_deltas(deltas)
+    apply_tally_deltas(deltas)
+
+
+def _votes_changed(item_ids):
+    item_ids = set(item_ids)
+    # Routage et `vote_version` (les postérieurs antérieurs sont périmés) en un seul UPDATE
+    routing.refresh_routing(item_ids, votes_changed=True)
+    response_cache.PROGRESS.invalidate(item_ids)
+    response_cache.CONSENSUS.invalidate(item_ids)
+
+
+def on_annotations_created(annotations, change='created'):
+    changes.record('annotation', change, annotations)
+    queue.annotations_created([(a.item_id, a.user_id) for a in annotations])
+    _apply_votes(tally_deltas(added=[(a.item_id, a.label_id) for a in annotations]))
+    apply_user_stats_deltas(_stats_deltas((a.user_id, (1, 0, 0)) for a in annotations))
+    _votes_changed(a.item_id for a in annotations)
+    response_cache.STATS.invalidate(a.user_id for a in annotations)
+
+
+def on_annotations_deleted(annotations):
+    # Les validations liées sont supprimées d'abord par la cascade et décomptées par leur propre signal
+    queue.annotations_deleted([a.item_id for a in annotations])
+    _apply_votes(tally_deltas(removed=[(a.item_id, a.label_id) for a in annotations]))
+    apply_user_stats_deltas(_stats_deltas((a.user_id, (-1, 0, 0)) for a in annotations))
+    _votes_changed(a.item_id for a in annotations)
+    response_cache.STATS.invalidate(a.user_id for a in annotations)
+
+
+def _annotated(validations):
+    """{annotation_id: (auteur, élément)} des annotations validées."""
+    ids = {v.annotation_id for v in validations}
+    return {
+        annotation_id: (user_id, item_id)
+        for annotation_id, user_id, item_id in Annotation.objects.filter(id__in=ids).values_list('id', 'user_id', 'item_id')
+    }
+
+
+def _validations_changed(validations, sign):
+    annotated = _annotated(validations)
+    apply_user_stats_deltas(_stats_deltas(
+        (annotated[v.annotation_id][0], _verdict(v.is_approved, sign)) for v in validations if v.annotation_id in annotated
+    ))
+    response_cache.PROGRESS.invalidate(item_id for _, item_id in annotated.values())
+    response_cache.STATS.invalidate(user_id for user_id, _ in annotated.values())
+
+
+def on_validations_created(validations, change='created'):
+    changes.record('validation', change, validations)
+    _validations_changed(validations, 1)
+
+
+def on_validations_deleted(validations):
+    _validations_changed(validations, -1)
+
+
+def on_items_created(items, change='created'):
+    changes.record('item', change, items)
+
+
+def on_items_updated(items):
+    changes.record('item', 'updated', items)
+    # Les réponses en cache sont servies sans relire l'élément (`is_active` compris)
+    response_cache.PROGRESS.invalidate(item.pk for item in items)
+    response_cache.CONSENSUS.invalidate(item.pk for item in items)
+
+
+def on_items_deleted(item_ids):
+    _votes_changed(item_ids)
+
+
+@receiver(pre_save, sender=Annotation)
+def annotation_saving(sender, instance, **kwargs):
+    instance._previous_vote = None
+    if instance.pk and not instance._state.adding:
+        instance._previous_vote = (
+            Annotation.objects.filter(pk=instance.pk).values_list('item_id', 'label_id').first()
+        )
+
+
+@receiver(post_save, sender=Annotation)
+def annotation_saved(sender, instance, created, **kwargs):
+    vote = (instance.item_id, instance.label_id)
+    previous = getattr(instance, '_previous_vote', None)
+    if created:
+        on_annotations_created([instance])
+        return
+    changes.record('annotation', 'updated', [instance])
+    if previous and previous != vote:
+        if previous[0] != instance.item_id:
+            queue.annotations_deleted([previous[0]])
+            queue.annotations_created([(instance.item_id, instance.user_id)])
+        _apply_votes(tally_deltas(added=[vote], removed=[previous]))
+        _votes_changed([previous[0], instance.item_id])
+
+
+@receiver(post_delete, sender=Annotation)
+def annotation_deleted(sender, instance, **kwargs):
+    if _deleting_quietly():
+        return
+    changes.record('annotation', 'deleted', [instance])
+    on_annotations_deleted([instance])
+
+
+@receiver(pre_save, sender=Validation)
+def validation_saving(sender, instance, **kwargs):
+    instance._previous_verdict = None
+    if instance.pk and not instance._state.adding:
+        instance._previous_verdict = (
+            Validation.objects.filter(pk=instance.pk).values_list('annotation_id', 'is_approved').first()
+        )
+
+
+@receiver(post_save, sender=Validation)
+def validation_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_verdict', None)
+    if created:
+        on_validations_created([instance])
+        return
+    changes.record('validation', 'updated', [instance])
+    if previous and previous != (instance.annotation_id, instance.is_approved):
+        _validations_changed([Validation(annotation_id=previous[0], is_approved=previous[1])], -1)
+        _validations_changed([instance], 1)
+
+
+@receiver(post_delete, sender=Validation)
+def validation_deleted(sender, instance, **kwargs):
+    if _deleting_quietly():
+        return
+    changes.record('validation', 'deleted', [instance])
+    on_validations_deleted([instance])
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, **kwargs):
+    instance._revoked_version = None
+    if instance.pk and not instance._state.adding:
+        previous = User.objects.filter(pk=instance.pk).values_list(*TOKEN_FIELDS, 'token_version').first()
+        if previous and previous[:-1] != tuple(getattr(instance, field) for field in TOKEN_FIELDS):
+            instance._revoked_version = previous[-1] + 1
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if not created:
+        response_cache.STATS.invalidate([instance.pk])
+    version = getattr(instance, '_revoked_version', None)
+    if version is None:
+        return
+    # Écrit à part : `save(update_fields=['role'])` n'enregistrerait pas token_version
+    User.objects.filter(pk=instance.pk).update(token_version=version)
+    instance.token_version = version
+    user_id = instance.pk
+    transaction.on_commit(lambda: revoke_tokens(user_id, version))
+
+
+@receiver(post_save, sender=DataItem)
+def data_item_saved(sender, instance, created, **kwargs):
+    if created:
+        on_items_created([instance])
+    else:
+        on_items_updated([instance])
+
+
+@receiver(pre_delete, sender=DataItem)
+def data_item_deleting(sender, instance, **kwargs):
+    # Les décomptes disparaissent dans la cascade avant les annotations : leur contribution est retirée ici
+    if not _deleting_quietly():
+        agreement.record_items_removed([instance.pk])
+
+
+@receiver(post_delete, sender=DataItem)
+def data_item_deleted(sender, instance, **kwargs):
+    if _deleting_quietly():
+        return
+    changes.record('item', 'deleted', [instance])
+    on_items_deleted([instance.pk])
+
+
+@receiver(post_delete, sender=AudioClip)
+def audio_clip_deleted(sender, instance, **kwargs):
+    # L'archivage garde le fichier pour une restauration
+    if _deleting_quietly() or not instance.file:
+        return
+    storage, name = instance.file.storage, instance.file.name
+    transaction.on_commit(lambda: storage.delete(name))
+
+
+@receiver(post_delete, sender=Job)
+def job_deleted(sender, instance, **kwargs):
+    name = (instance.result or {}).get('file') if instance.kind == 'export' else None
+    if name:
+        transaction.on_commit(lambda: default_storage.delete(name))
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    response_cache.STATS.invalidate([instance.pk])
+    user_id, version = instance.pk, instance.token_version + 1
+    transaction.on_commit(lambda: revoke_tokens(user_id, version))
@@ -0,0 +1,89 @@
+"""
+Statistiques d'annotation par utilisateur, dénormalisées dans `UserStats`.
+
+Les signaux d'Annotation et de Validation appliquent les deltas ; les chemins en
+masse passent par les mêmes fonctions de `signals`. `rebuild_user_stats` recalcule
+la table depuis les annotations.
+"""
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Q, Value, When
+from django.db.models.functions import Cast, Greatest
+
+from .models import Annotation, UserStats
+
+REBUILD_BATCH_SIZE = 5000
+
+
+def _count_aggregates():
+    return {
+        "total": Count('id'),
+        "approved": Count('id', filter=Q(validation__is_approved=True)),
+        "rejected": Count('id', filter=Q(validation__is_approved=False)),
+    }
+
+
+def annotation_counts(user):
+    """Total, approuvées et rejetées pour un utilisateur, en un seul agrégat conditionnel."""
+    return Annotation.objects.filter(user=user).aggregate(**_count_aggregates())
+
+
+async def aannotation_counts(user):
+    return await Annotation.objects.filter(user=user).aaggregate(**_count_aggregates())
+
+
+def precision(approved, total):
+    return (approved / total * 100) if total > 0 else 0
+
+
+def apply_user_stats_deltas(deltas):
+    """`deltas` associe un id d'utilisateur à un triplet (total, approuvées, rejetées) de variations."""
+    deltas = {user_id: delta for user_id, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+    groups = {}
+    for user_id in sorted(deltas):
+        groups.setdefault(tuple(deltas[user_id]), []).append(user_id)
+
+    with transaction.atomic():
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=user_id) for user_id in sorted(deltas) if max(deltas[user_id]) > 0],
+            ignore_conflicts=True,
+        )
+        for (total, approved, rejected), user_ids in groups.items():
+            new_total = Greatest(F('total_annotations') + total, 0)
+            new_approved = Greatest(F('approved_annotations') + approved, 0)
+            UserStats.objects.filter(user_id__in=user_ids).update(
+                total_annotations=new_total,
+                approved_annotations=new_approved,
+                rejected_annotations=Greatest(F('rejected_annotations') + rejected, 0),
+                precision=Case(
+                    When(total_annotations__gt=-total, then=Cast(new_approved, FloatField()) * 100 / new_total),
+                    default=Value(0.0),
+                    output_field=FloatField(),
+                ),
+            )
+
+
+def rebuild_user_stats(batch_size=REBUILD_BATCH_SIZE):
+    """Reconstruit entièrement `UserStats` ; retourne le nombre de lignes écrites."""
+    rows = (
+        Annotation.objects.order_by('user_id').values('user_id')
+        .annotate(**_count_aggregates())
+    )
+    written = 0
+    with transaction.atomic():
+        UserStats.objects.all().delete()
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(UserStats(
+                user_id=row['user_id'],
+                total_annotations=row['total'],
+                approved_annotations=row['approved'],
+                rejected_annotations=row['rejected'],
+                precision=precision(row['approved'], row['total']),
+            ))
+            if len(batch) >= batch_size:
+                written += len(UserStats.objects.bulk_create(batch))
+                batch = []
+        written += len(UserStats.objects.bulk_create(batch))
+    return written
@@ -0,0 +1,136 @@
+"""
+Décomptes de votes dénormalisés par (élément, label).
+
+Les signaux d'Annotation appliquent les deltas pour les écritures unitaires ;
+les chemins en masse (bulk_create, import) appellent `apply_tally_deltas` eux-mêmes.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Greatest
+
+from .models import Annotation, LabelTally
+
+REBUILD_BATCH_SIZE = 5000
+
+
+def apply_tally_deltas(deltas):
+    """`deltas` associe un couple (item_id, label_id) à une variation du nombre de votes."""
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    # Un UPDATE par (delta, label) : le nombre de requêtes ne dépend pas de la taille du lot
+    groups = {}
+    for item_id, label_id in sorted(deltas):
+        groups.setdefault((deltas[item_id, label_id], label_id), []).append(item_id)
+
+    with transaction.atomic():
+        # Seuls les votes ajoutés créent des lignes : une suppression en cascade ne doit pas en recréer
+        added = [key for key in sorted(deltas) if deltas[key] > 0]
+        LabelTally.objects.bulk_create(
+            [LabelTally(item_id=item_id, label_id=label_id) for item_id, label_id in added],
+            ignore_conflicts=True,
+        )
+        for (delta, label_id), item_ids in groups.items():
+            LabelTally.objects.filter(label_id=label_id, item_id__in=item_ids).update(
+                votes=Greatest(F('votes') + delta, 0)
+            )
+
+
+def tally_deltas(added=(), removed=()):
+    """Construit les deltas à partir de couples (item_id, label_id) ajoutés et retirés."""
+    deltas = Counter(added)
+    deltas.subtract(removed)
+    return deltas
+
+
+def first_vote():
+    """
+    Identifiant de la première annotation d'un décompte (requête corrélée sur `LabelTally`) :
+    à égalité de votes, le label voté le premier l'emporte, comme le `Counter` d'origine.
+    """
+    return Subquery(
+        Annotation.objects.filter(item_id=OuterRef('item_id'), label_id=OuterRef('label_id'))
+        .order_by('id').values('id')[:1]
+    )
+
+
+def majority_order(queryset):
+    """Trie des décomptes du label majoritaire au moins voté (égalités : premier voté d'abord)."""
+    return queryset.annotate(first_vote=first_vote()).order_by('-votes', 'first_vote', 'label_id')
+
+
+def item_tallies(item_id):
+    """
+    Votes d'un élément, du label majoritaire au moins voté, en une seule lecture indexée.
+    Le postérieur de Dawid–Skene éventuel est joint (`tally.item.posterior`).
+    """
+    return list(_item_tallies_queryset(item_id))
+
+
+async def aitem_tallies(item_id):
+    return [tally async for tally in _item_tallies_queryset(item_id)]
+
+
+def _item_tallies_queryset(item_id):
+    return majority_order(
+        LabelTally.objects.filter(item_id=item_id, votes__gt=0).select_related('label', 'item__posterior__label')
+    )
+
+
+def expected_tallies():
+    """Décomptes recalculés depuis la table Annotation, triés par (item_id, label_id)."""
+    return (
+        Annotation.objects.order_by('item_id', 'label_id')
+        .values_list('item_id', 'label_id')
+        .annotate(votes=Count('id'))
+        .iterator(chunk_size=REBUILD_BATCH_SIZE)
+    )
+
+
+def stored_tallies():
+    return (
+        LabelTally.objects.filter(votes__gt=0)
+        .order_by('item_id', 'label_id')
+        .values_list('item_id', 'label_id', 'votes')
+        .iterator(chunk_size=REBUILD_BATCH_SIZE)
+    )
+
+
+def verify_tallies():
+    """Compare les décomptes stockés aux annotations ; retourne (item_id, label_id, stocké, attendu) par écart."""
+    mismatches = []
+    expected, stored = expected_tallies(), stored_tallies()
+    exp, sto = next(expected, None), next(stored, None)
+    while exp is not None or sto is not None:
+        exp_key = exp[:2] if exp is not None else None
+        sto_key = sto[:2] if sto is not None else None
+        if sto_key is None or (exp_key is not None and exp_key < sto_key):
+            mismatches.append((*exp_key, 0, exp[2]))
+            exp = next(expected, None)
+        elif exp_key is None or sto_key < exp_key:
+            mismatches.append((*sto_key, sto[2], 0))
+            sto = next(stored, None)
+        else:
+            if exp[2] != sto[2]:
+                mismatches.append((*exp_key, sto[2], exp[2]))
+            exp, sto = next(expected, None), next(stored, None)
+    return mismatches
+
+
+def rebuild_tallies(batch_size=REBUILD_BATCH_SIZE):
+    """Reconstruit entièrement la table des décomptes ; retourne le nombre de lignes écrites."""
+    written = 0
+    with transaction.atomic():
+        LabelTally.objects.all().delete()
+        batch = []
+        for item_id, label_id, votes in expected_tallies():
+            batch.append(LabelTally(item_id=item_id, label_id=label_id, votes=votes))
+            if len(batch) >= batch_size:
+                LabelTally.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        LabelTally.objects.bulk_create(batch)
+        written += len(batch)
+    return written
@@ -1,3 +1,1929 @@
-from django.test import TestCase
+import io
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+import wave
+from collections import OrderedDict
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.models import F
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from rest_framework.throttling import UserRateThrottle
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import (
+    AgreementDelta, Annotation, AnnotatorReliability, ArchivedAnnotation, ArchivedDataItem, ArchivedValidation, AudioClip, ChangeEvent,
+    ConsensusRun, DataItem, ItemPosterior, Job, Label, LabelTally, TaskLease, User, UserStats, Validation,
+)
+from . import agreement, archive, changes, jobs, renderers, response_cache
+from .bulk import bulk_annotate
+from .consensus import dawid_skene, load_matrix, run_consensus, save_result
+from .authentication import token_claims
+from .db_routing import ReplicaRouter, check_shared_cache, pin_to_primary, read_alias, replica_for
+from .importers import import_items, read_rows
+from .metrics import registry
+from .pagination import KeysetPagination
+from .renderers import FastJSONParser, FastJSONRenderer
+from .routing import ROUTING_ORDER, uncertainty
+from .serializers import AnnotationSerializer, DataItemSerializer, LabelSerializer
+from .stats import rebuild_user_stats
+from .views import DataItemViewSet
+from .tallies import rebuild_tallies, verify_tallies
+
+
+class DataItemQueryCountTests(APITestCase):
+    """Le nombre de requêtes des listes d'éléments ne doit pas dépendre du nombre de lignes."""
+
+    def setUp(self):
+        cache.clear()
+        self.contributor = User.objects.create_user(username='contrib', password='pass12345')
+        self.validator = User.objects.create_user(username='valid', password='pass12345', role='validator')
+        self.label = Label.objects.create(name='Positif')
+        self.client.force_authenticate(self.contributor)
+
+    def _seed(self, count):
+        for _ in range(count):
+            item = DataItem.objects.create(content='texte', data_type='text')
+            annotation = Annotation.objects.create(item=item, user=self.validator, label=self.label)
+            Validation.objects.create(annotation=annotation, validator=self.validator)
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_list_query_count_is_constant(self):
+        self._seed(2)
+        small = self._count_queries('/api/data-items/')
+        self._seed(20)
+        large = self._count_queries('/api/data-items/')
+        self.assertEqual(small, large)
+
+    def test_pending_query_count_is_constant(self):
+        self._seed(2)
+        small = self._count_queries('/api/data-items/pending/')
+        self._seed(20)
+        large = self._count_queries('/api/data-items/pending/')
+        self.assertEqual(small, large)
+
+    def test_progress_uses_annotated_counts(self):
+        self._seed(1)
+        item = DataItem.objects.get()
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/data-items/{item.id}/progress/')
+        self.assertEqual(response.data['annotation_count'], 1)
+        self.assertEqual(response.data['validated_count'], 1)
+        self.assertEqual(response.data['approved_count'], 1)
+        self.assertEqual(response.data['validation_progress'], '100.00%')
+
+
+class KeysetPaginationTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='contrib', password='pass12345')
+        self.client.force_authenticate(self.user)
+        DataItem.objects.bulk_create(DataItem(content=f'texte {i}', data_type='text') for i in range(7))
+
+    def test_pending_walks_every_item_once(self):
+        seen = []
+        url = '/api/data-items/pending/?page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 3)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(sorted(seen), sorted(DataItem.objects.values_list('id', flat=True)))
+
+    def test_pending_pages_past_a_thousand_tied_items(self):
+        # Tous sans vote : même incertitude et même nombre d'attributions
+        DataItem.objects.bulk_create(DataItem(content=f'lot {i}', data_type='text') for i in range(1200))
+        expected = list(DataItem.objects.order_by(*ROUTING_ORDER).values_list('id', flat=True))
+        seen, previous = [], None
+        url = '/api/data-items/pending/?page_size=250&fields=id'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row['id'] for row in response.data['results'])
+            url, previous = response.data['next'], response.data['previous']
+        self.assertEqual(seen, expected)
+
+        back = self.client.get(previous).data['results']
+        self.assertEqual([row['id'] for row in back], expected[-(len(expected) % 250) - 250:-(len(expected) % 250)])
+        self.assertEqual(self.client.get('/api/data-items/pending/?cursor=cD1bMV0%3D').status_code, 404)
+
+    def test_page_size_is_capped(self):
+        with mock.patch.object(KeysetPagination, 'max_page_size', 5):
+            response = self.client.get('/api/data-items/?page_size=100000')
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertIsNotNone(response.data['next'])
+
+
+@override_settings(LABELING_ANNOTATIONS_PER_ITEM=2, LABELING_LEASE_SECONDS=60)
+class ClaimQueueTests(APITestCase):
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='pass12345')
+        self.bob = User.objects.create_user(username='bob', password='pass12345')
+        self.carol = User.objects.create_user(username='carol', password='pass12345')
+        self.label = Label.objects.create(name='Positif')
+        self.items = DataItem.objects.bulk_create(DataItem(content=f'texte {i}', data_type='text') for i in range(3))
+
+    def _claim(self, user, count):
+        self.client.force_authenticate(user)
+        response = self.client.post('/api/data-items/claim/', {'count': count}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return [lease['item']['id'] for lease in response.data]
+
+    def test_items_are_handed_out_up_to_target(self):
+        self.assertEqual(len(self._claim(self.alice, 3)), 3)
+        self.assertEqual(len(self._claim(self.bob, 3)), 3)
+        self.assertEqual(self._claim(self.carol, 3), [])
+
+    def test_claim_is_idempotent_for_live_leases(self):
+        first = self._claim(self.alice, 2)
+        self.assertEqual(self._claim(self.alice, 2), first)
+        self.assertEqual(TaskLease.objects.count(), 2)
+
+    def test_annotation_consumes_the_lease(self):
+        item_id = self._claim(self.alice, 1)[0]
+        Annotation.objects.create(item_id=item_id, user=self.alice, label=self.label)
+        self.assertFalse(TaskLease.objects.exists())
+        self.assertEqual(DataItem.objects.get(pk=item_id).assignment_count, 1)
+        self.assertNotIn(item_id, self._claim(self.alice, 3))
+
+    def test_expired_leases_return_to_the_pool(self):
+        self._claim(self.alice, 3)
+        self._claim(self.bob, 3)
+        TaskLease.objects.filter(user=self.alice).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(len(self._claim(self.carol, 3)), 3)
+        self.assertFalse(TaskLease.objects.filter(user=self.alice).exists())
+
+    def test_inactive_items_are_not_claimed(self):
+        DataItem.objects.filter(pk=self.items[0].pk).update(is_active=False)
+        self.assertNotIn(self.items[0].pk, self._claim(self.alice, 3))
+
+    def test_only_contributors_can_claim(self):
+        validator = User.objects.create_user(username='val', password='pass12345', role='validator')
+        self.client.force_authenticate(validator)
+        response = self.client.post('/api/data-items/claim/', {'count': 1}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class LabelTallyTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.users = [User.objects.create_user(username=f'user{i}', password='pass12345') for i in range(4)]
+        self.positive = Label.objects.create(name='Positif')
+        self.negative = Label.objects.create(name='Négatif')
+        self.item = DataItem.objects.create(content='texte', data_type='text')
+        self.client.force_authenticate(self.users[0])
+
+    def _votes(self):
+        return dict(LabelTally.objects.filter(item=self.item).values_list('label__name', 'votes'))
+
+    def test_tallies_follow_create_update_and_delete(self):
+        annotations = [
+            Annotation.objects.create(item=self.item, user=user, label=label)
+            for user, label in zip(self.users, [self.positive, self.positive, self.positive, self.negative])
+        ]
+        self.assertEqual(self._votes(), {'Positif': 3, 'Négatif': 1})
+
+        annotations[0].label = self.negative
+        annotations[0].save()
+        self.assertEqual(self._votes(), {'Positif': 2, 'Négatif': 2})
+
+        annotations[1].delete()
+        self.assertEqual(self._votes(), {'Positif': 1, 'Négatif': 2})
+        self.assertEqual(verify_tallies(), [])
+
+    def test_consensus_is_a_single_read(self):
+        for user, label in zip(self.users, [self.positive, self.positive, self.positive, self.negative]):
+            Annotation.objects.create(item=self.item, user=user, label=label)
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/annotations/{self.item.id}/consensus/')
+        self.assertEqual(response.data, {
+            "consensus_label": "Positif",
+            "confidence": "75.00%",
+            "total_votes": 4,
+            "method": "majority",
+        })
+
+    def test_consensus_tie_goes_to_the_first_voted_label(self):
+        # Le label voté le premier l'emporte à égalité, même avec un identifiant plus grand
+        for user, label in zip(self.users, [self.negative, self.positive, self.positive, self.negative]):
+            Annotation.objects.create(item=self.item, user=user, label=label)
+        response = self.client.get(f'/api/annotations/{self.item.id}/consensus/')
+        self.assertEqual((response.data['consensus_label'], response.data['confidence']), ('Négatif', '50.00%'))
+        self.client.force_authenticate(User.objects.create_user(username='admin', password='pass12345', role='admin'))
+        export = b''.join(self.client.get('/api/data-items/export/').streaming_content).decode()
+        self.assertEqual(json.loads(export.splitlines()[0])['consensus_label'], 'Négatif')
+
+    def test_consensus_without_votes(self):
+        response = self.client.get(f'/api/annotations/{self.item.id}/consensus/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_rebuild_command_repairs_drift(self):
+        Annotation.objects.create(item=self.item, user=self.users[0], label=self.positive)
+        LabelTally.objects.update(votes=7)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_tallies', '--verify', stdout=StringIO())
+        call_command('rebuild_tallies', stdout=StringIO())
+        self.assertEqual(self._votes(), {'Positif': 1})
+        call_command('rebuild_tallies', '--verify', stdout=StringIO())
+
+
+class BulkAnnotationTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='contrib', password='pass12345')
+        self.label = Label.objects.create(name='Positif')
+        self.items = DataItem.objects.bulk_create(DataItem(content=f'texte {i}', data_type='text') for i in range(30))
+        self.client.force_authenticate(self.user)
+
+    def _post(self, rows):
+        return self.client.post('/api/annotations/bulk/', {'annotations': rows}, format='json')
+
+    def test_bulk_creates_annotations_and_reports_row_errors(self):
+        Annotation.objects.create(item=self.items[0], user=self.user, label=self.label)
+        response = self._post([
+            {'item': self.items[0].id, 'label': self.label.id},
+            {'item': self.items[1].id, 'label': self.label.id},
+            {'item': self.items[1].id, 'label': self.label.id},
+            {'item': 999999, 'label': self.label.id},
+            {'item': self.items[2].id, 'label': 999999},
+            {'item': 'x'},
+            {'item': self.items[3].id, 'label': self.label.id},
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([row['item'] for row in response.data['created']], [self.items[1].id, self.items[3].id])
+        self.assertEqual([error['index'] for error in response.data['errors']], [0, 2, 3, 4, 5])
+        self.assertEqual(LabelTally.objects.get(item=self.items[1]).votes, 1)
+        self.assertEqual(DataItem.objects.get(pk=self.items[3].pk).assignment_count, 1)
+        self.assertEqual(verify_tallies(), [])
+
+    def test_bulk_query_count_does_not_grow_with_batch_size(self):
+        with CaptureQueriesContext(connection) as small:
+            self._post([{'item': item.id, 'label': self.label.id} for item in self.items[:2]])
+        with CaptureQueriesContext(connection) as large:
+            self._post([{'item': item.id, 'label': self.label.id} for item in self.items[2:]])
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_bulk_rejects_everything(self):
+        response = self._post([{'item': 999999, 'label': self.label.id}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['created'], [])
+
+
+class BulkValidationTests(APITestCase):
+
+    def setUp(self):
+        self.validator = User.objects.create_user(username='valid', password='pass12345', role='validator')
+        label = Label.objects.create(name='Positif')
+        contributors = [User.objects.create_user(username=f'user{i}', password='pass12345') for i in range(3)]
+        item = DataItem.objects.create(content='texte', data_type='text')
+        self.annotations = [Annotation.objects.create(item=item, user=user, label=label) for user in contributors]
+        self.client.force_authenticate(self.validator)
+
+    def test_bulk_validation_with_row_errors(self):
+        Validation.objects.create(annotation=self.annotations[0], validator=self.validator)
+        response = self.client.post('/api/validations/bulk/', {'validations': [
+            {'annotation': self.annotations[0].id},
+            {'annotation': self.annotations[1].id, 'is_approved': False, 'feedback': 'Faux'},
+            {'annotation': self.annotations[2].id},
+            {'annotation': 999999},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([row['annotation'] for row in response.data['created']],
+                         [self.annotations[1].id, self.annotations[2].id])
+        self.assertEqual([error['index'] for error in response.data['errors']], [0, 3])
+        self.assertFalse(Validation.objects.get(annotation=self.annotations[1]).is_approved)
+
+    def test_bulk_validation_requires_validator_role(self):
+        self.client.force_authenticate(User.objects.create_user(username='contrib', password='pass12345'))
+        response = self.client.post('/api/validations/bulk/', {'validations': [
+            {'annotation': self.annotations[0].id},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class ItemImportTests(APITestCase):
+
+    def _rows(self, count, start=0):
+        return [{'content': f'texte {i}', 'data_type': 'text'} for i in range(start, start + count)]
+
+    def test_import_is_resumable(self):
+        rows = self._rows(10)
+
+        def interrupt(report):
+            if report.imported >= 4:
+                raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            import_items(iter(rows), 'corpus', batch_size=4, progress=interrupt)
+        self.assertEqual(DataItem.objects.count(), 4)
+
+        report = import_items(iter(rows), 'corpus', batch_size=4)
+        self.assertEqual(report.resumed_from, 4)
+        self.assertEqual(report.imported, 6)
+        self.assertEqual(sorted(DataItem.objects.values_list('content', flat=True)),
+                         sorted(row['content'] for row in rows))
+        self.assertEqual(import_items(iter(rows), 'corpus').imported, 0)
+
+    def test_invalid_rows_are_rejected(self):
+        rows = self._rows(2) + [{'content': '', 'data_type': 'text'}, {'content': 'x', 'data_type': 'video'}, 'bad']
+        report = import_items(iter(rows), 'mixed')
+        self.assertEqual((report.imported, report.rejected), (2, 3))
+        self.assertEqual([error['row'] for error in report.errors], [3, 4, 5])
+
+    def test_blank_is_active_defaults_to_active(self):
+        stream = io.StringIO('content,data_type,is_active\nvide,text,\nnon,text,non\n')
+        report = import_items(read_rows(stream, 'csv'), 'blank-cells')
+        self.assertEqual((report.imported, report.rejected), (2, 0))
+        self.assertTrue(DataItem.objects.get(content='vide').is_active)
+        self.assertFalse(DataItem.objects.get(content='non').is_active)
+
+    def test_upload_endpoint_is_admin_only(self):
+        admin = User.objects.create_user(username='admin', password='pass12345', role='admin')
+        body = 'content,data_type,is_active\nbonjour,text,true\nhttp://x/a.wav,audio,0\n'
+        upload = SimpleUploadedFile('items.csv', body.encode())
+
+        self.client.force_authenticate(User.objects.create_user(username='contrib', password='pass12345'))
+        self.assertEqual(self.client.post('/api/data-items/import/', {'file': upload}).status_code, 403)
+
+        upload.seek(0)
+        self.client.force_authenticate(admin)
+        response = self.client.post('/api/data-items/import/', {'file': upload})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['imported'], 2)
+        self.assertFalse(DataItem.objects.get(data_type='audio').is_active)
+
+    def test_upload_source_defaults_to_content_digest(self):
+        self.client.force_authenticate(User.objects.create_user(username='admin', password='pass12345', role='admin'))
+        first = SimpleUploadedFile('items.csv', b'content,data_type\nbonjour,text\n')
+        second = SimpleUploadedFile('items.csv', b'content,data_type\nsalut!!,text\n')
+        self.assertEqual(first.size, second.size)
+        for upload in (first, second):
+            response = self.client.post('/api/data-items/import/', {'file': upload})
+            self.assertEqual((response.status_code, response.data['imported']), (201, 1))
+        self.assertEqual(DataItem.objects.count(), 2)
+
+        latin1 = SimpleUploadedFile('items.csv', 'content,data_type\ncafé,text\n'.encode('latin-1'))
+        response = self.client.post('/api/data-items/import/', {'file': latin1})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('file', response.data)
+
+    def test_management_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as handle:
+            handle.write('\n'.join(json.dumps(row) for row in self._rows(3)))
+        self.addCleanup(os.unlink, handle.name)
+        call_command('import_items', handle.name, stdout=StringIO())
+        self.assertEqual(DataItem.objects.count(), 3)
+
+
+class DatasetExportTests(APITestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='pass12345', role='admin')
+        users = [User.objects.create_user(username=f'user{i}', password='pass12345') for i in range(3)]
+        positive, negative = Label.objects.create(name='Positif'), Label.objects.create(name='Négatif')
+        self.sure = DataItem.objects.create(content='sûr', data_type='text')
+        self.split = DataItem.objects.create(content='partagé', data_type='text')
+        self.audio = DataItem.objects.create(content='http://x/a.wav', data_type='audio')
+        for user in users:
+            Annotation.objects.create(item=self.sure, user=user, label=positive)
+        Annotation.objects.create(item=self.split, user=users[0], label=positive)
+        Annotation.objects.create(item=self.split, user=users[1], label=negative)
+        self.client.force_authenticate(self.admin)
+
+    def _export(self, query=''):
+        response = self.client.get('/api/data-items/export/' + query)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_jsonl_export(self):
+        records = [json.loads(line) for line in self._export().splitlines()]
+        self.assertEqual([record['id'] for record in records], [self.sure.id, self.split.id, self.audio.id])
+        self.assertEqual(records[0]['consensus_label'], 'Positif')
+        self.assertEqual(records[0]['confidence'], 1.0)
+        self.assertEqual(records[1]['votes'], {'Négatif': 1, 'Positif': 1})
+        self.assertIsNone(records[2]['consensus_label'])
+
+    def test_filters_are_applied(self):
+        records = [json.loads(line) for line in self._export('?min_confidence=0.9').splitlines()]
+        self.assertEqual([record['id'] for record in records], [self.sure.id])
+        records = [json.loads(line) for line in self._export('?data_type=audio').splitlines()]
+        self.assertEqual([record['id'] for record in records], [self.audio.id])
+
+    def test_csv_export(self):
+        lines = self._export('?output=csv').splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'content', 'data_type'])
+        self.assertEqual(len(lines), 4)
+
+    def test_export_is_admin_only(self):
+        self.client.force_authenticate(User.objects.create_user(username='contrib', password='pass12345'))
+        self.assertEqual(self.client.get('/api/data-items/export/').status_code, 403)
+
+    def test_command_rejects_invalid_dates(self):
+        for value in ('hier', '2024-02-30T00:00:00'):
+            with self.assertRaises(CommandError):
+                call_command('export_dataset', '--created-after', value, stdout=StringIO())
+        out = StringIO()
+        call_command('export_dataset', '--created-after', '2000-01-01T00:00:00Z', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
+
+
+class UserStatsTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.validator = User.objects.create_user(username='valid', password='pass12345', role='validator')
+        self.alice = User.objects.create_user(username='alice', password='pass12345')
+        self.bob = User.objects.create_user(username='bob', password='pass12345')
+        self.label = Label.objects.create(name='Positif')
+        self.items = DataItem.objects.bulk_create(DataItem(content=f'texte {i}', data_type='text') for i in range(4))
+
+    def _annotate(self, user, items):
+        return [Annotation.objects.create(item=item, user=user, label=self.label) for item in items]
+
+    def _stats_row(self, user):
+        row = UserStats.objects.get(user=user)
+        return row.total_annotations, row.approved_annotations, row.rejected_annotations, round(row.precision, 2)
+
+    def test_stats_endpoint_uses_one_aggregate(self):
+        annotations = self._annotate(self.alice, self.items[:3])
+        Validation.objects.create(annotation=annotations[0], validator=self.validator)
+        Validation.objects.create(annotation=annotations[1], validator=self.validator, is_approved=False)
+        self.client.force_authenticate(self.bob)
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/users/{self.alice.id}/stats/')
+        self.assertEqual(response.data['total_annotations'], 3)
+        self.assertEqual(response.data['approved_annotations'], 1)
+        self.assertEqual(response.data['rejected_annotations'], 1)
+        self.assertEqual(response.data['pending_validations'], 1)
+        self.assertEqual(response.data['precision'], '33.33%')
+
+    def test_user_stats_follow_writes(self):
+        annotations = self._annotate(self.alice, self.items[:2])
+        validation = Validation.objects.create(annotation=annotations[0], validator=self.validator)
+        self.assertEqual(self._stats_row(self.alice), (2, 1, 0, 50.0))
+
+        validation.is_approved = False
+        validation.save()
+        self.assertEqual(self._stats_row(self.alice), (2, 0, 1, 0.0))
+
+        annotations[0].delete()
+        self.assertEqual(self._stats_row(self.alice), (1, 0, 0, 0.0))
+
+        self.client.force_authenticate(self.validator)
+        self.client.post('/api/validations/bulk/', {'validations': [{'annotation': annotations[1].id}]}, format='json')
+        self.assertEqual(self._stats_row(self.alice), (1, 1, 0, 100.0))
+
+    def test_leaderboard(self):
+        alice_annotations = self._annotate(self.alice, self.items[:1])
+        bob_annotations = self._annotate(self.bob, self.items)
+        Validation.objects.create(annotation=alice_annotations[0], validator=self.validator)
+        Validation.objects.create(annotation=bob_annotations[0], validator=self.validator)
+        self.client.force_authenticate(self.alice)
+
+        by_volume = self.client.get('/api/users/leaderboard/').data
+        self.assertEqual([row['user'] for row in by_volume], ['bob', 'alice'])
+        by_precision = self.client.get('/api/users/leaderboard/?order=precision').data
+        self.assertEqual([(row['rank'], row['user'], row['precision']) for row in by_precision],
+                         [(1, 'alice', '100.00%'), (2, 'bob', '25.00%')])
+        filtered = self.client.get('/api/users/leaderboard/?order=precision&min_annotations=2').data
+        self.assertEqual([row['user'] for row in filtered], ['bob'])
+
+    def test_deleting_a_user_or_item_cascades_cleanly(self):
+        self._annotate(self.alice, self.items[:2])
+        self.items[0].delete()
+        self.alice.delete()
+        self.assertFalse(UserStats.objects.filter(user_id=self.alice.id).exists())
+        self.assertEqual(verify_tallies(), [])
+
+
+class ConsensusEngineTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.positive, self.negative = Label.objects.create(name='Positif'), Label.objects.create(name='Négatif')
+        self.experts = [User.objects.create_user(username=f'expert{i}', password='pass12345') for i in range(2)]
+        self.spammers = [User.objects.create_user(username=f'spam{i}', password='pass12345') for i in range(2)]
+        # Les experts donnent le vrai label, les spammeurs répondent toujours « Négatif »
+        for n in range(20):
+            item = DataItem.objects.create(content=f'entraînement {n}', data_type='text')
+            truth = self.positive if n % 2 else self.negative
+            for user in self.experts:
+                Annotation.objects.create(item=item, user=user, label=truth)
+            for user in self.spammers:
+                Annotation.objects.create(item=item, user=user, label=self.negative)
+        self.item = DataItem.objects.create(content='disputé', data_type='text')
+        Annotation.objects.create(item=self.item, user=self.experts[0], label=self.positive)
+        for user in self.spammers:
+            Annotation.objects.create(item=self.item, user=user, label=self.negative)
+        self.client.force_authenticate(self.experts[0])
+
+    def _consensus(self):
+        return self.client.get(f'/api/annotations/{self.item.id}/consensus/').data
+
+    def test_reliable_annotators_outweigh_the_majority(self):
+        self.assertEqual(self._consensus()['consensus_label'], 'Négatif')
+        run = run_consensus()
+        self.assertTrue(run.converged)
+        self.assertEqual(run.items, 21)
+
+        posterior = ItemPosterior.objects.get(item=self.item)
+        self.assertEqual(posterior.label, self.positive)
+        self.assertEqual(posterior.total_votes, 3)
+        response = self._consensus()
+        self.assertEqual(response['consensus_label'], 'Positif')
+        self.assertEqual(response['method'], 'dawid-skene')
+
+        accuracy = dict(AnnotatorReliability.objects.values_list('user__username', 'accuracy'))
+        self.assertGreater(accuracy['expert0'], 0.9)
+        self.assertLess(accuracy['spam0'], 0.7)
+
+    def test_stale_posterior_falls_back_to_majority(self):
+        run_consensus()
+        late = User.objects.create_user(username='late', password='pass12345')
+        Annotation.objects.create(item=self.item, user=late, label=self.negative)
+        response = self._consensus()
+        self.assertEqual(response['method'], 'majority')
+        self.assertEqual(response['total_votes'], 4)
+
+    def test_relabelled_vote_makes_the_posterior_stale(self):
+        run_consensus()
+        self.assertEqual(self._consensus()['method'], 'dawid-skene')
+        # Même total de votes, mais un label corrigé : le postérieur ne porte plus sur les votes actuels
+        annotation = Annotation.objects.get(item=self.item, user=self.spammers[0])
+        annotation.label = self.positive
+        annotation.save()
+        response = self._consensus()
+        self.assertEqual((response['method'], response['total_votes']), ('majority', 3))
+
+        run_consensus()
+        Annotation.objects.get(item=self.item, user=self.spammers[1]).delete()
+        Annotation.objects.create(item=self.item, user=self.experts[1], label=self.negative)
+        self.assertEqual(self._consensus()['method'], 'majority')
+        self.experts[0].role = 'admin'
+        self.experts[0].save()
+        records = {record['id']: record for record in map(
+            json.loads, b''.join(self.client.get('/api/data-items/export/').streaming_content).splitlines()
+        )}
+        self.assertEqual(records[self.item.id]['consensus_method'], 'majority')
+
+        run_consensus(warm_start=True)
+        self.assertEqual(self._consensus()['method'], 'dawid-skene')
+
+    def test_export_reads_posteriors(self):
+        run_consensus()
+        self.experts[0].role = 'admin'
+        self.experts[0].save()
+        response = self.client.get('/api/data-items/export/?min_confidence=0.9')
+        records = {record['id']: record for record in map(json.loads, b''.join(response.streaming_content).splitlines())}
+        self.assertEqual(records[self.item.id]['consensus_label'], 'Positif')
+        self.assertEqual(records[self.item.id]['consensus_method'], 'dawid-skene')
+
+    def test_only_changed_posteriors_are_rewritten(self):
+        matrix = load_matrix(with_versions=True)
+        result = dawid_skene(matrix)
+        run = ConsensusRun.objects.create(items=matrix.shape[0], annotators=matrix.shape[1], annotations=len(matrix.items))
+        self.assertEqual(save_result(matrix, result, run), 21)
+        self.assertEqual(save_result(matrix, result, run, only_changed=True, batch_size=4), 0)
+        ItemPosterior.objects.filter(item=self.item).update(confidence=0.5)
+        self.assertEqual(save_result(matrix, result, run, only_changed=True, batch_size=4), 1)
+
+    def test_warm_start_command(self):
+        cold = run_consensus()
+        out = StringIO()
+        call_command('run_consensus', '--warm-start', stdout=out)
+        self.assertIn('convergé', out.getvalue())
+        self.assertEqual(ItemPosterior.objects.filter(label=self.positive).count(), 11)
+        warm = ConsensusRun.objects.latest('id')
+        self.assertTrue(warm.warm_start)
+        self.assertLessEqual(warm.iterations, cold.iterations)
+
+@override_settings(ROOT_URLCONF='core.asgi_urls')
+class AsyncViewTests(APITestCase):
+    """Les vues asynchrones renvoient exactement les réponses des vues synchrones."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='contrib', password='pass12345')
+        other = User.objects.create_user(username='other', password='pass12345')
+        label = Label.objects.create(name='Positif')
+        self.items = [DataItem.objects.create(content=f'item {i}', data_type='text') for i in range(5)]
+        Annotation.objects.create(item=self.items[0], user=self.user, label=label)
+        Annotation.objects.create(item=self.items[0], user=other, label=label)
+        self.headers = {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+
+    async def _compare(self, url, headers=None):
+        headers = self.headers if headers is None else headers
+        sync = await sync_to_async(self.client.get)(url, headers=headers)
+        await cache.aclear()
+        with override_settings(ROOT_URLCONF='core.asgi_urls'):
+            response = await self.async_client.get(url, headers=headers)
+        self.assertEqual(response.status_code, sync.status_code, url)
+        self.assertEqual(response.json(), sync.json(), url)
+        self.assertEqual((response['Content-Type'], response['Allow']), (sync['Content-Type'], sync['Allow']), url)
+        return response
+
+    async def test_same_responses_as_sync_views(self):
+        first = await self._compare('/api/data-items/?page_size=2')
+        await self._compare(first.json()['next'].replace('http://testserver', ''))
+        await self._compare('/api/data-items/pending/')
+        await self._compare('/api/data-items/pending/?fields=id,annotation_count&page_size=2')
+        await self._compare(f'/api/data-items/{self.items[0].id}/progress/')
+        await self._compare(f'/api/annotations/{self.items[0].id}/consensus/')
+        await self._compare(f'/api/annotations/{self.items[1].id}/consensus/')
+        await self._compare(f'/api/users/{self.user.id}/stats/')
+
+    async def test_errors_match_sync_views(self):
+        await self._compare('/api/data-items/999999/progress/')
+        await self._compare('/api/users/999999/stats/')
+        response = await self._compare('/api/data-items/', headers={'Authorization': 'Bearer invalide'})
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('Bearer', response['WWW-Authenticate'])
+        await self._compare('/api/data-items/', headers={})
+
+    async def test_negotiation_throttling_and_role_tokens(self):
+        await self._compare('/api/data-items/', headers={**self.headers, 'Accept': 'application/xml'})
+        await self._compare('/api/data-items/', headers={**self.headers, 'Accept': 'application/json; indent=2'})
+        # Jeton portant le rôle : utilisateur construit depuis les claims (les autres tests lisent la base)
+        access = RefreshToken.for_user(self.user).access_token
+        for claim, value in token_claims(self.user).items():
+            access[claim] = value
+        await self._compare('/api/data-items/pending/', headers={'Authorization': f'Bearer {access}'})
+
+        class OnePerMinute(UserRateThrottle):
+            rate = '1/min'
+
+        with mock.patch.object(DataItemViewSet, 'throttle_classes', [OnePerMinute]):
+            with override_settings(ROOT_URLCONF='core.asgi_urls'):
+                statuses = [(await self.async_client.get('/api/data-items/', headers=self.headers)).status_code
+                            for _ in range(2)]
+        self.assertEqual(statuses, [200, 429])
+
+    async def test_fast_path_uses_async_view(self):
+        from . import async_views
+        with mock.patch.object(async_views, 'aget_object', wraps=async_views.aget_object) as spy:
+            await self.async_client.get(f'/api/users/{self.user.id}/stats/', headers=self.headers)
+        spy.assert_called_once()
+
+class QueryPlanTests(APITestCase):
+    """
+    Capture les requêtes SQL de chaque endpoint, en récupère le plan (EXPLAIN) et échoue
+    si une grosse table est parcourue séquentiellement. Sur PostgreSQL, `enable_seqscan`
+    est désactivé : un Seq Scan restant signifie qu'aucun index ne couvre la requête.
+    """
+    SEED_ITEMS = 2000
+    SEED_CONTRIBUTORS = 4
+    LARGE_TABLES = {
+        DataItem._meta.db_table, Annotation._meta.db_table, Validation._meta.db_table,
+        LabelTally._meta.db_table, TaskLease._meta.db_table, UserStats._meta.db_table,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.validator = User.objects.create_user(username='valid', password='pass12345', role='validator')
+        cls.contributors = [
+            User.objects.create_user(username=f'user{i}', password='pass12345') for i in range(cls.SEED_CONTRIBUTORS)
+        ]
+        cls.newcomer = User.objects.create_user(username='newcomer', password='pass12345')
+        labels = Label.objects.bulk_create(Label(name=f'label {i}') for i in range(5))
+        items = DataItem.objects.bulk_create(
+            DataItem(content=f'texte {i}', data_type='text', is_active=i % 10 != 0) for i in range(cls.SEED_ITEMS)
+        )
+        annotations = Annotation.objects.bulk_create(
+            Annotation(item=item, user=user, label=labels[(item.id + user.id) % len(labels)])
+            for item in items for user in cls.contributors
+        )
+        Validation.objects.bulk_create(
+            Validation(annotation=annotation, validator=cls.validator, is_approved=annotation.id % 3 != 0)
+            for annotation in annotations[::2]
+        )
+        rebuild_tallies()
+        rebuild_user_stats()
+        DataItem.objects.update(assignment_count=cls.SEED_CONTRIBUTORS)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cls.item = items[1]
+
+    def setUp(self):
+        cache.clear()
+
+    def _aliases(self, sql):
+        aliases = {table: table for table in self.LARGE_TABLES}
+        for table, alias in re.findall(r'"(\w+)" (\w+)', sql):
+            if table in self.LARGE_TABLES:
+                aliases[alias] = table
+        return aliases
+
+    def _sequential_scans(self, sql):
+        aliases = self._aliases(sql)
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('EXPLAIN ' + sql)
+                plan = [row[0] for row in cursor.fetchall()]
+                pattern = r'Seq Scan on "?(\w+)"?'
+            else:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = [row[-1] for row in cursor.fetchall()]
+                pattern = r'^SCAN (\w+)$'
+        scans = [match.group(1) for line in plan for match in [re.search(pattern, line.strip())] if match]
+        return [aliases[name] for name in scans if name in aliases], plan
+
+    def assertNoSequentialScan(self, method, url, user, data=None):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 400, url)
+        for query in ctx.captured_queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+                continue
+            scans, plan = self._sequential_scans(sql)
+            self.assertFalse(scans, f"{method.upper()} {url} : parcours séquentiel de {scans}\n{sql}\n" + '\n'.join(plan))
+
+    def test_data_item_endpoints(self):
+        user = self.contributors[0]
+        self.assertNoSequentialScan('get', '/api/data-items/', user)
+        self.assertNoSequentialScan('get', '/api/data-items/pending/', user)
+        self.assertNoSequentialScan('get', f'/api/data-items/{self.item.id}/', user)
+        self.assertNoSequentialScan('get', f'/api/data-items/{self.item.id}/progress/', user)
+
+    def test_claim(self):
+        with self.settings(LABELING_ANNOTATIONS_PER_ITEM=self.SEED_CONTRIBUTORS + 1):
+            self.assertNoSequentialScan('post', '/api/data-items/claim/', self.newcomer, {'count': 5})
+
+    def test_annotation_endpoints(self):
+        user = self.contributors[0]
+        self.assertNoSequentialScan('get', '/api/annotations/', user)
+        self.assertNoSequentialScan('get', f'/api/annotations/{self.item.id}/consensus/', user)
+
+    def test_validation_endpoints(self):
+        self.assertNoSequentialScan('get', '/api/validations/', self.validator)
+
+    def test_user_endpoints(self):
+        user = self.contributors[0]
+        self.assertNoSequentialScan('get', f'/api/users/{user.id}/stats/', user)
+        self.assertNoSequentialScan('get', '/api/users/leaderboard/', user)
+        self.assertNoSequentialScan('get', '/api/users/leaderboard/?order=precision', user)
+
+
+class RequestMetricsTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.user = User.objects.create_user(username='contrib', password='pass12345')
+        self.item = DataItem.objects.create(content='x', data_type='text')
+        self.client.force_authenticate(self.user)
+
+    def _metrics(self):
+        with self.settings(METRICS_TOKEN='secret'):
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_records_latency_and_queries_per_view(self):
+        for _ in range(2):
+            self.client.get('/api/data-items/')
+        self.client.get(f'/api/data-items/{self.item.id}/progress/')
+
+        text = self._metrics()
+        self.assertIn('http_requests_total{view="dataitem-list",method="GET",status="200"} 2', text)
+        self.assertIn('http_request_duration_seconds_count{view="dataitem-list",method="GET"} 2', text)
+        self.assertIn('http_request_db_queries_bucket{view="dataitem-progress",method="GET",le="+Inf"} 1', text)
+        sql_sum = re.search(r'http_request_db_queries_sum\{view="dataitem-list",method="GET"\} ([\d.]+)', text)
+        self.assertGreater(float(sql_sum.group(1)), 0)
+
+    def test_streaming_response_is_recorded_once_consumed(self):
+        self.user.role = 'admin'
+        self.user.save()
+        response = self.client.get('/api/data-items/export/')
+        self.assertNotIn('view="dataitem-export"', self._metrics())
+        b''.join(response.streaming_content)
+        self.assertIn('http_request_duration_seconds_count{view="dataitem-export",method="GET"} 1', self._metrics())
+
+    def test_server_timing_header_is_optional(self):
+        self.assertNotIn('Server-Timing', self.client.get('/api/data-items/'))
+        with self.settings(METRICS_SERVER_TIMING=True):
+            header = self.client.get('/api/data-items/')['Server-Timing']
+        self.assertRegex(header, r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"$')
+
+    def test_metrics_token(self):
+        with self.settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secrets').status_code, 403)
+        self._metrics()
+
+    def test_metrics_are_admin_only_without_token(self):
+        admin = User.objects.create_user(username='admin', password='pass12345', role='admin')
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        for user, expected in ((self.user, 403), (admin, 200)):
+            bearer = f'Bearer {RefreshToken.for_user(user).access_token}'
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION=bearer).status_code, expected)
+        self.client.force_login(admin)
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+
+class RoleTokenAuthenticationTests(APITestCase):
+    """Les jetons de /api/login/ portent le rôle : l'authentification et les permissions ne lisent pas la table User."""
+
+    def setUp(self):
+        cache.clear()
+        self.contributor = User.objects.create_user(username='contrib', password='pass12345')
+        self.label = Label.objects.create(name='Positif')
+        self.item = DataItem.objects.create(content='a', data_type='text')
+
+    def _login(self):
+        response = self.client.post('/api/login/', {'username': 'contrib', 'password': 'pass12345'})
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        return response.data
+
+    def _user_queries(self, queries):
+        return [q['sql'] for q in queries.captured_queries if 'FROM "labeling_user"' in q['sql']]
+
+    def test_token_carries_role_and_skips_user_lookup(self):
+        tokens = self._login()
+        # Première requête : la version de jeton est lue en base puis gardée en cache
+        self.assertEqual(self.client.get('/api/labels/').status_code, 200)
+        self.assertEqual(RefreshToken(tokens['refresh'])['role'], 'contributor')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/annotations/', {'item': self.item.id, 'label': self.label.id})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['user'], 'contrib')
+        self.assertEqual(self._user_queries(queries), [])
+        self.assertEqual(Annotation.objects.get().user_id, self.contributor.id)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/annotations/bulk/', {'annotations': [{'item': self.item.id, 'label': self.label.id}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self._user_queries(queries), [])
+
+    def test_role_change_revokes_access_token_and_refresh_updates_role(self):
+        tokens = self._login()
+        self.contributor.role = 'validator'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.contributor.save(update_fields=['role'])
+        self.contributor.refresh_from_db()
+        self.assertEqual(self.contributor.token_version, 1)
+
+        response = self.client.get('/api/labels/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data['code'], 'token_revoked')
+
+        response = self.client.post('/api/token/refresh/', {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.assertEqual(self.client.get('/api/validations/').status_code, 200)
+        self.assertEqual(self.client.post('/api/annotations/', {'item': self.item.id, 'label': self.label.id}).status_code, 403)
+
+    def test_deactivated_user_cannot_refresh(self):
+        tokens = self._login()
+        self.contributor.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.contributor.save()
+
+        self.assertEqual(self.client.get('/api/labels/').status_code, 401)
+        self.client.credentials()
+        self.assertEqual(self.client.post('/api/token/refresh/', {'refresh': tokens['refresh']}).status_code, 401)
+
+    def test_bulk_update_revokes_access_token(self):
+        self._login()
+        self.assertEqual(self.client.get('/api/labels/').status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.contributor.pk).update(role='validator')
+        self.contributor.refresh_from_db()
+        self.assertEqual(self.contributor.token_version, 1)
+        self.assertEqual(self.client.get('/api/labels/').data['code'], 'token_revoked')
+
+        User.objects.filter(pk=self.contributor.pk).update(first_name='Ana')
+        self.contributor.refresh_from_db()
+        self.assertEqual(self.contributor.token_version, 1)
+
+    def test_evicted_revocation_fails_closed(self):
+        self._login()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.contributor.is_staff = True
+            self.contributor.save()
+        cache.clear()
+        self.assertEqual(self.client.get('/api/labels/').status_code, 401)
+
+    def test_cached_version_makes_authentication_query_free(self):
+        self._login()
+        url = f'/api/data-items/{self.item.id}/progress/'
+        self.assertEqual(self.client.get(url).status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(TOKEN_VERSION_CACHE_SECONDS=30)
+    def test_local_cache_sees_other_process_revocations_within_bound(self):
+        self._login()
+        self.assertEqual(self.client.get('/api/labels/').status_code, 200)
+        # Révocation publiée dans le cache d'un autre processus : invisible ici jusqu'à l'expiration
+        User.objects.filter(pk=self.contributor.pk).update(token_version=F('token_version') + 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/api/labels/').status_code, 200)
+        self.assertEqual(self._user_queries(queries), [])
+
+        later = time.time() + 31
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=later):
+            self.assertEqual(self.client.get('/api/labels/').data['code'], 'token_revoked')
+            User.objects.filter(pk=self.contributor.pk).delete()
+            cache.clear()
+            self.assertEqual(self.client.get('/api/labels/').data['code'], 'user_not_found')
+
+
+class ResponseCacheTests(APITestCase):
+    """progress, consensus et stats sont servis depuis le cache, invalidé par les écritures."""
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.contributor = User.objects.create_user(username='contrib', password='pass12345')
+        self.validator = User.objects.create_user(username='valid', password='pass12345', role='validator')
+        self.label = Label.objects.create(name='Positif')
+        self.item = DataItem.objects.create(content='a', data_type='text')
+        self.annotation = Annotation.objects.create(item=self.item, user=self.contributor, label=self.label)
+        self.client.force_authenticate(self.contributor)
+
+    def test_cached_progress_and_conditional_requests(self):
+        url = f'/api/data-items/{self.item.id}/progress/'
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertIn('Last-Modified', second)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], first['ETag'])
+
+        Validation.objects.create(annotation=self.annotation, validator=self.validator)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['validated_count'], 1)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+    def test_writes_invalidate_consensus_and_stats(self):
+        consensus_url = f'/api/annotations/{self.item.id}/consensus/'
+        stats_url = f'/api/users/{self.contributor.id}/stats/'
+        self.assertEqual(self.client.get(consensus_url).data['total_votes'], 1)
+        self.assertEqual(self.client.get(stats_url).data['approved_annotations'], 0)
+
+        other = User.objects.create_user(username='other', password='pass12345')
+        Annotation.objects.create(item=self.item, user=other, label=self.label)
+        self.assertEqual(self.client.get(consensus_url).data['total_votes'], 2)
+
+        self.client.force_authenticate(self.validator)
+        self.client.post('/api/validations/bulk/', {'validations': [{'annotation': self.annotation.id}]}, format='json')
+        self.assertEqual(self.client.get(stats_url).data['approved_annotations'], 1)
+
+        self.annotation.delete()
+        self.assertEqual(self.client.get(stats_url).data['total_annotations'], 0)
+
+    def test_deactivated_item_is_not_served_from_cache(self):
+        url = f'/api/data-items/{self.item.id}/progress/'
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.item.is_active = False
+        self.item.save()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        self.item.is_active = True
+        self.item.save()
+        self.assertEqual(self.client.get(url).status_code, 200)
+        DataItem.objects.filter(pk=self.item.pk).update(is_active=False)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_hit_rate_counters(self):
+        url = f'/api/users/{self.contributor.id}/stats/'
+        for _ in range(3):
+            self.client.get(url)
+        with self.settings(METRICS_TOKEN='secret'):
+            body = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').content.decode()
+        self.assertIn('response_cache_lookups_total{cache="stats",result="hit"} 2', body)
+        self.assertIn('response_cache_lookups_total{cache="stats",result="miss"} 1', body)
+
+    @override_settings(ROOT_URLCONF='core.asgi_urls')
+    async def test_async_views_share_the_cache(self):
+        headers = {'Authorization': f'Bearer {RefreshToken.for_user(self.contributor).access_token}'}
+        url = f'/api/data-items/{self.item.id}/progress/'
+        first = await self.async_client.get(url, headers=headers)
+        response = await self.async_client.get(url, headers={**headers, 'If-None-Match': first['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['Allow'], first['Allow'])
+
+
+class ReplicaRoutingTests(APITestCase):
+    """Lectures des actions listées sur une réplique, sauf juste après une écriture de l'utilisateur."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='contrib', password='pass12345')
+        self.request = mock.Mock(method='GET', user=self.user)
+
+    @override_settings(DATABASE_REPLICAS=['replica_a'])
+    def test_replica_choice(self):
+        self.assertEqual(replica_for(self.request, 'list'), 'replica_a')
+        self.assertEqual(replica_for(self.request, 'stats'), 'replica_a')
+        self.assertIsNone(replica_for(self.request, 'export'))
+        self.assertIsNone(replica_for(mock.Mock(method='POST', user=self.user), 'list'))
+
+        pin_to_primary(self.user.id)
+        self.assertIsNone(replica_for(self.request, 'list'))
+
+    def test_router_follows_the_request_alias(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(DataItem))
+        token = read_alias.set('replica_a')
+        try:
+            self.assertEqual(router.db_for_read(DataItem), 'replica_a')
+            self.assertEqual(router.db_for_write(DataItem), 'default')
+        finally:
+            read_alias.reset(token)
+
+    def test_without_replicas_reads_stay_on_primary(self):
+        self.assertIsNone(replica_for(self.request, 'list'))
+
+    def test_replicas_need_a_shared_cache(self):
+        with self.settings(DATABASE_REPLICAS=['replica_a'], SHARED_CACHE=False):
+            self.assertEqual([message.id for message in check_shared_cache(None)], ['labeling.W001'])
+        with self.settings(DATABASE_REPLICAS=['replica_a'], SHARED_CACHE=True):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+@override_settings(DATABASE_REPLICAS=['replica_test'])
+class ReplicaDatabaseTests(APITestCase):
+    """La réplique est une seconde base SQLite : ce qui n'y est pas écrit n'y est pas lu."""
+
+    @classmethod
+    def setUpClass(cls):
+        # Alias ajouté ici et non dans `databases` : le lanceur de tests ne doit ni le vérifier ni le créer
+        cls.replica_dir = tempfile.TemporaryDirectory()
+        connections.settings['replica_test'] = connections.configure_settings({
+            'default': connections['default'].settings_dict,
+            'replica_test': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(cls.replica_dir.name, 'replica.sqlite3')},
+        })['replica_test']
+        call_command('migrate', database='replica_test', verbosity=0)
+        cls.databases = {'default', 'replica_test'}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica_test'].close()
+        del connections['replica_test']
+        del connections.settings['replica_test']
+        cls.replica_dir.cleanup()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='contrib', password='pass12345')
+        self.label = Label.objects.create(name='Positif')
+        self.item = DataItem.objects.create(content='primaire', data_type='text')
+        self.client.force_authenticate(self.user)
+
+    def test_reads_your_writes(self):
+        self.assertEqual(self.client.get('/api/data-items/').data['results'], [])
+        self.assertEqual(self.client.get(f'/api/data-items/{self.item.id}/progress/').status_code, 404)
+
+        response = self.client.post('/api/annotations/', {'item': self.item.id, 'label': self.label.id})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([row['id'] for row in self.client.get('/api/data-items/').data['results']], [self.item.id])
+        self.assertEqual(self.client.get(f'/api/data-items/{self.item.id}/progress/').data['annotation_count'], 1)
+
+    def test_replica_reads_fill_the_cache_outside_the_replication_window(self):
+        # L'élément est répliqué, mais pas l'annotation écrite ensuite
+        DataItem.objects.using('replica_test').bulk_create([DataItem(id=self.item.id, content='primaire', data_type='text')])
+        url = f'/api/data-items/{self.item.id}/progress/'
+        other = User.objects.create_user(username='other', password='pass12345')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(url).data['annotation_count'], 0)
+        with self.assertNumQueries(0, using='replica_test'):
+            self.assertEqual(self.client.get(url).data['annotation_count'], 0)
+
+        self.client.force_authenticate(self.user)
+        self.client.post('/api/annotations/', {'item': self.item.id, 'label': self.label.id})
+        # Invalidée à l'instant : la réplique peut être en retard, sa réponse n'est pas conservée
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(url).data['annotation_count'], 0)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(url).data['annotation_count'], 1)
+        # Réponse calculée sur la base principale : mise en cache et servie à tous
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(url).data['annotation_count'], 1)
+
+        # Passé REPLICA_STICKY_SECONDS après l'invalidation, la réplique est réputée à jour
+        for model in (User, Label, Annotation):
+            model.objects.using('replica_test').bulk_create(model.objects.all())
+        response_cache.PROGRESS.invalidate([self.item.id])
+        later = time.time() + settings.REPLICA_STICKY_SECONDS + 1
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=later):
+            self.assertEqual(self.client.get(url).data['annotation_count'], 1)
+            with self.assertNumQueries(0, using='replica_test'):
+                self.assertEqual(self.client.get(url).data['annotation_count'], 1)
+
+
+def _wav(seconds, rate=8000, channels=2, amplitude=0.5):
+    """WAV 16 bits en mémoire : sinusoïde de 440 Hz."""
+    t = np.arange(int(seconds * rate)) / rate
+    samples = (np.sin(2 * np.pi * 440 * t) * amplitude * 32767).astype('<i2')
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as writer:
+        writer.setnchannels(channels)
+        writer.setsampwidth(2)
+        writer.setframerate(rate)
+        writer.writeframes(np.repeat(samples, channels).tobytes())
+    buffer.seek(0)
+    return buffer
+
+
+class AudioItemTests(APITestCase):
+    """Import WAV découpé en segments, pics de forme d'onde et lecture par plages d'octets."""
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media.name, AUDIO_PEAKS_PER_SECOND=20)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.admin = User.objects.create_user(username='admin', password='pass12345', role='admin')
+        self.client.force_authenticate(self.admin)
+
+    def _import(self, seconds=2.5, **data):
+        upload = SimpleUploadedFile('session.wav', _wav(seconds).read(), content_type='audio/wav')
+        return self.client.post('/api/data-items/import-audio/', {'file': upload, 'segment_seconds': 1, **data})
+
+    def test_import_splits_into_segments_with_peaks(self):
+        response = self._import()
+        self.assertEqual(response.status_code, 201)
+        segments = response.data['segments']
+        self.assertEqual([s['duration_seconds'] for s in segments], [1.0, 1.0, 0.5])
+        self.assertEqual([s['start_seconds'] for s in segments], [0.0, 1.0, 2.0])
+        self.assertEqual(DataItem.objects.filter(data_type='audio').count(), 3)
+
+        waveform = self.client.get(f"/api/data-items/{segments[0]['id']}/waveform/").data
+        self.assertEqual(len(waveform['peaks']), 2 * 20)
+        self.assertEqual((waveform['sample_rate'], waveform['channels']), (8000, 2))
+        self.assertEqual((min(waveform['peaks']), max(waveform['peaks'])), (-63, 63))
+
+    def test_range_requests(self):
+        item_id = self._import().data['segments'][0]['id']
+        url = f'/api/data-items/{item_id}/audio/'
+        full = self.client.get(url)
+        body = b''.join(full.streaming_content)
+        self.assertEqual(full.status_code, 200)
+        self.assertEqual(full['Accept-Ranges'], 'bytes')
+        self.assertEqual(int(full['Content-Length']), len(body))
+        self.assertEqual(len(body), 44 + 8000 * 2 * 2)
+
+        head = self.client.get(url, HTTP_RANGE='bytes=0-43')
+        self.assertEqual(head.status_code, 206)
+        self.assertEqual(head['Content-Range'], f'bytes 0-43/{len(body)}')
+        self.assertEqual(b''.join(head.streaming_content), body[:44])
+
+        tail = self.client.get(url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(tail.streaming_content), body[-10:])
+        middle = self.client.get(url, HTTP_RANGE='bytes=100-')
+        self.assertEqual(b''.join(middle.streaming_content), body[100:])
+
+        outside = self.client.get(url, HTTP_RANGE=f'bytes={len(body)}-')
+        self.assertEqual(outside.status_code, 416)
+        self.assertEqual(outside['Content-Range'], f'bytes */{len(body)}')
+
+        reversed_range = self.client.get(url, HTTP_RANGE='bytes=500-100')
+        self.assertEqual(reversed_range.status_code, 200)
+        self.assertEqual(b''.join(reversed_range.streaming_content), body)
+
+    def _files(self):
+        return [os.path.join(root, name) for root, _, names in os.walk(self.media.name) for name in names]
+
+    def test_failed_import_and_deleted_item_leave_no_file(self):
+        with mock.patch('labeling.audio.compute_peaks', side_effect=[[], RuntimeError('échec')]):
+            with self.assertRaises(RuntimeError):
+                self._import()
+        self.assertEqual(DataItem.objects.count(), 0)
+        self.assertEqual(self._files(), [])
+
+        item_id = self._import().data['segments'][0]['id']
+        self.assertEqual(len(self._files()), 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            DataItem.objects.get(pk=item_id).delete()
+        self.assertEqual(len(self._files()), 2)
+
+    def test_rejects_non_wav_and_text_items(self):
+        upload = SimpleUploadedFile('notes.wav', b'pas un fichier audio')
+        response = self.client.post('/api/data-items/import-audio/', {'file': upload})
+        self.assertEqual(response.status_code, 400)
+        text = DataItem.objects.create(content='texte', data_type='text')
+        self.assertEqual(self.client.get(f'/api/data-items/{text.id}/audio/').status_code, 404)
+
+    def test_missing_file_and_url_only_items(self):
+        item_id = self._import().data['segments'][0]['id']
+        os.remove(AudioClip.objects.get(item_id=item_id).file.path)
+        self.assertEqual(self.client.get(f'/api/data-items/{item_id}/audio/').status_code, 404)
+
+        remote = DataItem.objects.create(content='http://x/a.wav', data_type='audio')
+        for action in ('audio', 'waveform'):
+            response = self.client.get(f'/api/data-items/{remote.id}/{action}/')
+            self.assertEqual(response.status_code, 409)
+            self.assertEqual(response.data['detail'].code, 'audio_not_stored')
+        self.assertEqual(self.client.get('/api/data-items/0/waveform/').status_code, 404)
+
+    def test_import_command(self):
+        path = os.path.join(self.media.name, 'long.wav')
+        with open(path, 'wb') as fh:
+            fh.write(_wav(3).read())
+        out = StringIO()
+        call_command('import_audio', path, '--segment-seconds', '2', stdout=out)
+        self.assertIn('2 segment(s)', out.getvalue())
+        self.assertEqual(list(AudioClip.objects.order_by('segment_index').values_list('duration_seconds', flat=True)), [2.0, 1.0])
+
+
+class ValueRowsTests(APITestCase):
+    """Les listes construites par `.values()` sont identiques, octet pour octet, à celles des sérialiseurs."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='contrib', password='pass12345')
+        validator = User.objects.create_user(username='valideuse', password='pass12345', role='validator')
+        labels = [Label.objects.create(name=name) for name in ('Positif', 'Négatif ✓', 'ligne\u2028suivante')]
+        items = [DataItem.objects.create(content=f'élément « {i} »', data_type='text') for i in range(4)]
+        DataItem.objects.create(content='inactif', data_type='text', is_active=False)
+        for i, item in enumerate(items[:3]):
+            for user in (self.user, validator)[:i + 1]:
+                annotation = Annotation.objects.create(item=item, user=user, label=labels[i])
+                if i == 2 and user == self.user:
+                    Validation.objects.create(annotation=annotation, validator=validator)
+        self.client.force_authenticate(self.user)
+
+    def _assert_same_bytes(self, url, serializer_class, queryset):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        expected = JSONRenderer().render({**response.data, 'results': serializer_class(queryset, many=True).data})
+        self.assertEqual(response.content, expected, url)
+
+    def test_lists_match_serializers(self):
+        items = DataItem.objects.filter(is_active=True).with_progress().order_by('-created_at', '-id')
+        self._assert_same_bytes('/api/labels/', LabelSerializer, Label.objects.order_by('id'))
+        self._assert_same_bytes('/api/data-items/', DataItemSerializer, items)
+        self._assert_same_bytes('/api/data-items/?page_size=2', DataItemSerializer, items[:2])
+        self._assert_same_bytes('/api/annotations/', AnnotationSerializer, Annotation.objects.order_by('-created_at', '-id'))
+        pending = items.exclude(annotations__user=self.user)
+        self._assert_same_bytes('/api/data-items/pending/', DataItemSerializer, pending)
+
+    def test_list_does_not_build_model_instances(self):
+        with mock.patch.object(DataItem, 'from_db', side_effect=AssertionError), \
+                mock.patch.object(Annotation, 'from_db', side_effect=AssertionError):
+            self.assertEqual(self.client.get('/api/data-items/').status_code, 200)
+            self.assertEqual(self.client.get('/api/annotations/').status_code, 200)
+
+
+class FastJSONTests(APITestCase):
+    """FastJSONRenderer / FastJSONParser : mêmes octets et mêmes données que le JSON de DRF."""
+
+    payload = OrderedDict([
+        ('texte', 'élément « 1 »\u2028\u2029'),
+        ('date', timezone.now().replace(microsecond=123456)),
+        ('jour', timezone.now().date()),
+        ('decimal', Decimal('12.50')),
+        ('uuid', uuid.UUID(int=7)),
+        ('lazy', gettext_lazy('Aucun label soumis.')),
+        ('liste', [1, 2.5, 33.333333333333336, None, True, {'imbriqué': []}]),
+        (1, 'clé entière'),
+    ])
+
+    def test_renders_same_bytes_as_drf(self):
+        self.assertEqual(FastJSONRenderer().render(self.payload), JSONRenderer().render(self.payload))
+        self.assertEqual(
+            FastJSONRenderer().render(self.payload, 'application/json; indent=2'),
+            JSONRenderer().render(self.payload, 'application/json; indent=2'),
+        )
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_falls_back_for_values_orjson_rejects(self):
+        data = {'grand': 2 ** 70}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        with self.assertRaises(TypeError):
+            FastJSONRenderer().render({'objet': object()})
+
+    def test_parses_like_drf(self):
+        body = JSONRenderer().render(self.payload)
+        self.assertEqual(FastJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b'{"item": '))
+
+    def test_missing_orjson_is_reported(self):
+        with self.settings(FAST_JSON=True), mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual([message.id for message in renderers.check_orjson(None)], ['labeling.W002'])
+            self.assertEqual(FastJSONRenderer().render(self.payload), JSONRenderer().render(self.payload))
+        with self.settings(FAST_JSON=True):
+            self.assertEqual(renderers.check_orjson(None), [])
+
+
+@override_settings(
+    LABELING_ANNOTATIONS_PER_ITEM=5,
+    LABELING_RETIREMENT={'text': {'confidence': 0.8, 'min_votes': 2}, 'audio': {'confidence': 0.8, 'min_votes': 3}},
+)
+class AdaptiveRoutingTests(APITestCase):
+    """Les éléments sont servis par incertitude décroissante et retirés une fois le consensus atteint."""
+
+    def setUp(self):
+        cache.clear()
+        self.users = [User.objects.create_user(username=f'user{i}', password='pass12345') for i in range(4)]
+        self.newcomer = User.objects.create_user(username='newcomer', password='pass12345')
+        self.yes, self.no = Label.objects.create(name='Oui'), Label.objects.create(name='Non')
+        self.items = DataItem.objects.bulk_create(DataItem(content=f'texte {i}', data_type='text') for i in range(4))
+        self.client.force_authenticate(self.newcomer)
+
+    def _vote(self, item, *labels):
+        return [Annotation.objects.create(item=item, user=user, label=label) for user, label in zip(self.users, labels)]
+
+    def _pending(self):
+        return [row['id'] for row in self.client.get('/api/data-items/pending/').data['results']]
+
+    def test_unanimous_items_retire_and_are_no_longer_served(self):
+        self._vote(self.items[0], self.yes, self.yes)
+        item = DataItem.objects.get(pk=self.items[0].pk)
+        self.assertIsNotNone(item.retired_at)
+        self.assertAlmostEqual(item.uncertainty, 0.25)
+        self.assertNotIn(item.id, self._pending())
+        response = self.client.post('/api/data-items/claim/', {'count': 10}, format='json')
+        self.assertNotIn(item.id, [lease['item']['id'] for lease in response.data])
+        self.assertTrue(self.client.get(f'/api/data-items/{item.id}/progress/').data['retired'])
+
+    def test_items_are_ranked_by_remaining_uncertainty(self):
+        self._vote(self.items[0], self.yes)
+        self._vote(self.items[1], self.yes, self.no)
+        self._vote(self.items[2], self.yes, self.no, self.yes)
+        pending = self._pending()
+        # Sans vote : 0,5 comme 1-1, mais moins attribué ; 2-1 : 0,4 ; 1-0 : 0,33
+        self.assertEqual(pending, [self.items[3].id, self.items[1].id, self.items[2].id, self.items[0].id])
+        self.client.force_authenticate(self.users[3])
+        response = self.client.post('/api/data-items/claim/', {'count': 2}, format='json')
+        self.assertEqual([lease['item']['id'] for lease in response.data], [self.items[3].id, self.items[1].id])
+
+    def test_pending_lists_only_claimable_items(self):
+        # Complet : toutes les places sont prises par des baux ou des annotations
+        DataItem.objects.filter(pk=self.items[0].pk).update(assignment_count=5)
+        self.client.force_authenticate(self.users[0])
+        leased = self.client.post('/api/data-items/claim/', {'count': 1}, format='json').data[0]['item']['id']
+        pending = self._pending()
+        self.assertNotIn(self.items[0].id, pending)
+        self.assertNotIn(leased, pending)
+        self.client.force_authenticate(self.newcomer)
+        pending = self._pending()
+        claimed = self.client.post('/api/data-items/claim/', {'count': 10}, format='json').data
+        self.assertEqual([lease['item']['id'] for lease in claimed], pending)
+
+    def test_deleting_a_vote_brings_the_item_back(self):
+        first, _ = self._vote(self.items[0], self.yes, self.yes)
+        first.delete()
+        item = DataItem.objects.get(pk=self.items[0].pk)
+        self.assertIsNone(item.retired_at)
+        self.assertIn(item.id, self._pending())
+
+    def test_thresholds_are_per_data_type_and_apply_to_bulk_writes(self):
+        audio = DataItem.objects.create(content='clip.wav', data_type='audio')
+        for user in self.users[:2]:
+            self.client.force_authenticate(user)
+            response = self.client.post('/api/annotations/bulk/', {'annotations': [
+                {'item': audio.id, 'label': self.yes.id}, {'item': self.items[0].id, 'label': self.yes.id},
+            ]}, format='json')
+            self.assertEqual(response.status_code, 201)
+        self.assertIsNotNone(DataItem.objects.get(pk=self.items[0].pk).retired_at)
+        self.assertIsNone(DataItem.objects.get(pk=audio.pk).retired_at)
+        Annotation.objects.create(item=audio, user=self.users[2], label=self.yes)
+        self.assertIsNotNone(DataItem.objects.get(pk=audio.pk).retired_at)
+
+    def test_a_vote_refreshes_routing_in_one_update(self):
+        self._vote(self.items[0], self.yes, self.yes)
+        retired_at = DataItem.objects.get(pk=self.items[0].pk).retired_at
+        with CaptureQueriesContext(connection) as queries:
+            Annotation.objects.create(item=self.items[0], user=self.users[2], label=self.yes)
+        routing_queries = [q['sql'] for q in queries.captured_queries if '"uncertainty"' in q['sql']]
+        self.assertEqual(len(routing_queries), 1)
+        self.assertTrue(routing_queries[0].startswith('UPDATE'))
+        item = DataItem.objects.get(pk=self.items[0].pk)
+        # Mêmes valeurs que les formules Python ; la date de retrait est conservée
+        self.assertEqual(item.uncertainty, uncertainty(3, 3))
+        self.assertEqual(item.retired_at, retired_at)
+        self.assertEqual(item.vote_version, 3)
+
+    def test_rebuild_restores_routing(self):
+        self._vote(self.items[0], self.yes, self.yes)
+        DataItem.objects.update(uncertainty=0.5, retired_at=None)
+        call_command('rebuild_tallies', stdout=StringIO())
+        item = DataItem.objects.get(pk=self.items[0].pk)
+        self.assertIsNotNone(item.retired_at)
+        self.assertAlmostEqual(item.uncertainty, 0.25)
+
+
+@override_settings(JOB_RETRY_SECONDS=10, JOB_STALE_SECONDS=60)
+class BackgroundJobTests(APITestCase):
+    """Tâches soumises par l'API, exécutées par `run_workers`, reprises après échec."""
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.admin = User.objects.create_user(username='admin', password='pass12345', role='admin')
+        contributor = User.objects.create_user(username='contrib', password='pass12345')
+        label = Label.objects.create(name='Positif')
+        for i in range(3):
+            item = DataItem.objects.create(content=f'texte {i}', data_type='text')
+            Annotation.objects.create(item=item, user=contributor, label=label)
+        self.client.force_authenticate(self.admin)
+
+    def _submit(self, kind, **params):
+        response = self.client.post('/api/jobs/', {'kind': kind, 'params': params}, format='json')
+        self.assertEqual(response.status_code, 202, response.data)
+        return response.data['id']
+
+    def _work(self):
+        call_command('run_workers', '--once', '--workers', '1', stdout=StringIO())
+
+    def test_export_job_runs_in_background(self):
+        job_id = self._submit('export', output='jsonl')
+        self.assertEqual(self.client.get(f'/api/jobs/{job_id}/').data['status'], 'queued')
+        self._work()
+
+        job = self.client.get(f'/api/jobs/{job_id}/').data
+        self.assertEqual((job['status'], job['progress'], job['attempts']), ('succeeded', 1.0, 1))
+        self.assertEqual(job['result']['rows'], 3)
+        download = self.client.get(f'/api/jobs/{job_id}/download/')
+        self.assertEqual(download.status_code, 200)
+        exported = self.client.get('/api/data-items/export/')
+        self.assertEqual(b''.join(download.streaming_content), b''.join(exported.streaming_content))
+
+    def test_expired_jobs_are_purged_with_their_file(self):
+        old_id, recent_id = self._submit('export', output='jsonl'), self._submit('export', output='csv')
+        self._work()
+        old = Job.objects.get(pk=old_id)
+        path = default_storage.path(old.result['file'])
+        Job.objects.filter(pk=old_id).update(finished_at=timezone.now() - timedelta(days=8))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(jobs.purge_jobs(), 1)
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(list(Job.objects.values_list('id', flat=True)), [recent_id])
+        self.assertEqual(self.client.get(f'/api/jobs/{recent_id}/download/').status_code, 200)
+        with override_settings(JOB_RETENTION_SECONDS=0):
+            Job.objects.update(finished_at=timezone.now() - timedelta(days=30))
+            self.assertEqual(jobs.purge_jobs(), 0)
+
+    def test_recomputation_jobs(self):
+        stats_id, tallies_id = self._submit('rebuild_stats'), self._submit('rebuild_tallies')
+        consensus_id = self._submit('consensus', max_iterations=5)
+        self._work()
+        self.assertEqual(Job.objects.get(pk=stats_id).result, {'rows': 1})
+        self.assertEqual(Job.objects.get(pk=tallies_id).result, {'tallies': 3, 'items': 3})
+        consensus = Job.objects.get(pk=consensus_id)
+        self.assertEqual(consensus.result['run'], ConsensusRun.objects.get().pk)
+        self.assertIn('postérieur(s) écrit(s)', consensus.message)
+
+    def test_params_are_validated_and_admin_only(self):
+        response = self.client.post('/api/jobs/', {'kind': 'export', 'params': {'output': 'xml'}}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/jobs/', {'kind': 'rebuild_stats', 'params': {'x': 1}}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.client.force_authenticate(User.objects.get(username='contrib'))
+        self.assertEqual(self.client.post('/api/jobs/', {'kind': 'rebuild_stats'}, format='json').status_code, 403)
+
+    def test_failures_are_retried_with_backoff(self):
+        job_id = self._submit('rebuild_stats')
+        failing = mock.Mock(side_effect=RuntimeError('base indisponible'))
+        with mock.patch.dict(jobs.HANDLERS, {'rebuild_stats': failing}):
+            self._work()
+            job = Job.objects.get(pk=job_id)
+            self.assertEqual((job.status, job.attempts), ('queued', 1))
+            self.assertIn('base indisponible', job.error)
+            self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=5))
+
+            self._work()
+            self.assertEqual(failing.call_count, 1)
+            Job.objects.filter(pk=job_id).update(run_after=timezone.now())
+            self._work()
+            job = Job.objects.get(pk=job_id)
+            self.assertEqual((job.status, job.attempts), ('queued', 2))
+            self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=15))
+
+            Job.objects.filter(pk=job_id).update(run_after=timezone.now(), max_attempts=3)
+            self._work()
+        job = Job.objects.get(pk=job_id)
+        self.assertEqual((job.status, job.attempts), ('failed', 3))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_jobs_of_lost_workers_are_requeued(self):
+        job = jobs.submit('rebuild_stats')
+        self.assertEqual(jobs.claim_job('worker-perdu').pk, job.pk)
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(minutes=5))
+        self._work()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('succeeded', 2))
+
+
+class SparseFieldsTests(APITestCase):
+    """`?fields=` / `?omit=` : champs retirés de la réponse, et des colonnes, sous-requêtes et jointures lues."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='contrib', password='pass12345')
+        validator = User.objects.create_user(username='valideuse', password='pass12345', role='validator')
+        label = Label.objects.create(name='Positif')
+        self.item = DataItem.objects.create(content='élément', data_type='text')
+        DataItem.objects.create(content='autre', data_type='text')
+        annotation = Annotation.objects.create(item=self.item, user=validator, label=label)
+        Validation.objects.create(annotation=annotation, validator=validator)
+        self.client.force_authenticate(self.user)
+
+    def _get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return response, ' '.join(query['sql'] for query in queries).lower()
+
+    def test_fields_and_omit_select_response_keys(self):
+        response, _ = self._get('/api/data-items/?fields=id,annotation_count,inconnu')
+        self.assertEqual([list(row) for row in response.data['results']], [['id', 'annotation_count']] * 2)
+        response, _ = self._get(f'/api/data-items/{self.item.pk}/?omit=content,is_fully_validated')
+        self.assertEqual(list(response.data), ['id', 'data_type', 'is_active', 'annotation_count', 'validation_progress'])
+        self.assertEqual(response.data['annotation_count'], 1)
+        response, _ = self._get('/api/annotations/?fields=label,id')
+        self.assertEqual(list(response.data['results'][0]), ['id', 'label'])
+        response, _ = self._get('/api/labels/?omit=id')
+        self.assertEqual(response.data['results'], [{'name': 'Positif'}])
+
+    def test_omitted_fields_are_not_queried(self):
+        _, sql = self._get('/api/data-items/?fields=id,content')
+        self.assertNotIn('labeling_annotation', sql)
+        _, sql = self._get('/api/data-items/?fields=id,annotation_count')
+        self.assertNotIn('labeling_validation', sql)
+        self.assertNotIn('"content"', sql)
+        _, sql = self._get('/api/data-items/pending/?omit=annotation_count,validation_progress,is_fully_validated')
+        self.assertNotIn('count(', sql)
+        _, sql = self._get(f'/api/data-items/{self.item.pk}/?fields=id,data_type')
+        self.assertNotIn('"content"', sql)
+        _, sql = self._get('/api/annotations/?omit=user')
+        self.assertNotIn('join', sql)
+        _, sql = self._get('/api/annotations/')
+        self.assertIn('join', sql)
+
+    def test_cursor_pagination_with_sparse_fields(self):
+        response, _ = self._get('/api/data-items/?fields=id&page_size=1')
+        following, _ = self._get(response.data['next'])
+        self.assertEqual([row['id'] for row in response.data['results'] + following.data['results']],
+                         list(DataItem.objects.order_by('-created_at', '-id').values_list('id', flat=True)))
+
+    def test_writes_and_full_representation_unchanged(self):
+        self.client.force_authenticate(User.objects.get(username='valideuse'))
+        response, sql = self._get('/api/validations/?fields=id,is_approved')
+        self.assertEqual(list(response.data['results'][0]), ['id', 'is_approved'])
+        self.assertNotIn('join', sql)
+        response, _ = self._get('/api/validations/')
+        self.assertEqual(response.data['results'][0]['validator'], 'valideuse')
+
+        self.client.force_authenticate(self.user)
+        label = Label.objects.get()
+        response = self.client.post('/api/annotations/?fields=id', {'item': self.item.pk, 'label': label.pk})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(list(response.data), ['id', 'item', 'user', 'label', 'created_at'])
+        response, _ = self._get('/api/data-items/?omit=')
+        self.assertEqual(len(response.data['results'][0]), 7)
+
+
+class ChangeFeedTests(APITestCase):
+    """`GET /api/changes/?since=` : créations, modifications et suppressions dans l'ordre des curseurs."""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='pass12345', role='admin')
+        self.contributor = User.objects.create_user(username='contrib', password='pass12345')
+        self.validator = User.objects.create_user(username='valideuse', password='pass12345', role='validator')
+        self.labels = [Label.objects.create(name=name) for name in ('Positif', 'Négatif')]
+        self.item = DataItem.objects.create(content='élément', data_type='text')
+        self.client.force_authenticate(self.admin)
+
+    def _changes(self, since=0, **params):
+        # Publication faite par les workers entre deux tâches
+        changes.publish()
+        response = self.client.get('/api/changes/', {'since': since, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_feed_follows_writes_in_order(self):
+        start = self._changes()['cursor']
+        self.client.force_authenticate(self.contributor)
+        annotation_id = self.client.post('/api/annotations/', {'item': self.item.pk, 'label': self.labels[0].pk}).data['id']
+        self.client.patch(f'/api/annotations/{annotation_id}/', {'label': self.labels[1].pk})
+        self.client.force_authenticate(self.validator)
+        bulk = self.client.post('/api/validations/bulk/', {'validations': [{'annotation': annotation_id}]}, format='json')
+        self.assertEqual(bulk.status_code, 201)
+        Annotation.objects.get(pk=annotation_id).delete()
+
+        self.client.force_authenticate(self.admin)
+        feed = self._changes(start)
+        self.assertEqual(
+            [(change['kind'], change['action']) for change in feed['changes']],
+            [('annotation', 'created'), ('annotation', 'updated'), ('validation', 'created'),
+             ('validation', 'deleted'), ('annotation', 'deleted')],
+        )
+        updated = feed['changes'][1]
+        self.assertEqual((updated['object_id'], updated['data']['label'], updated['data']['user']),
+                         (annotation_id, self.labels[1].pk, self.contributor.pk))
+        self.assertIsNone(feed['changes'][-1]['data'])
+        self.assertEqual(feed['cursor'], feed['changes'][-1]['cursor'])
+        self.assertEqual(self._changes(feed['cursor']), {'changes': [], 'cursor': feed['cursor'], 'has_more': False})
+
+    def test_cursor_pages_and_imports(self):
+        start = self._changes()['cursor']
+        import_items(({'content': f'importé {i}', 'data_type': 'text'} for i in range(3)), 'flux')
+        first = self._changes(start, limit=2)
+        self.assertTrue(first['has_more'])
+        rest = self._changes(first['cursor'], limit=2)
+        self.assertFalse(rest['has_more'])
+        changes = first['changes'] + rest['changes']
+        self.assertEqual([change['data']['content'] for change in changes], ['importé 0', 'importé 1', 'importé 2'])
+        self.assertEqual([change['cursor'] for change in changes], list(range(start + 1, start + 4)))
+
+    def test_late_commit_with_a_smaller_id_is_not_skipped(self):
+        start = self._changes()['cursor']
+        for content in ('a', 'b', 'c'):
+            self.item.content = content
+            self.item.save()
+        # Le changement du milieu n'est pas encore visible (transaction ouverte) quand le flux est lu
+        late = ChangeEvent.objects.filter(position__isnull=True).order_by('id')[1]
+        ChangeEvent.objects.filter(pk=late.pk).delete()
+        first = self._changes(start)
+        self.assertEqual([change['data']['content'] for change in first['changes']], ['a', 'c'])
+
+        late.save(force_insert=True)
+        second = self._changes(first['cursor'])
+        self.assertEqual([change['id'] for change in second['changes']], [late.id])
+        self.assertGreater(second['cursor'], first['cursor'])
+
+    @override_settings(CHANGES_PUBLISH_SECONDS=0)
+    def test_reading_the_feed_does_not_publish(self):
+        start = self._changes()['cursor']
+        self.item.save()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/changes/', {'since': start})
+        self.assertEqual(response.data['changes'], [])
+        self.assertTrue(all(q['sql'].startswith('SELECT') for q in queries.captured_queries))
+        call_command('run_workers', '--once', '--workers', '1', stdout=StringIO())
+        self.assertEqual(len(self._changes(start)['changes']), 1)
+
+    def test_admin_only(self):
+        self.client.force_authenticate(self.contributor)
+        self.assertEqual(self.client.get('/api/changes/').status_code, 403)
+
+
+class ArchiveTests(APITestCase):
+    """`archive_items` déplace les éléments inactifs vers les tables d'archive ; `restore` les ramène à l'identique."""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='pass12345', role='admin')
+        self.contributors = [User.objects.create_user(username=f'contrib{i}', password='pass12345') for i in range(2)]
+        validator = User.objects.create_user(username='valideuse', password='pass12345', role='validator')
+        self.label = Label.objects.create(name='Positif')
+        self.active = DataItem.objects.create(content='actif', data_type='text')
+        self.inactive = [DataItem.objects.create(content=f'inactif {i}', data_type='text', is_active=False) for i in range(3)]
+        for item in (self.active, self.inactive[0]):
+            for user in self.contributors:
+                Annotation.objects.create(item=item, user=user, label=self.label)
+        self.validation = Validation.objects.create(
+            annotation=Annotation.objects.get(item=self.inactive[0], user=self.contributors[0]), validator=validator,
+            feedback='ok',
+        )
+        self.client.force_authenticate(self.admin)
+
+    def _state(self, item_id):
+        annotations = Annotation.objects.filter(item_id=item_id).order_by('id')
+        return (
+            DataItem.objects.filter(pk=item_id).values('content', 'data_type', 'created_at').get(),
+            list(annotations.values_list('id', 'user_id', 'label_id', 'created_at')),
+            list(Validation.objects.filter(annotation__in=annotations).values_list('id', 'is_approved', 'feedback', 'validated_at')),
+        )
+
+    def test_archive_and_restore_round_trip(self):
+        before = self._state(self.inactive[0].pk)
+        out = StringIO()
+        call_command('archive_items', '--batch-size', '2', stdout=out)
+        self.assertIn('3 élément(s) archivé(s).', out.getvalue())
+
+        self.assertEqual(list(DataItem.objects.values_list('id', flat=True)), [self.active.pk])
+        self.assertEqual(Annotation.objects.count(), 2)
+        self.assertEqual((ArchivedDataItem.objects.count(), ArchivedAnnotation.objects.count(),
+                          ArchivedValidation.objects.count()), (3, 2, 1))
+        stats = UserStats.objects.get(user=self.contributors[0])
+        self.assertEqual((stats.total_annotations, stats.approved_annotations), (1, 0))
+        self.assertFalse(LabelTally.objects.filter(item_id=self.inactive[0].pk).exists())
+
+        listed = self.client.get('/api/archive/').data['results']
+        self.assertEqual([(row['id'], row['annotation_count']) for row in listed],
+                         [(self.inactive[0].pk, 2), (self.inactive[1].pk, 0), (self.inactive[2].pk, 0)])
+
+        response = self.client.post('/api/archive/restore/', {'ids': [self.inactive[0].pk, 999999]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'restored': [self.inactive[0].pk], 'missing': [999999]})
+        self.assertEqual(self._state(self.inactive[0].pk), before)
+        restored = DataItem.objects.get(pk=self.inactive[0].pk)
+        self.assertTrue(restored.is_active)
+        self.assertEqual(restored.assignment_count, 2)
+        self.assertEqual(LabelTally.objects.get(item=restored).votes, 2)
+        stats.refresh_from_db()
+        self.assertEqual((stats.total_annotations, stats.approved_annotations), (2, 1))
+        self.assertEqual(ArchivedDataItem.objects.count(), 2)
+        self.assertEqual(verify_tallies(), [])
+
+    def test_archive_is_logged_and_restore_can_stay_inactive(self):
+        start = ChangeEvent.objects.order_by('-id').values_list('id', flat=True).first()
+        archived = archive.archive_items(limit=1)
+        self.assertEqual(archived, 1)
+        self.assertEqual(
+            sorted(ChangeEvent.objects.filter(id__gt=start).values_list('kind', 'action', 'data')),
+            [('annotation', 'archived', None)] * 2 + [('item', 'archived', None), ('validation', 'archived', None)],
+        )
+        response = self.client.post('/api/archive/restore/', {'ids': [self.inactive[0].pk], 'activate': False}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(DataItem.objects.get(pk=self.inactive[0].pk).is_active)
+        self.assertEqual(ChangeEvent.objects.filter(action='restored').count(), 4)
+        self.assertEqual(self.client.post('/api/archive/restore/', {'ids': [999999]}, format='json').status_code, 404)
+
+    def test_audio_clip_survives_archive(self):
+        item = DataItem.objects.create(content='', data_type='audio', is_active=False)
+        AudioClip.objects.create(
+            item=item, file='audio/extrait.wav', source='extrait.wav', duration_seconds=1.5, sample_rate=8000,
+            channels=1, peaks_per_second=10, peaks=[-3, 4],
+        )
+        archive.archive_items()
+        self.assertFalse(AudioClip.objects.exists())
+        archive.restore_items([item.pk])
+        clip = AudioClip.objects.get(item_id=item.pk)
+        self.assertEqual((clip.file.name, clip.duration_seconds, clip.peaks), ('audio/extrait.wav', 1.5, [-3, 4]))
+
+    def test_admin_only(self):
+        self.client.force_authenticate(self.contributors[0])
+        self.assertEqual(self.client.get('/api/archive/').status_code, 403)
+
+
+@override_settings(AGREEMENT_REFRESH_SECONDS=0, AGREEMENT_MIN_SHARED_ITEMS=1)
+class AgreementTests(APITestCase):
+    """Kappa de Fleiss, alpha de Krippendorff, accord par paires ; rafraîchissement incrémental = recalcul complet."""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='pass12345', role='admin')
+        self.users = [User.objects.create_user(username=f'contrib{i}', password='pass12345') for i in range(3)]
+        self.labels = [Label.objects.create(name=name) for name in ('Positif', 'Négatif', 'Neutre')]
+        self.items = [DataItem.objects.create(content=f'élément {i}', data_type='text' if i < 4 else 'audio') for i in range(6)]
+        votes = [(0, 0, 0), (0, 1, 0), (0, 2, 0), (1, 0, 0), (1, 1, 1), (1, 2, 1), (2, 0, 2), (2, 1, 2),
+                 (3, 0, 1), (4, 0, 0), (4, 1, 0), (5, 1, 2), (5, 2, 1)]
+        for item, user, label in votes:
+            Annotation.objects.create(item=self.items[item], user=self.users[user], label=self.labels[label])
+        self.client.force_authenticate(self.admin)
+
+    def _rows(self, units):
+        return np.array([(unit, label, votes) for unit, counts in enumerate(units) for label, votes in enumerate(counts) if votes])
+
+    def test_reference_values(self):
+        # Fleiss (1971) : 10 sujets, 14 évaluateurs, 5 catégories
+        fleiss = [[0, 0, 0, 0, 14], [0, 2, 6, 4, 2], [0, 0, 3, 5, 6], [0, 3, 9, 2, 0], [2, 2, 8, 1, 1],
+                  [7, 7, 0, 0, 0], [3, 2, 6, 3, 0], [2, 5, 3, 2, 2], [6, 5, 2, 1, 0], [0, 2, 2, 3, 7]]
+        result = agreement.metrics(agreement.tally_stats(self._rows(fleiss)), {})
+        self.assertEqual((result['fleiss_kappa'], result['observed_agreement'], result['expected_agreement']),
+                         (0.2099, 0.378, 0.2128))
+        # Krippendorff (2011) : 4 codeurs, 12 unités, valeurs manquantes, données nominales
+        krippendorff = [[0, 3], [0, 0, 3, 1], [0, 0, 0, 4], [0, 0, 0, 4], [0, 0, 4], [0, 1, 1, 1, 1], [0, 0, 0, 0, 4],
+                        [0, 3, 1], [0, 0, 4], [0, 0, 0, 0, 0, 3], [0, 2], [0, 0, 0, 1]]
+        result = agreement.metrics(agreement.tally_stats(self._rows(krippendorff)), {})
+        self.assertEqual((result['krippendorff_alpha'], result['items'], result['annotations']), (0.7434, 11, 40))
+        unanimous = agreement.metrics(agreement.tally_stats(self._rows([[2, 0], [0, 3]])), {})
+        self.assertEqual((unanimous['fleiss_kappa'], unanimous['krippendorff_alpha']), (1.0, 1.0))
+
+    def test_incremental_refresh_matches_full_recompute(self):
+        agreement.compute_snapshot()
+        Annotation.objects.create(item=self.items[3], user=self.users[1], label=self.labels[1])
+        changed = Annotation.objects.get(item=self.items[1], user=self.users[0])
+        changed.label = self.labels[1]
+        changed.save()
+        Annotation.objects.get(item=self.items[0], user=self.users[2]).delete()
+        self.items[2].delete()
+        DataItem.objects.filter(pk=self.items[5].pk).update(is_active=False)
+        archive.archive_items()
+        bulk_annotate(self.users[2], [{'item': self.items[4].pk, 'label': self.labels[2].pk}])
+
+        incremental = agreement.refresh_snapshot()
+        self.assertFalse(incremental.full)
+        full = agreement.compute_snapshot()
+        self.assertEqual(agreement.snapshot_data(incremental)['by_data_type'], agreement.snapshot_data(full)['by_data_type'])
+        self.assertEqual(AgreementDelta.objects.count(), 0)
+
+    def test_votes_are_recorded_once_agreement_is_requested(self):
+        self.assertEqual(AgreementDelta.objects.count(), 0)
+        self.assertIsNone(agreement.refresh_snapshot())
+        agreement.compute_snapshot()
+        Annotation.objects.create(item=self.items[3], user=self.users[2], label=self.labels[1])
+        self.assertEqual(AgreementDelta.objects.count(), 1)
+
+    def test_vote_during_full_recompute_is_counted_once(self):
+        load_tallies = agreement.load_tallies
+
+        def vote_then_load(data_type, *args, **kwargs):
+            # Vote validé pendant le recalcul : dans les décomptes lus, son delta encore sans position
+            if not Annotation.objects.filter(item=self.items[3], user=self.users[2]).exists():
+                Annotation.objects.create(item=self.items[3], user=self.users[2], label=self.labels[1])
+            return load_tallies(data_type, *args, **kwargs)
+
+        with mock.patch.object(agreement, 'load_tallies', vote_then_load):
+            interleaved = agreement.compute_snapshot()
+        self.assertEqual(len(interleaved.covered_deltas), 1)
+        incremental = agreement.refresh_snapshot()
+        Annotation.objects.create(item=self.items[0], user=self.admin, label=self.labels[0])
+        incremental = agreement.refresh_snapshot()
+        self.assertEqual(incremental.covered_deltas, [])
+        full = agreement.compute_snapshot()
+        self.assertEqual(agreement.snapshot_data(incremental)['by_data_type'], agreement.snapshot_data(full)['by_data_type'])
+
+    def test_late_commit_delta_is_not_skipped(self):
+        agreement.compute_snapshot()
+        Annotation.objects.create(item=self.items[3], user=self.users[1], label=self.labels[1])
+        Annotation.objects.create(item=self.items[4], user=self.users[2], label=self.labels[2])
+        late = AgreementDelta.objects.order_by('id').first()
+        # Transaction encore en cours : son delta, d'id inférieur, n'est pas visible du rafraîchissement
+        AgreementDelta.objects.filter(pk=late.pk).delete()
+        agreement.refresh_snapshot()
+        late.save(force_insert=True)
+        incremental = agreement.refresh_snapshot()
+        full = agreement.compute_snapshot()
+        self.assertEqual(agreement.snapshot_data(incremental)['by_data_type'], agreement.snapshot_data(full)['by_data_type'])
+
+    def test_pairwise_agreement(self):
+        pairwise = agreement.pairwise_agreement(load_matrix())
+        by_pair = {tuple(row['users']): (row['shared_items'], row['agreement']) for row in pairwise['pairs_detail']}
+        first, second, third = (user.pk for user in self.users)
+        self.assertEqual(by_pair[first, second], (4, 0.75))
+        self.assertEqual(by_pair[second, third], (3, 0.6667))
+        self.assertEqual(by_pair[first, third], (2, 0.5))
+        self.assertEqual((pairwise['pairs'], pairwise['agreement']), (9, 0.6667))
+        self.assertEqual(pairwise['pairs_detail'][0]['users'], [first, third])
+        self.assertEqual(agreement.pairwise_agreement(load_matrix(), min_shared=3)['pairs_detail'][0]['users'], [second, third])
+
+    def test_endpoint_serves_snapshots(self):
+        response = self.client.get('/api/agreement/')
+        self.assertEqual(response.status_code, 404)
+        response = self.client.post('/api/agreement/refresh/')
+        self.assertEqual((response.status_code, response.data['kind']), (202, 'agreement'))
+        call_command('run_workers', '--once', '--workers', '1', stdout=StringIO())
+        self.assertEqual(Job.objects.get(pk=response.data['id']).status, 'succeeded')
+
+        body = self.client.get('/api/agreement/').data
+        self.assertTrue(body['full'])
+        self.assertEqual(set(body['by_data_type']), {'text', 'audio'})
+        self.assertEqual(body['overall']['items'], 5)
+        self.assertEqual([row['label'] for row in body['overall']['labels']], ['Positif', 'Négatif', 'Neutre'])
+        self.assertEqual(body['pairwise']['pairs'], 9)
+
+        Annotation.objects.create(item=self.items[3], user=self.users[2], label=self.labels[1])
+        with CaptureQueriesContext(connection) as queries:
+            body = self.client.get('/api/agreement/').data
+        self.assertEqual((body['full'], body['overall']['items']), (True, 5))
+        self.assertTrue(all(q['sql'].startswith('SELECT') for q in queries.captured_queries))
+        # Rafraîchissement incrémental par les workers, entre deux tâches
+        call_command('run_workers', '--once', '--workers', '1', stdout=StringIO())
+        body = self.client.get('/api/agreement/').data
+        self.assertFalse(body['full'])
+        self.assertEqual(body['overall']['items'], 6)
+        history = self.client.get('/api/agreement/history/').data
+        self.assertEqual([row['full'] for row in history], [False, True])
+
+        self.client.force_authenticate(self.users[0])
+        self.assertEqual(self.client.get('/api/agreement/').status_code, 403)
@@ -1,7 +1,7 @@
 from rest_framework.routers import DefaultRouter
 from django.urls import path, include
 
-from labeling.views import DataItemViewSet, AnnotationViewSet, ValidationViewSet, UserViewSet, LabelViewSet
+from labeling.views import AgreementViewSet, ArchiveViewSet, ChangeViewSet, DataItemViewSet, AnnotationViewSet, JobViewSet, ValidationViewSet, UserViewSet, LabelViewSet
 
 router = DefaultRouter()
 router.register(r'labels', LabelViewSet, basename='label')
@@ -9,6 +9,10 @@ router.register(r'data-items', DataItemViewSet, basename='dataitem')
 router.register(r'annotations', AnnotationViewSet, basename='annotation')
 router.register(r'validations', ValidationViewSet, basename='validation')
 router.register(r'users', UserViewSet, basename='user')
+router.register(r'jobs', JobViewSet, basename='job')
+router.register(r'changes', ChangeViewSet, basename='change')
+router.register(r'archive', ArchiveViewSet, basename='archive')
+router.register(r'agreement', AgreementViewSet, basename='agreement')
 urlpatterns = [
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,20 +1,58 @@
-from collections import Counter
-
-from django.shortcuts import render
-from rest_framework import viewsets, status
+from django.db import transaction
+from django.db.models import Count
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render
+from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action, permission_classes
+from rest_framework.exceptions import APIException
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.response import Response
 
-from .models import DataItem, Annotation, Validation, User, Label
-from .permissions import IsContributor, IsValidator, IsAdminOrReadOnly
-from .serializers import DataItemSerializer, AnnotationSerializer, ValidationSerializer, UserSerializer, LabelSerializer, UserRegistrationSerializer
+from .authentication import user_reference
+from .db_routing import ReplicaReadMixin
+from .fieldsets import SPARSE_ACTIONS, sparse_fields
+from .models import PROGRESS_COUNTS, AgreementSnapshot, ArchivedDataItem, AudioClip, ChangeEvent, DataItem, Annotation, Job, Validation, User, Label, UserStats
+from .pagination import IdKeysetPagination, RoutingKeysetPagination, ValidatedAtKeysetPagination
+from .rows import ANNOTATION_ROWS, DATA_ITEM_ROWS, LABEL_ROWS, ValueRowsListMixin
+from .permissions import IsContributor, IsValidator, IsAdmin, IsAdminOrReadOnly
+from .serializers import DataItemSerializer, AnnotationSerializer, ValidationSerializer, UserSerializer, LabelSerializer, UserRegistrationSerializer, ClaimSerializer, TaskLeaseSerializer, BulkAnnotationSerializer, BulkValidationSerializer, ItemImportSerializer, AudioImportSerializer, ExportQuerySerializer, LeaderboardQuerySerializer, JobSerializer, ChangesQuerySerializer, ChangeEventSerializer, ArchivedDataItemSerializer, RestoreSerializer
+from .stats import annotation_counts, precision
+from . import exporters, response_cache
+from .importers import guess_format, import_items, read_rows, text_stream, upload_source
+from .audio import audio_response, import_audio
+from .bulk import bulk_annotate, bulk_validate
+from .jobs import submit
+from .changes import read_changes
+from .archive import restore_items
+from .agreement import snapshot_data
+from .consensus import fresh_posterior
+from .queue import claim_items, eligible_items
+from .tallies import item_tallies
 from labeling import permissions
 
 
 # Create your views here.
 
-class LabelViewSet(viewsets.ModelViewSet):
+class AudioNotStored(APIException):
+    """Élément audio importé comme simple URL : pas de fichier local ni de pics à servir."""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Audio non stocké localement : le fichier est à l'URL indiquée par `content`."
+    default_code = 'audio_not_stored'
+
+
+def cached_response(request, entry):
+    """304 si le client a déjà cette version de l'entrée, sinon la réponse avec ETag et Last-Modified."""
+    return response_cache.not_modified(request, entry) or Response(entry.data, status=entry.status, headers=entry.headers)
+
+
+LEADERBOARD_ORDERINGS = {
+    'volume': ('-total_annotations', 'user_id'),
+    'precision': ('-precision', '-total_annotations'),
+}
+
+class LabelViewSet(ReplicaReadMixin, ValueRowsListMixin, viewsets.ModelViewSet):
     """
     ViewSet pour gerer les labels.
     - Recuperer: Tout utilisateur authentifié
@@ -22,79 +60,284 @@ class LabelViewSet(viewsets.ModelViewSet):
     """
     queryset = Label.objects.all()
     serializer_class = LabelSerializer
+    value_rows = LABEL_ROWS
     permission_classes = [IsAdminOrReadOnly]
+    pagination_class = IdKeysetPagination
 
 
-class DataItemViewSet(viewsets.ReadOnlyModelViewSet):
+class DataItemViewSet(ReplicaReadMixin, ValueRowsListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = DataItem.objects.filter(is_active=True)
     serializer_class = DataItemSerializer
+    value_rows = DATA_ITEM_ROWS
 
-    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in SPARSE_ACTIONS:
+            return queryset.with_progress()
+        # Champs partiels : seuls les compteurs (sous-requêtes) et les colonnes demandés sont lus
+        columns = self.sparse_columns()
+        queryset = queryset.with_progress(counts=[name for name in PROGRESS_COUNTS if name in columns])
+        if self.action == 'retrieve':
+            queryset = queryset.only('id', *[name for name in columns if name not in PROGRESS_COUNTS])
+        return queryset
+
+    def pending_queryset(self):
+        # Mêmes éléments que ceux qu'un claim peut attribuer
+        return eligible_items(self.get_queryset(), self.request.user)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated],
+            pagination_class=RoutingKeysetPagination)
     def pending(self, request):
-        """Liste des items en attente de labelisation"""
-        annotated_ids = Annotation.objects.filter(user=request.user).values_list('item_id', flat=True)
-        pending_items = DataItem.objects.exclude(id__in=annotated_ids)
-        serializer = self.get_serializer(pending_items, many=True)
+        """Items qu'un claim peut attribuer à l'utilisateur, les plus incertains d'abord (hors items retirés ou complets)"""
+        return self.value_rows_response(self.pending_queryset())
+
+    @action(detail=False, methods=['post'], permission_classes=[IsContributor], serializer_class=ClaimSerializer)
+    def claim(self, request):
+        """
+        Réserve jusqu'à `count` éléments pour le contributeur pendant LABELING_LEASE_SECONDS.
+        Les éléments non annotés à l'expiration du bail retournent dans la file.
+        """
+        serializer = ClaimSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        leases = claim_items(request.user, serializer.validated_data['count'])
+
+        items = DataItem.objects.with_progress().in_bulk([lease.item_id for lease in leases])
+        for lease in leases:
+            lease.item = items[lease.item_id]
+        return Response(TaskLeaseSerializer(leases, many=True).data)
+
+    @action(detail=False, methods=['post'], url_path='import', permission_classes=[IsAdmin],
+            serializer_class=ItemImportSerializer, parser_classes=[MultiPartParser])
+    def import_file(self, request):
+        """
+        Importe un fichier JSONL ou CSV d'éléments, lu en flux et inséré par lots.
+        Renvoyer le même fichier reprend un import interrompu (`source` : empreinte du contenu par défaut).
+        """
+        serializer = ItemImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.validated_data['file']
+        fmt = serializer.validated_data.get('format') or guess_format(upload.name)
+        source = serializer.validated_data.get('source') or upload_source(upload)
+
+        try:
+            report = import_items(
+                read_rows(text_stream(upload.file), fmt), source, restart=serializer.validated_data['restart']
+            )
+        except UnicodeDecodeError:
+            # Les lots déjà validés restent importés : le fichier corrigé, renvoyé avec ce `source`, reprend après eux
+            return Response(
+                {"file": ["Le fichier n'est pas encodé en UTF-8."], "source": source},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(report.as_dict(), status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='import-audio', permission_classes=[IsAdmin],
+            serializer_class=AudioImportSerializer, parser_classes=[MultiPartParser])
+    def import_audio_file(self, request):
+        """
+        Importe un enregistrement WAV : découpé en segments de `segment_seconds` (AUDIO_SEGMENT_SECONDS
+        par défaut), un élément audio par segment, pics de forme d'onde calculés à l'import.
+        """
+        serializer = AudioImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.validated_data['file']
+        try:
+            items = import_audio(
+                upload.file, serializer.validated_data.get('source') or upload.name,
+                segment_seconds=serializer.validated_data.get('segment_seconds'),
+            )
+        except ValueError as exc:
+            return Response({"file": [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "source": items[0].audio.source,
+            "segments": [
+                {"id": item.id, "segment_index": item.audio.segment_index,
+                 "start_seconds": item.audio.start_seconds, "duration_seconds": item.audio.duration_seconds}
+                for item in items
+            ]
+        }, status=status.HTTP_201_CREATED)
+
+    def _audio_clip(self, pk):
+        """Segment stocké de l'élément ; 409 pour un élément audio qui ne référence qu'une URL."""
+        clip = AudioClip.objects.filter(item__is_active=True, item_id=pk).first()
+        if clip is None:
+            get_object_or_404(DataItem.objects.filter(is_active=True, data_type='audio'), pk=pk)
+            raise AudioNotStored()
+        return clip
 
-        return Response(serializer.data)
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
+    def audio(self, request, pk=None):
+        """Fichier WAV de l'élément, avec prise en charge des requêtes partielles (en-tête Range)."""
+        return audio_response(request, self._audio_clip(pk))
+
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
+    def waveform(self, request, pk=None):
+        """Pics de forme d'onde précalculés (min et max alternés par fenêtre de 1/peaks_per_second s)."""
+        clip = self._audio_clip(pk)
+        return Response({
+            "item_id": clip.item_id,
+            "source": clip.source,
+            "segment_index": clip.segment_index,
+            "start_seconds": clip.start_seconds,
+            "duration_seconds": clip.duration_seconds,
+            "sample_rate": clip.sample_rate,
+            "channels": clip.channels,
+            "peaks_per_second": clip.peaks_per_second,
+            "peaks": clip.peaks,
+        }, headers={'Cache-Control': 'private, max-age=86400'})
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdmin], pagination_class=None)
+    def export(self, request):
+        """
+        Exporte en flux chaque élément avec son label majoritaire, la distribution des votes
+        et l'état de validation (`?output=jsonl|csv`, filtres `data_type`, `created_after`,
+        `created_before`, `min_confidence`).
+        """
+        params = ExportQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        fmt = params.validated_data.pop('output')
+        records = exporters.iter_records(exporters.export_queryset(**params.validated_data))
+
+        response = StreamingHttpResponse(
+            exporters.render(records, fmt),
+            content_type='text/csv' if fmt == 'csv' else 'application/x-ndjson',
+        )
+        response['Content-Disposition'] = f'attachment; filename="dataset.{fmt}"'
+        return response
 
     @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
     def progress(self, request, pk=None):
         """Obtenir la progression de l'annotation et de la validation pour un élément de données spécifique."""
-        item = self.get_object()
-        return Response({
+        entry = response_cache.PROGRESS.fetch(pk, lambda: (self.progress_data(self.get_object()), 200))
+        return cached_response(request, entry)
+
+    @staticmethod
+    def progress_data(item):
+        return {
             "item_id": item.id,
             "annotation_count": item.annotation_count,
             "validated_count": item.validated_annotation_count,
             "approved_count": item.approved_annotation_count,
             "is_fully_validated": item.is_fully_validated,
-            "validation_progress": f"{item.validation_progress:.2f}%"
-        })
+            "validation_progress": f"{item.validation_progress:.2f}%",
+            "uncertainty": round(item.uncertainty, 4),
+            "retired": item.retired_at is not None,
+        }
 
-class AnnotationViewSet(viewsets.ModelViewSet):
+class AnnotationViewSet(ReplicaReadMixin, ValueRowsListMixin, viewsets.ModelViewSet):
     queryset = Annotation.objects.all().select_related('item', 'label', 'user')
     serializer_class = AnnotationSerializer
+    value_rows = ANNOTATION_ROWS
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in SPARSE_ACTIONS:
+            # `item` et `label` sont rendus par leur clé : seul `user` demande une jointure
+            queryset = queryset.select_related(None)
+            if 'user' in self.sparse_fields():
+                queryset = queryset.select_related('user')
+        return queryset
 
     def get_permissions(self):
-        if self.action == 'create':
+        if self.action in ('create', 'bulk'):
             return [IsContributor()]
         return [IsAuthenticated()]
 
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        serializer.save(user=user_reference(self.request.user))
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        serializer.save()
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+
+    @action(detail=False, methods=['post'], serializer_class=BulkAnnotationSerializer)
+    def bulk(self, request):
+        """
+        Crée jusqu'à LABELING_BULK_MAX_ROWS annotations en une requête.
+        Les lignes invalides sont rejetées individuellement et listées dans `errors`.
+        """
+        serializer = BulkAnnotationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        created, errors = bulk_annotate(user_reference(request.user), serializer.validated_data['annotations'])
+
+        return Response({
+            "created": AnnotationSerializer(created, many=True).data,
+            "errors": errors
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
 
     @action(detail=True, methods=['get'])
     def consensus(self, request, pk=None):
         """
-        Endpoint
+        Consensus pour l'élément `pk` : postérieur de Dawid–Skene s'il porte sur les votes actuels,
+        sinon vote majoritaire lu depuis les décomptes dénormalisés.
         """
-        annotations = Annotation.objects.filter(item_id=pk)
+        entry = response_cache.CONSENSUS.fetch(pk, lambda: self.consensus_data(item_tallies(pk)))
+        return cached_response(request, entry)
 
-        if not annotations.exists():
-            return Response({"error": "Aucun label soumis."}, status=404)
+    @staticmethod
+    def consensus_data(tallies):
+        """Retourne (corps, statut) à partir des décomptes de `item_tallies`."""
+        if not tallies:
+            return {"error": "Aucun label soumis."}, 404
 
-        label_names = [a.label.name for a in annotations]
-        counts = Counter(label_names)
-        majority_label, vote_count = counts.most_common(1)[0]
+        total_votes = sum(tally.votes for tally in tallies)
+        posterior = fresh_posterior(tallies[0].item, total_votes)
+        if posterior is not None:
+            return {
+                "consensus_label": posterior.label.name,
+                "confidence": f"{posterior.confidence * 100:.2f}%",
+                "total_votes": total_votes,
+                "method": "dawid-skene"
+            }, 200
 
-        return Response({
-            "consensus_label": majority_label,
-            "confidence": f"{(vote_count/len(label_names)) * 100:.2f}%",
-            "total_votes": len(label_names)
-        })
+        majority = tallies[0]
+        return {
+            "consensus_label": majority.label.name,
+            "confidence": f"{(majority.votes/total_votes) * 100:.2f}%",
+            "total_votes": total_votes,
+            "method": "majority"
+        }, 200
 
-class ValidationViewSet(viewsets.ModelViewSet):
-    queryset = Validation.objects.all()
+class ValidationViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
+    queryset = Validation.objects.all().select_related('validator')
     serializer_class = ValidationSerializer
     permission_classes = [IsValidator]
+    pagination_class = ValidatedAtKeysetPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if 'validator' not in sparse_fields(self, ValidationSerializer.Meta.fields):
+            queryset = queryset.select_related(None)
+        return queryset
 
     def perform_create(self, serializer):
-        serializer.save(validator=self.request.user)
+        serializer.save(validator=user_reference(self.request.user))
+
+    @action(detail=False, methods=['post'], serializer_class=BulkValidationSerializer)
+    def bulk(self, request):
+        """
+        Valide ou rejette jusqu'à LABELING_BULK_MAX_ROWS annotations en une requête.
+        Chaque entrée rejetée est listée dans `errors` avec sa position dans le lot.
+        """
+        serializer = BulkValidationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        created, errors = bulk_validate(user_reference(request.user), serializer.validated_data['validations'])
 
-class UserViewSet(viewsets.ReadOnlyModelViewSet):
+        return Response({
+            "created": ValidationSerializer(created, many=True).data,
+            "errors": errors
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+
+class UserViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = IdKeysetPagination
     
     def get_permissions(self):
         if self.action == 'register':
@@ -131,28 +374,181 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=True, methods=['get'])
     def stats(self, request, pk=None):
         """Recuperer les stats d'annotation pour un utilisateur donné."""
-        user = self.get_object()
-        total_annotations = Annotation.objects.filter(user=user).count()
+        def compute():
+            user = self.get_object()
+            return self.stats_data(user, annotation_counts(user)), 200
 
-        approved_annotations = Annotation.objects.filter(
-            user=user,
-            validation__is_approved=True
-        ).count()
+        return cached_response(request, response_cache.STATS.fetch(pk, compute))
 
-        rejected_annotations = Annotation.objects.filter(
-            user=user,
-            validation__is_approved=False
-        ).count()
+    @staticmethod
+    def stats_data(user, counts):
+        total_annotations = counts['total']
+        approved_annotations = counts['approved']
+        rejected_annotations = counts['rejected']
 
         pending_validations = total_annotations - approved_annotations - rejected_annotations
-        precision = (approved_annotations / total_annotations * 100) if total_annotations > 0 else 0
 
-        return Response({
+        return {
             "user": user.username,
             "role": user.role,
             "total_annotations": total_annotations,
             "approved_annotations": approved_annotations,
             "rejected_annotations": rejected_annotations,
             "pending_validations": pending_validations,
-            "precision": f"{precision:.2f}%"
-        })
\ No newline at end of file
+            "precision": f"{precision(approved_annotations, total_annotations):.2f}%"
+        }
+
+    @action(detail=False, methods=['get'], pagination_class=None)
+    def leaderboard(self, request):
+        """
+        Classement des contributeurs lu depuis UserStats (`?order=volume|precision`, `limit`,
+        `min_annotations` pour écarter les faibles volumes du classement par précision).
+        """
+        params = LeaderboardQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        ordering = LEADERBOARD_ORDERINGS[params.validated_data['order']]
+        rows = (
+            UserStats.objects.filter(total_annotations__gte=params.validated_data['min_annotations'])
+            .select_related('user')
+            .order_by(*ordering)[:params.validated_data['limit']]
+        )
+
+        return Response([
+            {
+                "rank": rank,
+                "user": row.user.username,
+                "total_annotations": row.total_annotations,
+                "approved_annotations": row.approved_annotations,
+                "rejected_annotations": row.rejected_annotations,
+                "precision": f"{row.precision:.2f}%"
+            }
+            for rank, row in enumerate(rows, start=1)
+        ])
+
+
+class JobViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Tâches de fond (administrateurs) : `POST` enregistre la tâche et répond 202 sans attendre,
+    `GET /api/jobs/<id>/` donne son état et son avancement, `download` le fichier d'un export.
+    Lues sur la base principale : l'état d'une tâche tout juste soumise doit être visible.
+    """
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [IsAdmin]
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = submit(
+            serializer.validated_data['kind'], serializer.validated_data['params'], user_reference(request.user),
+            max_attempts=serializer.validated_data.get('max_attempts'),
+        )
+        return Response(
+            self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED,
+            headers={'Location': request.build_absolute_uri(f'{job.pk}/')},
+        )
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Fichier produit par une tâche `export` terminée."""
+        job = self.get_object()
+        name = (job.result or {}).get('file') if job.kind == 'export' and job.status == 'succeeded' else None
+        if not name or not default_storage.exists(name):
+            raise Http404("Aucun fichier pour cette tâche.")
+        fmt = job.result['format']
+        return FileResponse(
+            default_storage.open(name, 'rb'), as_attachment=True, filename=f'dataset-{job.pk}.{fmt}',
+            content_type='text/csv' if fmt == 'csv' else 'application/x-ndjson',
+        )
+
+
+class ChangeViewSet(ReplicaReadMixin, viewsets.GenericViewSet):
+    """
+    Flux des changements (administrateurs) : créations, modifications et suppressions d'éléments,
+    d'annotations et de validations, dans l'ordre des curseurs. Repasser `cursor` en `?since=`
+    pour obtenir les suivants. Une réplique en retard renvoie moins de changements, jamais
+    un curseur au-delà d'un changement qu'elle n'a pas encore reçu (changes.py).
+    """
+    queryset = ChangeEvent.objects.all()
+    serializer_class = ChangeEventSerializer
+    permission_classes = [IsAdmin]
+    pagination_class = None
+
+    def list(self, request):
+        params = ChangesQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        events, cursor, has_more = read_changes(**params.validated_data)
+        return Response({
+            "changes": self.get_serializer(events, many=True).data,
+            "cursor": cursor,
+            "has_more": has_more,
+        })
+
+
+class ArchiveViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Éléments archivés par `manage.py archive_items` (administrateurs) : consultation et
+    restauration dans les tables chaudes avec leurs annotations et validations.
+    """
+    queryset = ArchivedDataItem.objects.annotate(annotation_count=Count('annotations'))
+    serializer_class = ArchivedDataItemSerializer
+    permission_classes = [IsAdmin]
+    pagination_class = IdKeysetPagination
+
+    @action(detail=False, methods=['post'], serializer_class=RestoreSerializer)
+    def restore(self, request):
+        """
+        Restaure les éléments `ids`, remis dans la file sauf avec `activate: false`.
+        Les identifiants absents de l'archive sont listés dans `missing`.
+        """
+        serializer = RestoreSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        restored = restore_items(ids, activate=serializer.validated_data['activate'])
+        return Response({
+            "restored": restored,
+            "missing": sorted(set(ids) - set(restored)),
+        }, status=status.HTTP_200_OK if restored else status.HTTP_404_NOT_FOUND)
+
+
+class AgreementViewSet(ReplicaReadMixin, viewsets.GenericViewSet):
+    """
+    Accord inter-annotateurs (administrateurs) : kappa de Fleiss, alpha de Krippendorff et accord
+    par paires, lus dans le dernier instantané. `refresh` lance un recalcul complet en tâche de fond ;
+    les rafraîchissements incrémentaux sont faits par les workers (`run_workers`).
+    """
+    queryset = AgreementSnapshot.objects.all()
+    permission_classes = [IsAdmin]
+    pagination_class = None
+
+    def list(self, request):
+        snapshot = AgreementSnapshot.objects.order_by('-id').first()
+        if snapshot is None:
+            return Response(
+                {"error": "Aucun instantané : lancer un recalcul (POST /api/agreement/refresh/ ou manage.py compute_agreement)."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return Response(snapshot_data(snapshot))
+
+    @action(detail=False, methods=['get'])
+    def history(self, request):
+        """Coefficients d'ensemble des instantanés conservés, du plus récent au plus ancien."""
+        history = []
+        for snapshot in AgreementSnapshot.objects.order_by('-id').defer('pairwise'):
+            overall = snapshot_data(snapshot, label_names={})['overall']
+            history.append({
+                "snapshot": snapshot.pk,
+                "computed_at": snapshot.created_at,
+                "full": snapshot.full,
+                **{key: overall[key] for key in ('items', 'annotations', 'fleiss_kappa', 'krippendorff_alpha')},
+            })
+        return Response(history)
+
+    @action(detail=False, methods=['post'])
+    def refresh(self, request):
+        """Soumet un recalcul complet (tâche de fond `agreement`) ; suivre la tâche via son URL."""
+        job = submit('agreement', user=user_reference(request.user))
+        return Response(
+            JobSerializer(job).data, status=status.HTTP_202_ACCEPTED,
+            headers={'Location': request.build_absolute_uri(f'/api/jobs/{job.pk}/')},
+        )